@@ -12,6 +12,7 @@ for dir_path in ['data', 'data/users', '.streamlit']:
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.authentication import check_password, register_user
+from utils.session_store import create_session, rotate_session, revoke_session
 from utils.data_handler import load_user_data, save_transaction
 from utils.currency_api import get_dollar_rate, get_dollar_rate_details
 from utils.theme_manager import inicializar_tema, mostrar_selector_tema, aplicar_tema
@@ -214,6 +215,10 @@ def display_login_form():
                     st.session_state.username = username
                     # Guardar preferencia para mantener la sesión
                     st.session_state.remember_login = remember
+                    if remember:
+                        # Token en la URL para recuperar la sesión en otra visita
+                        # (queda visible en el historial: ver utils/session_store.py)
+                        st.query_params['session'] = create_session(username)
                     st.success("¡Inicio de sesión exitoso!")
                     st.rerun()
                 else:
@@ -287,6 +292,7 @@ def display_register_form():
                     st.session_state.username = username
                     # Sesión inicia por defecto al registrarse
                     st.session_state.remember_login = True
+                    st.query_params['session'] = create_session(username)
                     st.success("Registro exitoso. ¡Bienvenido/a!")
                     st.rerun()
                 else:
@@ -301,6 +307,19 @@ def display_register_form():
 if st.session_state.remember_login and not st.session_state.logged_in and st.session_state.username:
     st.session_state.logged_in = True
 
+# En una nueva visita, recuperar la sesión recordada a partir de su token
+# (sin volver a consultar la base de usuarios). El token se reemplaza por uno
+# nuevo cada vez que se usa, así una URL copiada deja de servir.
+if not st.session_state.logged_in and 'session' in st.query_params:
+    session_user, new_token = rotate_session(st.query_params['session'])
+    if session_user:
+        st.session_state.logged_in = True
+        st.session_state.username = session_user
+        st.session_state.remember_login = True
+        st.query_params['session'] = new_token
+    else:
+        del st.query_params['session']
+
 # Si no está logueado, mostrar formularios
 if not st.session_state.logged_in:
     if st.session_state.get('show_register', False):
@@ -329,6 +348,9 @@ else:
     
     # Logout button
     if st.sidebar.button("Cerrar Sesión"):
+        if 'session' in st.query_params:
+            revoke_session(st.query_params['session'])
+            del st.query_params['session']
         st.session_state.logged_in = False
         st.session_state.username = ""
         st.session_state.remember_login = False
@@ -12,8 +12,13 @@ from utils.accounts import (
     add_account, 
     delete_account, 
     update_account_balance, 
-    get_account_types
+    get_account_types,
+    DEFAULT_CLOSING_DAY,
+    DEFAULT_DUE_DAY
 )
+from utils.credit_card_statements import get_next_statements
+from utils.statement_importer import load_import_profiles
+from utils.reconciliation import load_statement_lines, reconcile_statement
 
 def show_accounts(username):
     """Mostrar la página de cuentas"""
@@ -30,6 +35,74 @@ def show_accounts(username):
     
     with col2:
         show_account_form(username)
+    
+    # Conciliación de extractos contra las transacciones registradas
+    st.markdown("---")
+    show_reconciliation(username, accounts_df)
+
+def show_reconciliation(username, accounts_df):
+    """Conciliar un extracto bancario con las transacciones de una cuenta"""
+    st.subheader("Conciliación Bancaria")
+    
+    profiles = load_import_profiles(username)
+    if accounts_df.empty or not profiles:
+        st.info("Para conciliar necesitas al menos una cuenta y un perfil de banco (se crea en Transacciones → Importar Extracto).")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        account_ids = accounts_df['id'].tolist()
+        account_names = accounts_df['name'].tolist()
+        account_id = st.selectbox(
+            "Cuenta a conciliar",
+            options=account_ids,
+            format_func=lambda x: account_names[account_ids.index(x)],
+            key="reconcile_account"
+        )
+    with col2:
+        bank_name = st.selectbox("Perfil del banco", options=list(profiles.keys()), key="reconcile_profile")
+    with col3:
+        tolerance_days = st.number_input("Tolerancia (días)", min_value=0, max_value=15, value=3, step=1)
+    
+    uploaded_file = st.file_uploader("Extracto a conciliar", type=["csv", "txt", "ofx"], key="reconcile_file")
+    
+    if uploaded_file is None or not st.button("Conciliar"):
+        return
+    
+    with st.spinner("Conciliando movimientos..."):
+        try:
+            statement = load_statement_lines(uploaded_file, profiles[bank_name])
+        except Exception as e:
+            st.error(f"No se pudo leer el extracto: {e}")
+            return
+        result = reconcile_statement(username, statement, account_id, tolerance_days=int(tolerance_days))
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Conciliados", len(result['matched']))
+    with col2:
+        st.metric("Faltan registrar", len(result['missing']))
+    with col3:
+        st.metric("No figuran en el extracto", len(result['extra']))
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Neto del extracto", f"${result['statement_net']:,.2f}")
+    with col2:
+        st.metric("Neto registrado", f"${result['ledger_net']:,.2f}")
+    with col3:
+        st.metric("Diferencia", f"${result['difference']:,.2f}")
+    
+    if result['account_balance'] is not None:
+        st.caption(f"Saldo actual de {result['account_name']}: ${result['account_balance']:,.2f}")
+    
+    if not result['missing'].empty:
+        st.markdown("#### Movimientos del extracto sin registrar")
+        st.dataframe(result['missing'][['date', 'description', 'type', 'amount', 'currency']], hide_index=True)
+    
+    if not result['extra'].empty:
+        st.markdown("#### Transacciones registradas que no figuran en el extracto")
+        st.dataframe(result['extra'][['date', 'description', 'type', 'amount', 'currency']], hide_index=True)
 
 def format_currency(value, currency):
     """Formatear valor monetario con símbolo de moneda"""
@@ -72,6 +145,9 @@ def show_accounts_list(username, accounts_df):
     # Convertir tipos de cuentas
     account_types = get_account_types()
     
+    # Próximo resumen de cada tarjeta de crédito
+    next_statements = get_next_statements(username, accounts_df=accounts_df)
+    
     # Crear tarjetas para cada cuenta
     for _, account in accounts_df.iterrows():
         with st.container():
@@ -80,6 +156,20 @@ def show_accounts_list(username, accounts_df):
             with col1:
                 st.write(f"**{account['name']}**")
                 st.caption(f"Tipo: {account_types.get(account['type'], account['type'])}")
+                
+                if account['type'] == 'credit_card':
+                    statement = next_statements[next_statements['account_id'] == int(account['id'])]
+                    if statement.empty:
+                        st.caption("Próximo resumen: sin consumos")
+                    else:
+                        totals = " + ".join(
+                            format_currency(row['amount'], row['currency']) for _, row in statement.iterrows()
+                        )
+                        st.caption(
+                            f"Próximo resumen: {totals} "
+                            f"(cierra {statement['closing_date'].iloc[0].strftime('%d/%m')}, "
+                            f"vence {statement['due_date'].iloc[0].strftime('%d/%m')})"
+                        )
             
             with col2:
                 st.write(f"**Saldo:**")
@@ -173,6 +263,25 @@ def show_account_form(username):
             index=0 if account_data['currency'] == 'ARS' else 1
         )
         
+        # Ciclo de facturación (sólo se usa en tarjetas de crédito)
+        col1, col2 = st.columns(2)
+        with col1:
+            closing_day = st.number_input(
+                "Día de cierre",
+                min_value=1,
+                max_value=31,
+                value=int(account_data['closing_day']) if pd.notna(account_data.get('closing_day')) else DEFAULT_CLOSING_DAY,
+                help="Sólo para tarjetas de crédito"
+            )
+        with col2:
+            due_day = st.number_input(
+                "Día de vencimiento",
+                min_value=1,
+                max_value=31,
+                value=int(account_data['due_day']) if pd.notna(account_data.get('due_day')) else DEFAULT_DUE_DAY,
+                help="Sólo para tarjetas de crédito"
+            )
+        
         col1, col2 = st.columns(2)
         with col1:
             submit_button = st.form_submit_button("Guardar")
@@ -189,7 +298,9 @@ def show_account_form(username):
                     'name': name,
                     'type': account_type,
                     'balance': float(balance),  # Asegurar que sea float
-                    'currency': currency
+                    'currency': currency,
+                    'closing_day': int(closing_day) if account_type == 'credit_card' else None,
+                    'due_day': int(due_day) if account_type == 'credit_card' else None
                 }
                 
                 # Guardar la cuenta
@@ -7,12 +7,18 @@ import calendar
 import sys
 import os
 from utils.data_handler import load_user_data
-from utils.installment_calculator import get_upcoming_installments
+from utils.installment_obligations import get_upcoming_installment_obligations
 from utils.advanced_analytics import (
-    get_spending_forecast, detect_unusual_spending, 
-    calculate_savings_projection, analyze_expense_trends
+    AnalyticsContext, detect_unusual_spending, get_savings_projection, get_expense_trends,
+    simulate_savings_paths, get_monthly_summary, period_labels
 )
-from utils.financial_goals import load_user_goals, calculate_goal_progress
+from utils.forecasting import get_holt_winters_forecast
+from utils.anomaly_detection import get_transaction_anomalies
+from utils.cash_flow import project_cash_flow
+from utils.obligations_calendar import obligations_between
+from utils.accounts import load_user_accounts
+from utils.inflation import load_cpi_series, get_real_pesos_data, get_cpi_version
+from utils.financial_goals import load_user_goals, get_goal_analysis
 from utils.currency_api import get_dollar_rate_details, get_historical_rates
 
 def show_dollar_rate_widget():
@@ -189,6 +195,83 @@ def show_dollar_rate_widget():
             st.warning(f"No se pudo cargar el histórico de cotizaciones: {e}")
 
 
+def show_cash_flow_projection(username):
+    """Mostrar los saldos proyectados de cada cuenta con cuotas, gastos fijos e ingresos recurrentes"""
+    st.subheader("💸 Proyección de Flujo de Caja")
+    
+    accounts_df = load_user_accounts(username)
+    if accounts_df.empty:
+        st.info("Agrega cuentas para ver la proyección de saldos.")
+        return
+    
+    months_ahead = st.selectbox("Horizonte", options=[3, 6, 12], index=1, format_func=lambda x: f"{x} meses")
+    projection = project_cash_flow(username, months_ahead=months_ahead, accounts_df=accounts_df)
+    
+    account_names = dict(zip(accounts_df['id'].astype(int), accounts_df['name']))
+    daily = projection['daily'].rename(columns=account_names)
+    st.line_chart(daily)
+    
+    # Alertas de saldo negativo
+    for account_id, negative_date in projection['first_negative'].items():
+        if negative_date is not None:
+            balance = projection['daily'].loc[negative_date, account_id]
+            st.warning(f"{account_names[account_id]} quedaría en negativo el {negative_date.strftime('%d/%m/%Y')} (saldo proyectado: ${balance:,.2f}).")
+    
+    events = projection['events']
+    if events.empty:
+        st.info("No hay cuotas, gastos fijos ni ingresos recurrentes proyectados.")
+        return
+    
+    with st.expander("Movimientos proyectados"):
+        display_events = events.copy()
+        display_events['date'] = display_events['date'].dt.strftime('%d/%m/%Y')
+        display_events['account'] = display_events['account_id'].map(account_names)
+        display_events['amount'] = display_events['amount'].apply(lambda x: f"${x:,.2f}")
+        display_events['balance'] = display_events['balance'].apply(lambda x: f"${x:,.2f}")
+        st.dataframe(
+            display_events[['date', 'account', 'kind', 'description', 'amount', 'balance']],
+            column_config={
+                'date': st.column_config.TextColumn("Fecha"),
+                'account': st.column_config.TextColumn("Cuenta"),
+                'kind': st.column_config.TextColumn("Tipo"),
+                'description': st.column_config.TextColumn("Descripción"),
+                'amount': st.column_config.TextColumn("Monto"),
+                'balance': st.column_config.TextColumn("Saldo Proyectado")
+            },
+            hide_index=True
+        )
+
+def show_obligations_calendar(username):
+    """Mostrar los vencimientos del mes elegido: cuotas, gastos fijos y metas"""
+    st.subheader("📅 Calendario de Vencimientos")
+    
+    months = pd.period_range(pd.Timestamp.now(), periods=12, freq='M')
+    selected_month = st.selectbox(
+        "Mes",
+        options=list(months),
+        format_func=lambda m: m.strftime('%m/%Y'),
+        key="obligations_month"
+    )
+    
+    obligations = obligations_between(username, selected_month.start_time, selected_month.end_time.normalize())
+    if obligations.empty:
+        st.info("No hay vencimientos en este mes.")
+        return
+    
+    display_obligations = obligations.copy()
+    display_obligations['date'] = display_obligations['date'].dt.strftime('%d/%m/%Y')
+    display_obligations['amount'] = display_obligations.apply(lambda x: f"${x['amount']:,.2f} {x['currency']}", axis=1)
+    st.dataframe(
+        display_obligations[['date', 'kind', 'description', 'amount']],
+        column_config={
+            'date': st.column_config.TextColumn("Fecha"),
+            'kind': st.column_config.TextColumn("Tipo"),
+            'description': st.column_config.TextColumn("Descripción"),
+            'amount': st.column_config.TextColumn("Monto")
+        },
+        hide_index=True
+    )
+
 def show_dashboard(username):
     """Mostrar el dashboard principal para el usuario"""
     st.title("Dashboard")
@@ -206,6 +289,9 @@ def show_dashboard(username):
     # Convertir fecha a datetime
     df['date'] = pd.to_datetime(df['date'])
     
+    # Contexto compartido por todos los análisis (fechas, meses y gastos calculados una sola vez)
+    analytics = AnalyticsContext(df)
+    
     # Obtener datos del mes actual
     today = datetime.now()
     first_day_current_month = datetime(today.year, today.month, 1)
@@ -239,13 +325,8 @@ def show_dashboard(username):
     st.subheader("Tendencia Mensual")
     
     # Group by month and calculate totals
-    df['month'] = df['date'].dt.strftime('%Y-%m')
-    monthly_totals = df.groupby(['month', 'type'])['amount_pesos'].sum().unstack().fillna(0)
-    
-    if 'Ingreso' not in monthly_totals.columns:
-        monthly_totals['Ingreso'] = 0
-    if 'Gasto' not in monthly_totals.columns:
-        monthly_totals['Gasto'] = 0
+    monthly_totals = get_monthly_summary(analytics)
+    monthly_totals.index = period_labels(monthly_totals.index)
     
     monthly_totals['Balance'] = monthly_totals['Ingreso'] - monthly_totals['Gasto']
     
@@ -292,7 +373,7 @@ def show_dashboard(username):
     # Upcoming installment payments
     st.subheader("Próximos Pagos en Cuotas")
     
-    upcoming_installments = get_upcoming_installments(username, df)
+    upcoming_installments = get_upcoming_installment_obligations(username)
     
     if upcoming_installments.empty:
         st.info("No hay pagos en cuotas programados para los próximos meses.")
@@ -316,6 +397,14 @@ def show_dashboard(username):
             hide_index=True
         )
     
+    # Proyección de flujo de caja por cuenta
+    st.markdown("---")
+    show_cash_flow_projection(username)
+    
+    # Vencimientos del mes
+    st.markdown("---")
+    show_obligations_calendar(username)
+    
     # Panel de Análisis Avanzado
     st.markdown("---")
     st.subheader("📊 Panel de Análisis Avanzado")
@@ -332,7 +421,7 @@ def show_dashboard(username):
         st.markdown("### Detección de Gastos Inusuales")
         
         # Detectar gastos inusuales
-        unusual_spending = detect_unusual_spending(df, threshold_factor=1.5)
+        unusual_spending = detect_unusual_spending(analytics, threshold_factor=1.5)
         
         if unusual_spending.empty:
             st.info("No se detectaron gastos inusuales en el mes actual.")
@@ -354,22 +443,61 @@ def show_dashboard(username):
                         <p>Incremento: <b style="color: #FF5252;">+{percent:.1f}%</b></p>
                     </div>
                     """, unsafe_allow_html=True)
+        
+        # Gastos individuales atípicos respecto de la historia reciente de su categoría
+        st.markdown("#### Transacciones atípicas de los últimos 60 días")
+        anomaly_scores = get_transaction_anomalies(username, analytics)
+        recent_anomalies = anomaly_scores[
+            anomaly_scores['is_anomaly'] &
+            (anomaly_scores['date'] >= pd.Timestamp(today - timedelta(days=60)))
+        ].sort_values('robust_z', ascending=False)
+        
+        if recent_anomalies.empty:
+            st.info("No se detectaron transacciones atípicas recientes.")
+        else:
+            display_anomalies = recent_anomalies.copy()
+            display_anomalies['date'] = display_anomalies['date'].dt.strftime('%d/%m/%Y')
+            display_anomalies['amount_pesos'] = display_anomalies['amount_pesos'].apply(lambda x: f"${x:.2f}")
+            display_anomalies['rolling_median'] = display_anomalies['rolling_median'].apply(lambda x: f"${x:.2f}")
+            display_anomalies['robust_z'] = display_anomalies['robust_z'].round(1)
+            st.dataframe(
+                display_anomalies[['date', 'category', 'description', 'amount_pesos', 'rolling_median', 'robust_z']],
+                column_config={
+                    'date': st.column_config.TextColumn("Fecha"),
+                    'category': st.column_config.TextColumn("Categoría"),
+                    'description': st.column_config.TextColumn("Descripción"),
+                    'amount_pesos': st.column_config.TextColumn("Monto"),
+                    'rolling_median': st.column_config.TextColumn("Mediana habitual"),
+                    'robust_z': st.column_config.NumberColumn("Desvío (z)")
+                },
+                hide_index=True
+            )
     
     with tab2:
         st.markdown("### Proyección de Gastos para los Próximos Meses")
         
-        # Obtener la proyección
-        spending_forecast = get_spending_forecast(df, months_ahead=3)
+        col1, col2 = st.columns(2)
+        with col1:
+            months_ahead = st.slider("Meses a proyectar", min_value=1, max_value=12, value=3)
+        with col2:
+            seasonal_label = st.radio("Estacionalidad", ["Aditiva", "Multiplicativa"], horizontal=True)
+        seasonal = 'multiplicative' if seasonal_label == "Multiplicativa" else 'additive'
+        
+        # Obtener la proyección (Holt-Winters, en caché mientras no cambien los datos)
+        spending_forecast = get_holt_winters_forecast(username, analytics, months_ahead=months_ahead, seasonal=seasonal)
         
         if spending_forecast.empty:
             st.info("No hay suficientes datos para realizar una proyección de gastos.")
         else:
-            # Agrupar por mes para obtener el total proyectado
+            # Agrupar por mes para obtener el total proyectado y su intervalo (95%)
             monthly_forecast = spending_forecast.groupby('month')['amount_pesos'].sum()
+            monthly_std = np.sqrt((spending_forecast['std'] ** 2).groupby(spending_forecast['month']).sum())
+            lower_error = np.minimum(1.96 * monthly_std, monthly_forecast)
+            upper_error = 1.96 * monthly_std
             
             # Crear gráfico de barras para la proyección total
             fig, ax = plt.subplots(figsize=(10, 5))
-            monthly_forecast.plot(kind='bar', color='purple', ax=ax)
+            monthly_forecast.plot(kind='bar', color='purple', ax=ax, yerr=[lower_error.to_numpy(), upper_error.to_numpy()], capsize=4)
             
             ax.set_xlabel('Mes')
             ax.set_ylabel('Gasto Proyectado (ARS)')
@@ -397,12 +525,22 @@ def show_dashboard(username):
                 formatted_forecast[col] = formatted_forecast[col].apply(lambda x: f"${x:.2f}")
             
             st.dataframe(formatted_forecast)
+            st.caption("Las barras de error muestran el intervalo de predicción del 95%. La estacionalidad anual se estima cuando hay al menos dos años de historia.")
     
     with tab3:
         st.markdown("### Tendencias de Gastos por Categoría")
         
-        # Obtener análisis de tendencias
-        trends = analyze_expense_trends(df)
+        # Obtener análisis de tendencias (opcionalmente en pesos constantes)
+        cpi = load_cpi_series()
+        if not cpi.empty and st.checkbox("Ajustar por inflación (pesos constantes)"):
+            base_month = str(cpi.index.max())
+            trends = get_expense_trends(
+                username, get_real_pesos_data(username, df, base_month),
+                variant=('real', base_month, get_cpi_version())
+            )
+            st.caption(f"Tendencias calculadas en pesos de {base_month}.")
+        else:
+            trends = get_expense_trends(username, analytics)
         
         if not trends:
             st.info("No hay suficientes datos para analizar tendencias.")
@@ -459,8 +597,8 @@ def show_dashboard(username):
             step=1000
         )
         
-        # Calcular la proyección de ahorros
-        savings_projection = calculate_savings_projection(df, monthly_saving_target)
+        # Calcular la proyección de ahorros (curva precalculada para todos los valores del slider)
+        savings_projection = get_savings_projection(username, analytics, monthly_saving_target)
         
         if not savings_projection or 'possible' not in savings_projection:
             st.info("No hay suficientes datos para realizar una proyección de ahorros.")
@@ -530,6 +668,35 @@ def show_dashboard(username):
                 
                 plt.tight_layout()
                 st.pyplot(fig)
+        
+        # Simulación Monte Carlo del ahorro acumulado
+        if st.checkbox("Simular escenarios (Monte Carlo, 5 años)"):
+            simulation = simulate_savings_paths(analytics, monthly_saving_target)
+            
+            if not simulation['possible']:
+                st.info(simulation['message'])
+            else:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("Probabilidad de cumplir el objetivo a 5 años", f"{simulation['final_probability'] * 100:.1f}%")
+                with col2:
+                    months_to_goal = simulation['median_months_to_goal']
+                    st.metric("Meses hasta el ahorro objetivo (escenario medio)", months_to_goal if months_to_goal else "Más de 60")
+                
+                bands = simulation['percentiles']
+                fig, ax = plt.subplots(figsize=(10, 5))
+                ax.fill_between(simulation['months'], bands[5], bands[95], color='#4CAF50', alpha=0.15, label='5% - 95%')
+                ax.fill_between(simulation['months'], bands[25], bands[75], color='#4CAF50', alpha=0.35, label='25% - 75%')
+                ax.plot(simulation['months'], bands[50], color='#2E7D32', label='Mediana')
+                ax.plot(simulation['months'], simulation['target_path'], color='#F44336', linestyle='--', label='Objetivo acumulado')
+                
+                ax.set_xlabel('Meses')
+                ax.set_ylabel('Ahorro Acumulado (ARS)')
+                ax.set_title('Escenarios de Ahorro Acumulado')
+                ax.grid(linestyle='--', alpha=0.7)
+                ax.legend()
+                plt.tight_layout()
+                st.pyplot(fig)
     
     # Metas Financieras (Resumen)
     goals_df = load_user_goals(username)
@@ -543,14 +710,18 @@ def show_dashboard(username):
         if not active_goals.empty:
             # Mostrar las primeras 3 metas activas
             display_goals = active_goals.head(3)
+            analysis = get_goal_analysis(username, goals_df, analytics)
             
             for _, goal in display_goals.iterrows():
-                progress = calculate_goal_progress(goal)
+                goal_analysis = analysis.loc[goal['id']]
+                progress = goal_analysis['progress']
                 
                 with st.container():
                     st.markdown(f"**{goal['name']}**")
                     st.progress(progress / 100)
                     st.markdown(f"${goal['current_amount']:.2f} de ${goal['target_amount']:.2f} ({progress:.1f}%)")
+                    if not goal_analysis['on_track']:
+                        st.caption(f"⚠️ Necesitas aportar ${goal_analysis['required_monthly']:,.2f} por mes para llegar a tiempo.")
             
             if len(active_goals) > 3:
                 st.markdown("[Ver todas las metas...](#)")
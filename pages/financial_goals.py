@@ -9,9 +9,10 @@ import numpy as np
 from utils.financial_goals import (
     load_user_goals, save_financial_goal, delete_financial_goal,
     get_financial_goal_by_id, update_goal_progress, calculate_goal_progress,
-    get_goal_types
+    get_goal_types, get_goal_analysis, GOAL_LINK_TYPES
 )
 from utils.data_handler import load_user_data, get_categories
+from utils.accounts import load_user_accounts
 
 def show_financial_goals(username):
     """Muestra la página de metas financieras"""
@@ -71,6 +72,8 @@ def show_goal_card(username, goal):
             st.markdown(f"**{goal['name']}**")
             st.markdown(f"*{goal['description']}*")
             st.markdown(f"Tipo: {goal['type']} | Categoría: {goal['category'] if pd.notna(goal['category']) else 'No especificada'}")
+            if goal['link_type'] in ('category', 'account'):
+                st.caption(f"Progreso calculado a partir de las transacciones ({GOAL_LINK_TYPES[goal['link_type']].lower()} vinculada)")
             
             # Fechas y progreso
             start_date = pd.to_datetime(goal['start_date']).strftime('%d/%m/%Y')
@@ -89,7 +92,8 @@ def show_goal_card(username, goal):
                 st.session_state.editing_goal = goal['id']
                 st.rerun()
             
-            if goal['status'] != 'Completado' and st.button("📊", key=f"update_progress_{goal['id']}"):
+            is_linked = goal['link_type'] in ('category', 'account')
+            if goal['status'] != 'Completado' and not is_linked and st.button("📊", key=f"update_progress_{goal['id']}"):
                 st.session_state.updating_goal_progress = goal['id']
                 st.rerun()
             
@@ -141,6 +145,8 @@ def show_goal_form(username):
         'start_date': datetime.now().strftime('%Y-%m-%d'),
         'target_date': (datetime.now() + timedelta(days=365)).strftime('%Y-%m-%d'),
         'category': None,
+        'link_type': 'manual',
+        'account_id': None,
         'status': 'En progreso',
         'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
@@ -195,6 +201,27 @@ def show_goal_form(username):
             # Corregir la categoría si se seleccionó "Sin categoría"
             if category == "Sin categoría":
                 category = None
+            
+            # Origen del progreso: manual o calculado con las transacciones
+            link_options = list(GOAL_LINK_TYPES.keys())
+            link_type = st.selectbox(
+                "Progreso",
+                options=link_options,
+                format_func=lambda x: GOAL_LINK_TYPES[x],
+                index=link_options.index(goal_data.get('link_type')) if goal_data.get('link_type') in link_options else 0,
+                help="Con 'Categoría' o 'Cuenta' el monto actual se calcula con las transacciones desde la fecha de inicio"
+            )
+            
+            accounts_df = load_user_accounts(username)
+            account_options = [None] + accounts_df['id'].astype(int).tolist()
+            account_names = dict(zip(accounts_df['id'].astype(int), accounts_df['name']))
+            current_account = int(goal_data['account_id']) if pd.notna(goal_data.get('account_id')) else None
+            account_id = st.selectbox(
+                "Cuenta vinculada",
+                options=account_options,
+                format_func=lambda x: "Sin cuenta" if x is None else account_names.get(x, str(x)),
+                index=account_options.index(current_account) if current_account in account_options else 0
+            )
         
         with col2:
             # Monto objetivo
@@ -248,6 +275,10 @@ def show_goal_form(username):
                 st.error("El monto objetivo debe ser mayor a cero.")
             elif target_date <= start_date:
                 st.error("La fecha objetivo debe ser posterior a la fecha de inicio.")
+            elif link_type == 'category' and not category:
+                st.error("Elige la categoría cuyas transacciones suman a la meta.")
+            elif link_type == 'account' and account_id is None:
+                st.error("Elige la cuenta cuyo saldo suma a la meta.")
             else:
                 # Preparar los datos de la meta
                 new_goal = {
@@ -261,6 +292,8 @@ def show_goal_form(username):
                     'start_date': start_date.strftime('%Y-%m-%d'),
                     'target_date': target_date.strftime('%Y-%m-%d'),
                     'category': category,
+                    'link_type': link_type,
+                    'account_id': account_id if link_type == 'account' else None,
                     'status': 'Completado' if current_amount >= target_amount else 'En progreso',
                     'created_at': goal_data['created_at'] if 'created_at' in goal_data else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 }
@@ -345,18 +378,13 @@ def show_goals_analysis(username, goals_df):
         st.info("No tienes metas activas para mostrar.")
         return
     
-    # Calcular progreso para cada meta
-    progress_data = []
-    for _, goal in active_goals.iterrows():
-        progress = calculate_goal_progress(goal)
-        progress_data.append({
-            'name': goal['name'],
-            'progress': progress,
-            'remaining': 100 - progress
-        })
-    
-    # Convertir a DataFrame para facilitar la creación del gráfico
-    progress_df = pd.DataFrame(progress_data)
+    # Indicadores de todas las metas calculados en bloque
+    analysis = get_goal_analysis(username, goals_df).reindex(active_goals['id'])
+    progress_df = pd.DataFrame({
+        'name': active_goals['name'].to_numpy(),
+        'progress': analysis['progress'].to_numpy(),
+        'remaining': 100 - analysis['progress'].to_numpy()
+    })
     
     # Gráfico de barras apiladas horizontal
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -382,20 +410,32 @@ def show_goals_analysis(username, goals_df):
     st.markdown("### Próximas Fechas Límite")
     
     # Ordenar por fecha objetivo
-    upcoming_goals = active_goals.sort_values('target_date')
+    upcoming_goals = active_goals.assign(
+        required_monthly=analysis['required_monthly'].to_numpy(),
+        projected_date=analysis['projected_date'].to_numpy(),
+        on_track=analysis['on_track'].to_numpy()
+    ).sort_values('target_date')
     
     # Mostrar en formato de tabla
-    upcoming_df = upcoming_goals[['name', 'target_date', 'target_amount', 'current_amount', 'currency']]
+    upcoming_df = upcoming_goals[[
+        'name', 'target_date', 'target_amount', 'current_amount', 'currency',
+        'required_monthly', 'projected_date', 'on_track'
+    ]]
     upcoming_df = upcoming_df.rename(columns={
         'name': 'Meta',
         'target_date': 'Fecha Límite',
         'target_amount': 'Monto Objetivo',
         'current_amount': 'Monto Actual',
-        'currency': 'Moneda'
+        'currency': 'Moneda',
+        'required_monthly': 'Aporte Mensual Necesario',
+        'projected_date': 'Fecha Estimada',
+        'on_track': 'En Camino'
     })
     
-    # Formatear la fecha
+    # Formatear las fechas
     upcoming_df['Fecha Límite'] = pd.to_datetime(upcoming_df['Fecha Límite']).dt.strftime('%d/%m/%Y')
+    upcoming_df['Fecha Estimada'] = pd.to_datetime(upcoming_df['Fecha Estimada']).dt.strftime('%d/%m/%Y').fillna('Sin aportes recientes')
+    upcoming_df['En Camino'] = upcoming_df['En Camino'].map({True: '✅', False: '⚠️'})
     
     # Mostrar la tabla
     st.dataframe(upcoming_df)
\ No newline at end of file
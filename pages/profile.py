@@ -3,6 +3,7 @@ import pandas as pd
 import os
 import sys
 from utils.authentication import get_user_email, change_password
+from utils.session_store import create_session
 
 def show_profile(username):
     """Display user profile and settings"""
@@ -35,6 +36,9 @@ def show_profile(username):
                 # En una aplicación real, verificaríamos la contraseña actual
                 # Para esta demostración, simplemente la cambiaremos directamente
                 if change_password(username, new_password):
+                    # Las sesiones recordadas se cerraron: se abre una nueva para este navegador
+                    if 'session' in st.query_params:
+                        st.query_params['session'] = create_session(username)
                     st.success("Contraseña cambiada correctamente.")
                 else:
                     st.error("No se pudo cambiar la contraseña.")
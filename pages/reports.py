@@ -7,6 +7,7 @@ import calendar
 import sys
 import os
 from utils.data_handler import load_user_data
+from utils.inflation import load_cpi_series, update_cpi_series, get_real_pesos_data
 
 def show_reports(username):
     """Display financial reports and analysis"""
@@ -34,6 +35,23 @@ def show_reports(username):
         ]
     )
     
+    # Ajuste por inflación con la serie de IPC local
+    with st.expander("Ajuste por inflación (IPC)"):
+        st.markdown("La serie se carga desde un CSV con las columnas `month` (AAAA-MM) e `index`. Los meses ya cargados se reemplazan.")
+        cpi_file = st.file_uploader("Actualizar serie de IPC", type=["csv"])
+        if cpi_file is not None and st.button("Cargar IPC"):
+            months_loaded = update_cpi_series(cpi_file)
+            if months_loaded:
+                st.success(f"Serie de IPC actualizada ({months_loaded} meses).")
+            else:
+                st.error("El archivo no tiene el formato esperado (columnas month e index).")
+    
+    cpi = load_cpi_series()
+    if not cpi.empty and st.checkbox("Mostrar en pesos constantes (ajustado por inflación)"):
+        base_month = st.selectbox("Mes base", options=list(cpi.index.astype(str))[::-1])
+        df = get_real_pesos_data(username, df, base_month)
+        st.caption(f"Montos expresados en pesos de {base_month}.")
+    
     # Filter by year
     years = sorted(df['date'].dt.year.unique(), reverse=True)
     selected_year = st.selectbox("Año", options=years)
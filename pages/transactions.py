@@ -11,6 +11,16 @@ from utils.currency_api import get_dollar_rate, get_dollar_rate_details
 from utils.installment_calculator import calculate_installment_payments
 from utils.auto_categorize import suggest_transaction_details
 from utils.accounts import load_user_accounts
+from utils.duplicate_detection import find_possible_duplicates
+from utils.statement_importer import (
+    load_import_profiles, save_import_profile, delete_import_profile,
+    import_statement, DEFAULT_PROFILE
+)
+from utils.merchant_rules import (
+    load_merchant_rules, save_merchant_rule, delete_merchant_rule,
+    recategorize_transactions
+)
+from utils.recurring_detection import get_recurring_transactions, mark_recurring_as_fixed
 
 
 def display_dollar_rate_info(amount=None, conversion_type="all"):
@@ -145,11 +155,23 @@ def show_transactions(username):
             </div>
             """, unsafe_allow_html=True)
     
+    # Avisar si la última transacción guardada parece duplicada
+    if 'duplicate_warning' in st.session_state:
+        duplicates = st.session_state.pop('duplicate_warning')
+        details = "\n".join(
+            f"* {d['date']} - {d['description']} - ${d['amount']:.2f} {d['currency']}"
+            for d in duplicates
+        )
+        st.warning(f"La transacción guardada se parece a otras ya registradas. Verifica que no esté duplicada:\n{details}")
+    
     # Cargar datos del usuario
     df = load_user_data(username)
     
     # Selección de pestañas
-    tab1, tab2, tab3 = st.tabs(["Ver Transacciones", "Registrar Ingreso", "Registrar Gasto"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+        "Ver Transacciones", "Registrar Ingreso", "Registrar Gasto",
+        "Reglas de Categorización", "Importar Extracto", "Recurrentes"
+    ])
     
     with tab1:
         show_transactions_list(username, df)
@@ -159,6 +181,219 @@ def show_transactions(username):
     
     with tab3:
         show_expense_form(username)
+    
+    with tab4:
+        show_merchant_rules(username)
+    
+    with tab5:
+        show_statement_import(username)
+    
+    with tab6:
+        show_recurring_transactions(username, df)
+
+def show_recurring_transactions(username, df):
+    """Mostrar los cargos e ingresos recurrentes detectados"""
+    st.subheader("Transacciones Recurrentes")
+    st.markdown("Suscripciones, alquileres, servicios y sueldos detectados por la regularidad de sus fechas.")
+    
+    recurring = get_recurring_transactions(username, df)
+    if recurring.empty:
+        st.info("No se detectaron transacciones recurrentes (se necesitan al menos 3 apariciones regulares).")
+        return
+    
+    display_df = recurring.copy()
+    display_df['amount'] = display_df.apply(lambda x: f"${x['amount']:.2f} {x['currency']}", axis=1)
+    display_df['last_date'] = display_df['last_date'].dt.strftime('%d/%m/%Y')
+    display_df['next_date'] = display_df['next_date'].dt.strftime('%d/%m/%Y')
+    display_df['active'] = display_df['active'].map({True: 'Activa', False: 'Inactiva'})
+    
+    st.dataframe(
+        display_df[['type', 'description', 'category', 'frequency', 'amount', 'occurrences', 'last_date', 'next_date', 'active']],
+        column_config={
+            'type': st.column_config.TextColumn("Tipo"),
+            'description': st.column_config.TextColumn("Descripción"),
+            'category': st.column_config.TextColumn("Categoría"),
+            'frequency': st.column_config.TextColumn("Frecuencia"),
+            'amount': st.column_config.TextColumn("Último Monto"),
+            'occurrences': st.column_config.NumberColumn("Apariciones"),
+            'last_date': st.column_config.TextColumn("Última Fecha"),
+            'next_date': st.column_config.TextColumn("Próxima Fecha"),
+            'active': st.column_config.TextColumn("Estado")
+        },
+        hide_index=True
+    )
+    
+    if st.button("Marcar gastos recurrentes como gastos fijos"):
+        with st.spinner("Actualizando transacciones..."):
+            updated = mark_recurring_as_fixed(username)
+        st.session_state.pop('filtered_df', None)
+        st.success(f"Se marcaron {updated} transacciones como gasto fijo.")
+
+def show_statement_import(username):
+    """Importar extractos bancarios (CSV u OFX) usando un perfil por banco"""
+    st.subheader("Importar Extracto Bancario")
+    
+    profiles = load_import_profiles(username)
+    accounts_df = load_user_accounts(username)
+    
+    with st.expander("Configurar perfil de banco", expanded=not profiles):
+        with st.form("import_profile_form"):
+            bank_name = st.text_input("Nombre del banco")
+            file_format = st.selectbox("Formato", options=["csv", "ofx"])
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                date_column = st.text_input("Columna de fecha", value=DEFAULT_PROFILE['date_column'])
+                date_format = st.text_input("Formato de fecha", value=DEFAULT_PROFILE['date_format'])
+                description_column = st.text_input("Columna de descripción", value=DEFAULT_PROFILE['description_column'])
+                amount_column = st.text_input("Columna de importe (con signo)", value=DEFAULT_PROFILE['amount_column'])
+                debit_column = st.text_input("Columna de débitos (si no hay importe con signo)")
+                credit_column = st.text_input("Columna de créditos (si no hay importe con signo)")
+            with col2:
+                delimiter = st.text_input("Separador", value=DEFAULT_PROFILE['delimiter'])
+                decimal = st.text_input("Separador decimal", value=DEFAULT_PROFILE['decimal'])
+                thousands = st.text_input("Separador de miles", value=DEFAULT_PROFILE['thousands'])
+                skiprows = st.number_input("Filas a omitir al inicio", min_value=0, value=0, step=1)
+                currency_column = st.text_input("Columna de moneda (opcional)")
+                default_currency = st.selectbox("Moneda por defecto", options=["ARS", "USD"])
+            
+            if not accounts_df.empty:
+                account_ids = accounts_df['id'].tolist()
+                account_names = accounts_df['name'].tolist()
+                account_id = st.selectbox(
+                    "Cuenta del extracto",
+                    options=account_ids,
+                    format_func=lambda x: account_names[account_ids.index(x)]
+                )
+            else:
+                account_id = None
+            
+            if st.form_submit_button("Guardar Perfil"):
+                if not bank_name:
+                    st.error("Debes ingresar el nombre del banco.")
+                else:
+                    save_import_profile(username, bank_name, {
+                        'format': file_format,
+                        'delimiter': delimiter,
+                        'decimal': decimal,
+                        'thousands': thousands,
+                        'skiprows': int(skiprows),
+                        'date_column': date_column,
+                        'date_format': date_format,
+                        'description_column': description_column,
+                        'amount_column': amount_column if not (debit_column and credit_column) else '',
+                        'debit_column': debit_column,
+                        'credit_column': credit_column,
+                        'currency_column': currency_column,
+                        'default_currency': default_currency,
+                        'account_id': int(account_id) if account_id is not None else None
+                    })
+                    st.success(f"Perfil '{bank_name}' guardado.")
+                    st.rerun()
+    
+    if not profiles:
+        st.info("Crea un perfil de banco para poder importar extractos.")
+        return
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        selected_bank = st.selectbox("Perfil", options=list(profiles.keys()))
+    with col2:
+        st.write("")
+        st.write("")
+        if st.button("🗑️ Eliminar perfil"):
+            delete_import_profile(username, selected_bank)
+            st.rerun()
+    
+    uploaded_file = st.file_uploader("Archivo del extracto", type=["csv", "txt", "ofx"])
+    
+    if uploaded_file is not None and st.button("Importar"):
+        with st.spinner("Importando movimientos..."):
+            try:
+                summary = import_statement(
+                    username, uploaded_file, profiles[selected_bank],
+                    get_dollar_rate_details()['rate']
+                )
+            except Exception as e:
+                st.error(f"No se pudo importar el extracto: {e}")
+                return
+        
+        st.session_state.pop('filtered_df', None)
+        st.success(f"Se importaron {summary['imported']} movimientos.")
+        if summary['duplicates']:
+            st.info(f"Se omitieron {summary['duplicates']} movimientos que ya estaban registrados.")
+        if summary['rejected']:
+            st.warning(f"Se descartaron {summary['rejected']} filas con fecha, importe o moneda inválidos.")
+        if summary['possible_duplicates']:
+            st.warning(f"{len(summary['possible_duplicates'])} movimientos importados se parecen a transacciones ya registradas.")
+            with st.expander("Revisar posibles duplicados"):
+                st.dataframe(
+                    pd.DataFrame(summary['possible_duplicates']),
+                    column_config={
+                        'id': st.column_config.NumberColumn("ID importado"),
+                        'date': st.column_config.TextColumn("Fecha"),
+                        'description': st.column_config.TextColumn("Descripción"),
+                        'amount': st.column_config.NumberColumn("Monto", format="$%.2f"),
+                        'currency': st.column_config.TextColumn("Moneda"),
+                        'existing_id': st.column_config.NumberColumn("ID existente")
+                    },
+                    hide_index=True
+                )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Ingresos importados", f"${summary['income']:.2f}")
+        with col2:
+            st.metric("Gastos importados", f"${summary['expenses']:.2f}")
+
+def show_merchant_rules(username):
+    """Mostrar y administrar las reglas de categorización por comercio"""
+    st.subheader("Reglas de Categorización")
+    st.markdown("Si la descripción contiene el texto indicado, la transacción se categoriza automáticamente.")
+    
+    rules_df = load_merchant_rules(username)
+    
+    if rules_df.empty:
+        st.info("No tienes reglas definidas.")
+    else:
+        for _, rule in rules_df.iterrows():
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                fixed_label = " (gasto fijo)" if rule['fixed_expense'] else ""
+                st.markdown(f"Contiene **'{rule['pattern']}'** → {rule['type']} / {rule['category']}{fixed_label}")
+            with col2:
+                if st.button("🗑️", key=f"delete_rule_{rule['id']}"):
+                    delete_merchant_rule(username, rule['id'])
+                    st.rerun()
+        
+        if st.button("Aplicar reglas a transacciones existentes"):
+            with st.spinner("Recategorizando transacciones..."):
+                updated = recategorize_transactions(username)
+            st.session_state.pop('filtered_df', None)
+            st.success(f"Se actualizaron {updated} transacciones.")
+    
+    with st.form("merchant_rule_form"):
+        st.markdown("#### Nueva Regla")
+        pattern = st.text_input("La descripción contiene")
+        
+        categories = get_categories()
+        rule_type = st.selectbox("Tipo", options=["Gasto", "Ingreso"])
+        category_options = categories.get("Gasto", []) + [c for c in categories.get("Ingreso", []) if c not in categories.get("Gasto", [])]
+        category = st.selectbox("Categoría", options=category_options)
+        fixed_expense = st.checkbox("Gasto Fijo")
+        
+        if st.form_submit_button("Guardar Regla"):
+            if category not in categories.get(rule_type, []):
+                st.error(f"La categoría '{category}' no corresponde al tipo {rule_type}.")
+            elif save_merchant_rule(username, {
+                'pattern': pattern,
+                'type': rule_type,
+                'category': category,
+                'fixed_expense': fixed_expense
+            }):
+                st.success("Regla guardada correctamente.")
+                st.rerun()
+            else:
+                st.error("Debes ingresar un texto para la regla.")
 
 def show_transactions_list(username, df):
     """Show list of transactions with filtering options"""
@@ -498,8 +733,14 @@ def show_income_form(username):
                 'account_id': account_id
             }
             
+            # Buscar posibles duplicados antes de guardar
+            duplicates = [] if editing else find_possible_duplicates(username, new_transaction)
+            
             # Save transaction
             if save_transaction(username, new_transaction):
+                if duplicates:
+                    st.session_state.duplicate_warning = duplicates
+                
                 if editing:
                     st.success("Ingreso actualizado correctamente.")
                 else:
@@ -584,26 +825,28 @@ def show_expense_form(username):
         with col_suggest:
             if st.button("📋 Sugerir categoría", key="suggest_category"):
                 df = load_user_data(username)
-                if not df.empty and len(df) > 0:
-                    with st.spinner("Analizando transacciones similares..."):
-                        suggestions = suggest_transaction_details(username, df, st.session_state.temp_description)
+                with st.spinner("Analizando transacciones similares..."):
+                    suggestions = suggest_transaction_details(username, df, st.session_state.temp_description, 'Gasto')
+                    
+                    if suggestions and suggestions.get('confidence', 0) > 0.3:
+                        st.session_state.suggested_category = suggestions.get('category')
+                        st.session_state.suggested_payment_method = suggestions.get('payment_method')
+                        st.session_state.suggested_fixed_expense = suggestions.get('fixed_expense')
                         
-                        if suggestions and suggestions.get('confidence', 0) > 0.3:
-                            st.session_state.suggested_category = suggestions.get('category')
-                            st.session_state.suggested_payment_method = suggestions.get('payment_method')
-                            st.session_state.suggested_fixed_expense = suggestions.get('fixed_expense')
-                            
-                            confidence_percentage = int(suggestions.get('confidence', 0) * 100)
-                            
-                            st.success(f"Sugerencias basadas en transacciones similares ({confidence_percentage}% de confianza):")
-                            st.markdown(f"**Categoría:** {suggestions.get('category')}")
-                            if suggestions.get('payment_method'):
-                                st.markdown(f"**Método de pago:** {suggestions.get('payment_method')}")
-                            st.markdown(f"**Gasto fijo:** {'Sí' if suggestions.get('fixed_expense') else 'No'}")
-                            
-                            st.session_state.show_apply_suggestion = True
+                        confidence_percentage = int(suggestions.get('confidence', 0) * 100)
+                        
+                        if suggestions.get('source') == 'rule':
+                            st.success("Sugerencia basada en una de tus reglas de categorización:")
                         else:
-                            st.info("No se encontraron transacciones similares para sugerir categorías.")
+                            st.success(f"Sugerencias basadas en transacciones similares ({confidence_percentage}% de confianza):")
+                        st.markdown(f"**Categoría:** {suggestions.get('category')}")
+                        if suggestions.get('payment_method'):
+                            st.markdown(f"**Método de pago:** {suggestions.get('payment_method')}")
+                        st.markdown(f"**Gasto fijo:** {'Sí' if suggestions.get('fixed_expense') else 'No'}")
+                        
+                        st.session_state.show_apply_suggestion = True
+                    else:
+                        st.info("No se encontraron transacciones similares para sugerir categorías.")
         
         if 'show_apply_suggestion' in st.session_state and st.session_state.show_apply_suggestion:
             with col_apply:
@@ -750,8 +993,14 @@ def show_expense_form(username):
                 'account_id': account_id
             }
             
+            # Buscar posibles duplicados antes de guardar
+            duplicates = [] if editing else find_possible_duplicates(username, new_transaction)
+            
             # Save transaction
             if save_transaction(username, new_transaction):
+                if duplicates:
+                    st.session_state.duplicate_warning = duplicates
+                
                 if editing:
                     st.success("Gasto actualizado correctamente.")
                 else:
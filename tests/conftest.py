@@ -0,0 +1,23 @@
+import pytest
+
+TRANSACTION = {
+    'date': '2026-10-01', 'type': 'Gasto', 'category': 'Otros', 'subcategory': '',
+    'description': 'Peaje', 'amount': 500, 'currency': 'ARS', 'exchange_rate': 1,
+    'amount_pesos': 500, 'payment_method': 'Efectivo', 'fixed_expense': False,
+    'installments_total': 1, 'installments_paid': 0, 'account_id': None
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Directorio de trabajo temporal: los archivos de usuario se crean en data/ dentro de él"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def make_transaction():
+    """Transacción de prueba nueva en cada llamada; los argumentos reemplazan campos"""
+    def make(**fields):
+        return dict(TRANSACTION, **fields)
+    return make
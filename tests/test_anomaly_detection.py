@@ -0,0 +1,21 @@
+import pandas as pd
+
+from utils.advanced_analytics import AnalyticsContext
+from utils.anomaly_detection import detect_transaction_anomalies
+
+LEDGER = pd.DataFrame({
+    'id': [1, 2, 3, 4, 5, 6],
+    'date': ['2026-09-01', '2026-09-08', '2026-09-15', '2026-09-22', '2026-09-29', '2026-10-01'],
+    'type': ['Gasto', 'Gasto', 'Gasto', 'Gasto', 'Gasto', 'Ingreso'],
+    'category': ['Comida'] * 6,
+    'description': ['Super'] * 6,
+    'amount_pesos': ['1000', '1100', '900', '1000', '9000', '250000']
+})
+
+
+def test_scores_from_the_context_match_scores_from_the_raw_ledger():
+    from_context = detect_transaction_anomalies(AnalyticsContext(LEDGER))
+
+    pd.testing.assert_frame_equal(from_context, detect_transaction_anomalies(LEDGER))
+    assert from_context['id'].tolist() == [1, 2, 3, 4, 5]
+    assert from_context['amount_pesos'].tolist() == [1000.0, 1100.0, 900.0, 1000.0, 9000.0]
@@ -0,0 +1,23 @@
+from utils.data_handler import save_transaction, delete_transaction
+from utils.dedupe_index import load_fingerprint_index
+
+
+def test_first_save_and_delete_keep_index_counts(data_dir, make_transaction):
+    save_transaction('ana', make_transaction())
+    assert load_fingerprint_index('ana').tolist() == [1]
+
+    save_transaction('ana', make_transaction())
+    assert load_fingerprint_index('ana').tolist() == [2]
+
+    delete_transaction('ana', 1)
+    assert load_fingerprint_index('ana').tolist() == [1]
+
+
+def test_delete_without_index_file_rebuilds_from_ledger(data_dir, make_transaction):
+    save_transaction('ana', make_transaction())
+    save_transaction('ana', make_transaction())
+    (data_dir / 'data/users/ana/fingerprints.npy').unlink()
+
+    delete_transaction('ana', 1)
+
+    assert load_fingerprint_index('ana').tolist() == [1]
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from utils.duplicate_detection import build_duplicate_index, query_duplicate_index
+
+LEDGER = pd.DataFrame({
+    'id': [10, 11, 12],
+    'date': ['2026-10-01', '2026-10-01', '2026-10-20'],
+    'description': ['SUPERMERCADO DIA 123', 'NETFLIX', 'SUPERMERCADO DIA 123'],
+    'amount': [1500.0, 3000.0, 1500.0],
+    'currency': ['ARS', 'ARS', 'ARS']
+})
+
+
+def test_query_matches_similar_lines_close_in_time():
+    batch = pd.DataFrame({
+        'date': ['2026-10-02', '2026-10-09', '2026-10-02', '2026-10-21'],
+        'description': ['Supermercado Día 124', 'SUPERMERCADO DIA 123', 'SPOTIFY', 'SUPERMERCADO DIA 123'],
+        'amount': [1500.0, 1500.0, 1500.0, 1500.0],
+        'currency': ['ARS', 'ARS', 'ARS', 'ARS']
+    }, index=[5, 6, 7, 8])
+
+    matches = query_duplicate_index(build_duplicate_index(LEDGER), batch)
+
+    assert matches == [[0], [], [], [2]]
+
+
+def test_query_against_an_empty_ledger():
+    index = build_duplicate_index(LEDGER.iloc[0:0])
+
+    assert query_duplicate_index(index, LEDGER) == [[], [], []]
@@ -0,0 +1,17 @@
+import pandas as pd
+from utils.financial_goals import analyze_goals
+
+
+def test_analyze_goals_tiny_velocity_has_no_projected_date():
+    today = pd.Timestamp('2026-10-19')
+    goals = pd.DataFrame([{
+        'id': 1, 'name': 'Casa', 'target_amount': 1_000_000, 'current_amount': 100,
+        'currency': 'ARS', 'start_date': '2025-10-19', 'target_date': '2027-10-19',
+        'status': 'En progreso', 'link_type': 'manual', 'category': None, 'account_id': None
+    }])
+
+    analysis = analyze_goals(goals, pd.DataFrame(), today=today)
+
+    assert pd.isna(analysis.loc[1, 'projected_date'])
+    assert analysis.loc[1, 'on_track'].item() is False
+    assert (analysis.loc[1, 'progress'], analysis.loc[1, 'remaining']) == (0.01, 999_900)
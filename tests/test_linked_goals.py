@@ -0,0 +1,66 @@
+import io
+
+from utils.data_handler import save_transaction, delete_transaction, get_transaction_by_id, load_user_data
+from utils.financial_goals import save_financial_goal, load_user_goals, calculate_goal_contributions
+from utils.merchant_rules import save_merchant_rule, recategorize_transactions
+from utils.statement_importer import import_statement
+
+GOAL = {
+    'description': '', 'type': 'Ahorro', 'target_amount': 100000, 'current_amount': 0,
+    'currency': 'ARS', 'start_date': '2026-01-01', 'target_date': '2027-01-01', 'status': 'En progreso'
+}
+
+STATEMENT = "Fecha,Descripción,Importe\n02/10/2026,PLAZO FIJO,7000\n05/10/2026,SUPERMERCADO,-2500\n".encode()
+
+
+def _saving(make_transaction, **fields):
+    """Ingreso de ahorro de 1000 en la cuenta 1"""
+    return make_transaction(**dict({
+        'date': '2026-03-10', 'type': 'Ingreso', 'category': 'Ahorro', 'description': 'Transferencia',
+        'amount': 1000, 'amount_pesos': 1000, 'payment_method': None, 'account_id': 1
+    }, **fields))
+
+
+def _assert_goals_match_ledger(username):
+    goals = load_user_goals(username)
+    expected = calculate_goal_contributions(goals, load_user_data(username)).reindex(goals['id'], fill_value=0)
+    assert goals['current_amount'].astype(float).tolist() == expected.tolist()
+
+
+def test_linked_goals_follow_every_kind_of_change(data_dir, make_transaction):
+    save_transaction('ana', _saving(make_transaction))
+    save_transaction('ana', _saving(make_transaction, type='Gasto', category='Comida', amount=300, amount_pesos=300))
+    save_financial_goal('ana', dict(GOAL, name='Ahorro', link_type='category', category='Ahorro', account_id=None))
+    save_financial_goal('ana', dict(GOAL, name='Cuenta', link_type='account', category=None, account_id=1))
+    _assert_goals_match_ledger('ana')
+
+    save_transaction('ana', _saving(make_transaction, amount=2000, amount_pesos=2000))
+    _assert_goals_match_ledger('ana')
+
+    # Ediciones: categoría, cuenta y fecha anterior al inicio de las metas
+    save_transaction('ana', dict(get_transaction_by_id('ana', 3), category='Sueldo'))
+    _assert_goals_match_ledger('ana')
+    save_transaction('ana', dict(get_transaction_by_id('ana', 1), account_id=2))
+    _assert_goals_match_ledger('ana')
+    save_transaction('ana', dict(get_transaction_by_id('ana', 2), date='2025-12-31'))
+    _assert_goals_match_ledger('ana')
+
+    delete_transaction('ana', 1)
+    _assert_goals_match_ledger('ana')
+
+    save_merchant_rule('ana', {'pattern': 'PLAZO FIJO', 'type': 'Ingreso', 'category': 'Ahorro'})
+    import_statement('ana', io.BytesIO(STATEMENT), {'account_id': 1}, 1000)
+    _assert_goals_match_ledger('ana')
+
+    assert load_user_goals('ana')['current_amount'].astype(float).tolist() == [7000, 2000 + 7000 - 2500]
+
+
+def test_recategorization_updates_category_goals(data_dir, make_transaction):
+    save_transaction('ana', _saving(make_transaction, category='Otros', description='PLAZO FIJO'))
+    save_financial_goal('ana', dict(GOAL, name='Ahorro', link_type='category', category='Ahorro', account_id=None))
+    save_merchant_rule('ana', {'pattern': 'PLAZO FIJO', 'type': 'Ingreso', 'category': 'Ahorro'})
+
+    assert recategorize_transactions('ana') == 1
+
+    assert load_user_goals('ana')['current_amount'].astype(float).tolist() == [1000.0]
+    _assert_goals_match_ledger('ana')
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from utils.data_handler import save_transaction, load_user_data
+from utils.merchant_rules import (
+    save_merchant_rule, match_merchant_rule, recategorize_transactions,
+    normalize_description, normalize_descriptions
+)
+
+
+def test_numeric_pattern_is_matched_as_text(data_dir):
+    save_merchant_rule('ana', {'pattern': '4521', 'type': 'Gasto', 'category': 'Transporte'})
+    save_merchant_rule('ana', {'pattern': '452', 'type': 'Gasto', 'category': 'Otros'})
+
+    rule = match_merchant_rule('ana', 'PAGO 4521 SUBE', 'Gasto')
+
+    assert rule['pattern'] == '4521'
+    assert rule['category'] == 'Transporte'
+
+
+def test_recategorization_clears_the_old_subcategory(data_dir, make_transaction):
+    save_transaction('ana', make_transaction(description='PAGO 4521 SUBE', subcategory='Varios'))
+    save_merchant_rule('ana', {'pattern': 'SUBE', 'type': 'Gasto', 'category': 'Transporte'})
+
+    assert recategorize_transactions('ana') == 1
+
+    transaction = load_user_data('ana').iloc[0]
+    assert transaction['category'] == 'Transporte'
+    # La subcategoría vacía se guarda como celda vacía y se lee como NaN
+    assert pd.isna(transaction['subcategory'])
+    assert transaction['description'] == 'PAGO 4521 SUBE'
+
+
+def test_recategorization_with_an_empty_subcategory_column(data_dir, make_transaction):
+    save_transaction('ana', make_transaction(description='PAGO 4521 SUBE', subcategory=None))
+    save_transaction('ana', make_transaction(description='KIOSCO', subcategory=None))
+    save_merchant_rule('ana', {'pattern': 'SUBE', 'type': 'Gasto', 'category': 'Transporte'})
+
+    assert recategorize_transactions('ana') == 1
+
+    df = load_user_data('ana')
+    assert df['category'].tolist() == ['Transporte', 'Otros']
+    assert df['subcategory'].isna().tolist() == [True, True]
+
+
+def test_scalar_and_series_normalization_agree():
+    descriptions = pd.Series(['Café  Ñandú!!', 'Ａｂｃ', 'x҃y', None, 4521, ''])
+
+    assert normalize_descriptions(descriptions).tolist() == [normalize_description(text) for text in descriptions]
+    assert normalize_descriptions(descriptions).tolist() == ['cafe nandu', 'abc', 'xy', '', '4521', '']
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pandas as pd
+
+from utils import obligations_calendar
+from utils.obligations_calendar import CALENDAR_COLUMNS, ObligationCalendar, get_obligation_calendar
+
+
+def _entries(*intervals):
+    """Entradas a partir de tuplas (descripción, inicio, fecha)"""
+    return pd.DataFrame([
+        {'start': pd.Timestamp(start), 'date': pd.Timestamp(date), 'kind': 'Cuota', 'description': name,
+         'amount': 100.0, 'currency': 'ARS', 'account_id': None, 'source_id': None}
+        for name, start, date in intervals
+    ], columns=CALENDAR_COLUMNS)
+
+
+def test_insert_keeps_entries_sorted_after_equal_dates():
+    calendar = ObligationCalendar(_entries(
+        ('a', '2026-11-01', '2026-11-01'), ('b', '2026-11-05', '2026-11-05'), ('c', '2026-11-10', '2026-11-10')
+    ))
+
+    calendar.insert(_entries(
+        ('d', '2026-11-12', '2026-11-12'), ('e', '2026-11-05', '2026-11-05'), ('f', '2026-10-30', '2026-10-30')
+    ))
+
+    assert calendar.entries['description'].tolist() == ['f', 'a', 'b', 'e', 'c', 'd']
+    assert calendar.between('2026-11-05', '2026-11-10')['description'].tolist() == ['b', 'e', 'c']
+
+
+def test_overlapping_includes_both_interval_ends():
+    calendar = ObligationCalendar(_entries(
+        ('a', '2026-11-01', '2026-11-03'), ('meta', '2026-11-02', '2026-11-10'), ('c', '2026-11-11', '2026-11-11')
+    ))
+
+    assert calendar.overlapping('2026-11-04', '2026-11-10')['description'].tolist() == ['meta']
+    assert calendar.overlapping('2026-11-03', '2026-11-03')['description'].tolist() == ['a', 'meta']
+    assert calendar.overlapping('2026-11-11', '2026-11-30')['description'].tolist() == ['c']
+    assert calendar.overlapping('2026-12-01', '2026-12-31')['description'].tolist() == []
+
+
+def test_overlapping_sees_longer_intervals_inserted_later():
+    calendar = ObligationCalendar(_entries(('a', '2026-11-01', '2026-11-01')))
+
+    calendar.insert(_entries(('meta', '2026-01-01', '2026-12-31')))
+
+    assert calendar.overlapping('2026-06-01', '2026-06-30')['description'].tolist() == ['meta']
+
+
+def test_cached_calendar_is_rebuilt_on_a_new_day(data_dir, monkeypatch):
+    today = {'value': datetime(2026, 10, 19, 9)}
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return today['value']
+
+    monkeypatch.setattr(obligations_calendar, 'datetime', FixedDatetime)
+    first = get_obligation_calendar('ana')
+    today['value'] = datetime(2026, 10, 19, 23)
+    assert get_obligation_calendar('ana') is first
+
+    today['value'] = datetime(2026, 10, 20, 0, 5)
+    # El calendario nuevo proyecta el horizonte desde el día nuevo
+    assert first.covered_until == pd.Timestamp('2027-10-19')
+    assert get_obligation_calendar('ana').covered_until == pd.Timestamp('2027-10-20')
@@ -0,0 +1,19 @@
+import pandas as pd
+from utils.reconciliation import match_statement_lines
+
+
+def test_identical_same_day_lines_all_match():
+    statement = pd.DataFrame({
+        'date': ['2026-10-01'] * 7, 'amount': [350.0] * 7,
+        'type': ['Gasto'] * 7, 'currency': ['ARS'] * 7
+    })
+    ledger = pd.DataFrame({
+        'id': range(1, 8), 'date': ['2026-10-01'] * 7, 'amount': [350.0] * 7,
+        'type': ['Gasto'] * 7, 'currency': ['ARS'] * 7
+    })
+
+    pairs = match_statement_lines(statement, ledger)
+
+    assert pairs['statement_index'].tolist() == list(range(7))
+    assert sorted(pairs['transaction_id']) == list(range(1, 8))
+    assert pairs['days_diff'].tolist() == [0] * 7
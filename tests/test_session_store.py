@@ -0,0 +1,39 @@
+import sqlite3
+
+from utils.session_store import (
+    SESSIONS_DB_PATH, create_session, get_session_user, rotate_session, revoke_user_sessions
+)
+
+
+def test_rotated_token_replaces_the_old_one(data_dir):
+    token = create_session('ana')
+
+    username, new_token = rotate_session(token)
+
+    assert username == 'ana'
+    assert get_session_user(token) is None
+    assert rotate_session(token) == (None, None)
+    assert get_session_user(new_token) == 'ana'
+
+
+def test_revoke_user_sessions_only_closes_that_user(data_dir):
+    ana_tokens = [create_session('ana'), create_session('ana')]
+    luis_token = create_session('luis')
+
+    assert revoke_user_sessions('ana') == 2
+
+    assert [get_session_user(token) for token in ana_tokens] == [None, None]
+    assert get_session_user(luis_token) == 'luis'
+
+
+def test_revocation_from_another_process_is_seen_immediately(data_dir):
+    token = create_session('ana')
+    assert get_session_user(token) == 'ana'
+
+    # Otro proceso del servidor revoca la sesión directamente en la base
+    connection = sqlite3.connect(SESSIONS_DB_PATH)
+    with connection:
+        connection.execute("DELETE FROM sessions WHERE username = 'ana'")
+    connection.close()
+
+    assert get_session_user(token) is None
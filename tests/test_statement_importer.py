@@ -0,0 +1,67 @@
+import io
+
+import pandas as pd
+import pytest
+
+from utils.data_handler import TRANSACTION_COLUMNS, get_user_transactions_file, load_user_data, save_transaction
+from utils.statement_importer import import_statement
+
+STATEMENT = "Fecha,Descripción,Importe\n02/10/2026,NETFLIX,-3000\n05/10/2026,SUELDO,250000\n".encode()
+
+
+def _import(username):
+    return import_statement(username, io.BytesIO(STATEMENT), {}, 1000)
+
+
+def test_import_appends_in_the_order_of_an_existing_header(data_dir):
+    legacy_header = TRANSACTION_COLUMNS[::-1]
+    pd.DataFrame(columns=legacy_header).to_csv(get_user_transactions_file('ana'), index=False)
+
+    assert _import('ana')['imported'] == 2
+
+    df = load_user_data('ana')
+    assert list(df.columns) == legacy_header
+    assert df['description'].tolist() == ['NETFLIX', 'SUELDO']
+    assert df['amount'].tolist() == [3000, 250000]
+
+
+def test_import_adds_columns_missing_from_an_old_file(data_dir):
+    old_header = [column for column in TRANSACTION_COLUMNS if column != 'account_id']
+    pd.DataFrame(columns=old_header).to_csv(get_user_transactions_file('ana'), index=False)
+
+    _import('ana')
+
+    df = load_user_data('ana')
+    assert sorted(df.columns) == sorted(TRANSACTION_COLUMNS)
+    assert df['type'].tolist() == ['Gasto', 'Ingreso']
+
+
+def test_import_leaves_no_staging_file(data_dir):
+    _import('ana')
+
+    assert list((data_dir / 'data/users/ana').glob('*.import')) == []
+
+
+def test_reimport_skips_every_line_already_imported(data_dir):
+    _import('ana')
+
+    summary = _import('ana')
+
+    assert (summary['imported'], summary['duplicates']) == (0, 2)
+    assert load_user_data('ana')['description'].tolist() == ['NETFLIX', 'SUELDO']
+
+
+def test_profile_without_amount_columns_is_rejected(data_dir):
+
+    with pytest.raises(ValueError):
+        import_statement('ana', io.BytesIO(STATEMENT), {'amount_column': ''}, 1000)
+    with pytest.raises(ValueError):
+        import_statement('ana', io.BytesIO(STATEMENT), {'amount_column': 'Monto'}, 1000)
+
+
+def test_import_skips_a_line_entered_by_hand(data_dir, make_transaction):
+    save_transaction('ana', make_transaction(date='2026-10-02', description='Netflix', amount=3000.0, amount_pesos=3000.0))
+
+    summary = _import('ana')
+
+    assert (summary['imported'], summary['duplicates']) == (1, 1)
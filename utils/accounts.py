@@ -4,6 +4,10 @@ import json
 from datetime import datetime
 import uuid
 
+# Día de cierre y de vencimiento por defecto para tarjetas de crédito sin configurar
+DEFAULT_CLOSING_DAY = 25
+DEFAULT_DUE_DAY = 5
+
 # Función para obtener la ruta del archivo de cuentas del usuario
 def get_user_accounts_file(username):
     """Obtener la ruta al archivo de cuentas del usuario"""
@@ -19,7 +23,8 @@ def create_accounts_file_if_not_exists(username):
     if not os.path.exists(file_path):
         # Crear un DataFrame vacío con las columnas necesarias
         df = pd.DataFrame(columns=[
-            'id', 'name', 'type', 'balance', 'currency', 'created_at', 'last_updated'
+            'id', 'name', 'type', 'balance', 'currency', 'created_at', 'last_updated',
+            'closing_day', 'due_day'
         ])
         df.to_csv(file_path, index=False)
         
@@ -47,13 +52,15 @@ def load_user_accounts(username):
         df = pd.read_csv(file_path)
         if df.empty:
             return pd.DataFrame(columns=[
-                'id', 'name', 'type', 'balance', 'currency', 'created_at', 'last_updated'
+                'id', 'name', 'type', 'balance', 'currency', 'created_at', 'last_updated',
+                'closing_day', 'due_day'
             ])
         return df
     except Exception as e:
         print(f"Error al cargar cuentas: {e}")
         return pd.DataFrame(columns=[
-            'id', 'name', 'type', 'balance', 'currency', 'created_at', 'last_updated'
+            'id', 'name', 'type', 'balance', 'currency', 'created_at', 'last_updated',
+            'closing_day', 'due_day'
         ])
 
 # Obtener el siguiente ID para una cuenta
@@ -90,6 +97,8 @@ def add_account(username, account_data):
             df.at[idx, 'type'] = account_data.get('type', df.at[idx, 'type'])
             df.at[idx, 'balance'] = float(account_data.get('balance', df.at[idx, 'balance']))
             df.at[idx, 'currency'] = account_data.get('currency', df.at[idx, 'currency'])
+            df.at[idx, 'closing_day'] = account_data.get('closing_day', df.at[idx, 'closing_day'] if 'closing_day' in df.columns else None)
+            df.at[idx, 'due_day'] = account_data.get('due_day', df.at[idx, 'due_day'] if 'due_day' in df.columns else None)
             df.at[idx, 'last_updated'] = now
             
             # Guardar el DataFrame actualizado
@@ -105,6 +114,8 @@ def add_account(username, account_data):
         'type': account_data.get('type', 'other'),
         'balance': float(account_data.get('balance', 0.0)),
         'currency': account_data.get('currency', 'ARS'),
+        'closing_day': account_data.get('closing_day'),
+        'due_day': account_data.get('due_day'),
         'created_at': now,
         'last_updated': now
     }
@@ -189,4 +200,25 @@ def get_account_types():
         'savings': 'Cuenta de Ahorro',
         'digital_wallet': 'Billetera Digital',
         'other': 'Otra'
-    }
\ No newline at end of file
+    }
+
+# Obtener el ciclo de facturación de las tarjetas de crédito
+def get_card_cycle_days(accounts_df):
+    """
+    Obtener los días de cierre y de vencimiento de las tarjetas de crédito
+
+    Args:
+        accounts_df: DataFrame de cuentas del usuario
+
+    Returns:
+        DataFrame indexado por id de cuenta con closing_day y due_day (enteros
+        entre 1 y 31, con los valores por defecto si la tarjeta no los tiene)
+    """
+    cards = accounts_df[accounts_df['type'] == 'credit_card']
+    closing = cards['closing_day'] if 'closing_day' in cards.columns else pd.Series(index=cards.index, dtype=float)
+    due = cards['due_day'] if 'due_day' in cards.columns else pd.Series(index=cards.index, dtype=float)
+
+    return pd.DataFrame({
+        'closing_day': pd.to_numeric(closing, errors='coerce').fillna(DEFAULT_CLOSING_DAY).clip(1, 31).astype(int).to_numpy(),
+        'due_day': pd.to_numeric(due, errors='coerce').fillna(DEFAULT_DUE_DAY).clip(1, 31).astype(int).to_numpy()
+    }, index=pd.Index(cards['id'].astype(int).to_numpy(), name='account_id'))
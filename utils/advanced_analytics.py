@@ -2,125 +2,75 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import calendar
+from utils.data_handler import get_user_data_version
 
-def get_spending_forecast(df, months_ahead=3):
+class AnalyticsContext:
     """
-    Forecast spending for the next few months based on historical data.
+    Typed view of a ledger shared by the analytics functions during one rerun.
     
-    Args:
-        df: DataFrame containing transaction data
-        months_ahead: Number of months to forecast
-        
-    Returns:
-        DataFrame with forecasted expenses by category
+    Dates are parsed and amount_pesos is made numeric once, months are kept
+    as integer period keys (year * 12 + month - 1) and the expense-only view
+    is extracted once, so the analytics functions neither copy the frame nor
+    re-parse its columns.
     """
-    if df.empty:
-        return pd.DataFrame()
-    
-    # Filter to only include expenses
-    expenses_df = df[df['type'] == 'Gasto'].copy()
-    
-    if expenses_df.empty:
-        return pd.DataFrame()
-    
-    # Convert date to datetime if not already
-    expenses_df['date'] = pd.to_datetime(expenses_df['date'])
-    
-    # Group by month and category
-    expenses_df['month'] = expenses_df['date'].dt.strftime('%Y-%m')
-    monthly_by_category = expenses_df.groupby(['month', 'category'])['amount_pesos'].sum().reset_index()
-    
-    # Get unique categories
-    categories = expenses_df['category'].unique()
-    
-    # Get the last few months of data
-    unique_months = sorted(monthly_by_category['month'].unique())
-    
-    if len(unique_months) < 3:
-        # Not enough data for reliable forecast
-        return pd.DataFrame()
     
-    # Use the last 3-6 months for forecasting if available
-    num_months_for_forecast = min(6, len(unique_months))
-    recent_months = unique_months[-num_months_for_forecast:]
-    
-    # Calculate average monthly spending by category
-    recent_data = monthly_by_category[monthly_by_category['month'].isin(recent_months)]
-    avg_by_category = recent_data.groupby('category')['amount_pesos'].mean().reset_index()
-    
-    # For each category, calculate variance to determine trend
-    trend_by_category = {}
-    for category in categories:
-        cat_data = recent_data[recent_data['category'] == category]
-        if len(cat_data) > 1:
-            # Simple linear regression to detect trend
-            x = np.arange(len(cat_data))
-            y = cat_data['amount_pesos'].values
-            if len(x) > 0 and len(y) > 0:
-                z = np.polyfit(x, y, 1)
-                trend_by_category[category] = z[0]  # Slope indicates trend direction
-            else:
-                trend_by_category[category] = 0
+    def __init__(self, df):
+        typed = {}
+        if not df.empty and not pd.api.types.is_datetime64_any_dtype(df['date']):
+            typed['date'] = pd.to_datetime(df['date'])
+        if not df.empty and not pd.api.types.is_numeric_dtype(df['amount_pesos']):
+            typed['amount_pesos'] = pd.to_numeric(df['amount_pesos'], errors='coerce').fillna(0)
+        self.df = df.assign(**typed) if typed else df
+        
+        dates = self.df['date']
+        if self.df.empty:
+            self.periods = np.array([], dtype=np.int64)
         else:
-            trend_by_category[category] = 0
-    
-    # Create forecast for the next few months
-    forecast_data = []
-    current_month = datetime.now()
-    
-    for i in range(1, months_ahead + 1):
-        forecast_month = current_month + pd.DateOffset(months=i)
-        forecast_month_str = forecast_month.strftime('%Y-%m')
+            self.periods = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int64)
         
-        for _, row in avg_by_category.iterrows():
-            category = row['category']
-            base_amount = row['amount_pesos']
-            
-            # Apply trend factor (with dampening for longer forecasts)
-            trend_factor = 1 + (trend_by_category.get(category, 0) * (0.8 ** i))
-            forecast_amount = base_amount * trend_factor
-            
-            forecast_data.append({
-                'month': forecast_month_str,
-                'category': category,
-                'amount_pesos': forecast_amount,
-                'forecast': True
-            })
-    
-    # Create DataFrame
-    forecast_df = pd.DataFrame(forecast_data)
-    return forecast_df
+        is_expense = (self.df['type'] == 'Gasto').to_numpy()
+        self.expenses = self.df[is_expense]
+        self.expense_periods = self.periods[is_expense]
+    
+    @property
+    def empty(self):
+        return self.df.empty
+
+def as_analytics_context(data):
+    """Return data unchanged if it is already an AnalyticsContext, otherwise wrap the DataFrame"""
+    return data if isinstance(data, AnalyticsContext) else AnalyticsContext(data)
+
+def period_key(date):
+    """Integer period key (year * 12 + month - 1) of a date"""
+    return date.year * 12 + date.month - 1
+
+def period_labels(keys):
+    """'YYYY-MM' labels for an array of integer period keys"""
+    return [f"{key // 12:04d}-{key % 12 + 1:02d}" for key in np.asarray(keys, dtype=np.int64)]
 
-def detect_unusual_spending(df, threshold_factor=1.5):
+def detect_unusual_spending(data, threshold_factor=1.5):
     """
     Detect unusual spending patterns based on historical averages.
     
     Args:
-        df: DataFrame containing transaction data
+        data: DataFrame containing transaction data or an AnalyticsContext
         threshold_factor: Factor above average to consider as unusual
         
     Returns:
         DataFrame with detected unusual transactions
     """
-    if df.empty:
-        return pd.DataFrame()
-    
-    # Filter to only include expenses
-    expenses_df = df[df['type'] == 'Gasto'].copy()
+    context = as_analytics_context(data)
+    expenses_df = context.expenses
     
     if expenses_df.empty:
         return pd.DataFrame()
     
-    # Convert date to datetime if not already
-    expenses_df['date'] = pd.to_datetime(expenses_df['date'])
-    
     # Get the current month
-    today = datetime.now()
-    current_month_start = datetime(today.year, today.month, 1)
+    current_period = period_key(datetime.now())
+    is_current = context.expense_periods >= current_period
     
     # Calculate average monthly spending by category (excluding current month)
-    expenses_df['month'] = expenses_df['date'].dt.strftime('%Y-%m')
-    historical_df = expenses_df[expenses_df['date'] < current_month_start]
+    historical_df = expenses_df[~is_current]
     
     if historical_df.empty:
         return pd.DataFrame()  # Not enough data
@@ -130,7 +80,7 @@ def detect_unusual_spending(df, threshold_factor=1.5):
     avg_by_category = avg_by_category.rename(columns={'amount_pesos': 'avg_amount'})
     
     # Get current month spending
-    current_month_df = expenses_df[expenses_df['date'] >= current_month_start]
+    current_month_df = expenses_df[is_current]
     
     if current_month_df.empty:
         return pd.DataFrame()  # No current month data
@@ -151,38 +101,41 @@ def detect_unusual_spending(df, threshold_factor=1.5):
     
     return unusual
 
-def calculate_savings_projection(df, monthly_saving_target):
+# Values offered by the savings target slider in the dashboard
+SAVINGS_TARGET_VALUES = np.arange(1000, 50001, 1000)
+
+# Precomputed projection curves per user: {username: (data_version, curve)}
+_savings_curve_cache = {}
+
+def calculate_savings_projection_curve(data, targets=SAVINGS_TARGET_VALUES):
     """
-    Calculate savings projection based on current spending and a target savings amount
+    Evaluate the savings projection for many monthly targets at once.
+    
+    The monthly summary is computed a single time and every target is
+    evaluated with vectorized operations.
     
     Args:
-        df: DataFrame containing transaction data
-        monthly_saving_target: Target monthly savings amount
+        data: DataFrame containing transaction data or an AnalyticsContext
+        targets: Monthly saving targets to evaluate
         
     Returns:
-        Dictionary with savings projection metrics
+        Dictionary with the averages used and a DataFrame indexed by target,
+        or a dictionary with 'possible' and 'message' if there is not enough data
     """
-    if df.empty:
+    context = as_analytics_context(data)
+    if context.empty:
         return {
             'possible': False,
             'message': 'No hay suficientes datos para calcular proyecciones.'
         }
     
-    # Calculate monthly income and expenses
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.strftime('%Y-%m')
-    
-    # Group by month and type
-    monthly_summary = df.groupby(['month', 'type'])['amount_pesos'].sum().unstack().fillna(0)
-    
-    if 'Ingreso' not in monthly_summary.columns or 'Gasto' not in monthly_summary.columns:
+    if context.expenses.empty or not (context.df['type'] == 'Ingreso').any():
         return {
             'possible': False,
             'message': 'Se requieren datos de ingresos y gastos para calcular proyecciones.'
         }
     
-    # Calculate monthly balance
-    monthly_summary['Balance'] = monthly_summary['Ingreso'] - monthly_summary['Gasto']
+    monthly_summary = get_monthly_summary(context)
     
     # Use only recent months data
     num_months = min(6, len(monthly_summary))
@@ -197,129 +150,239 @@ def calculate_savings_projection(df, monthly_saving_target):
     # Calculate average monthly income, expenses, and balance
     avg_income = recent_summary['Ingreso'].mean()
     avg_expenses = recent_summary['Gasto'].mean()
-    avg_balance = recent_summary['Balance'].mean()
+    avg_balance = avg_income - avg_expenses
+    
+    targets = np.asarray(targets, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        meets_target = avg_balance >= targets
+        required_reduction = np.where(meets_target, 0, targets - avg_balance)
+        new_expense_target = avg_expenses - required_reduction
+        curve = pd.DataFrame({
+            'meets_target': meets_target,
+            'possible': meets_target | (avg_income > new_expense_target),
+            'suggested_expense_reduction': required_reduction,
+            'reduction_percent': (required_reduction / avg_expenses) * 100,
+            'new_expense_target': new_expense_target,
+            'new_expense_percent': (new_expense_target / avg_income) * 100,
+            'savings_percent': (targets / avg_income) * 100
+        }, index=pd.Index(targets, name='target'))
+    
+    return {
+        'possible': True,
+        'avg_income': avg_income,
+        'avg_expenses': avg_expenses,
+        'avg_balance': avg_balance,
+        'expenses_percent': (avg_expenses / avg_income) * 100 if avg_income else np.inf,
+        'curve': curve
+    }
+
+def _projection_from_curve(projection_curve, monthly_saving_target):
+    """Build the savings projection dictionary for one target from a precomputed curve"""
+    if 'curve' not in projection_curve:
+        return projection_curve
+    
+    row = projection_curve['curve'].loc[monthly_saving_target]
     
-    # Check if monthly saving target is achievable
-    if avg_balance >= monthly_saving_target:
+    base = {
+        'avg_income': projection_curve['avg_income'],
+        'avg_expenses': projection_curve['avg_expenses'],
+        'avg_balance': projection_curve['avg_balance'],
+        'target_savings': monthly_saving_target
+    }
+    
+    if row['meets_target']:
         # Already meeting the target
-        savings_percent = (monthly_saving_target / avg_income) * 100
-        expenses_percent = ((avg_expenses) / avg_income) * 100
-        
         return {
             'possible': True,
             'message': 'Ya estás alcanzando tu objetivo de ahorro mensual.',
-            'avg_income': avg_income,
-            'avg_expenses': avg_expenses,
-            'avg_balance': avg_balance,
-            'target_savings': monthly_saving_target,
-            'current_savings_percent': savings_percent,
-            'expenses_percent': expenses_percent,
+            **base,
+            'current_savings_percent': row['savings_percent'],
+            'expenses_percent': projection_curve['expenses_percent'],
             'suggested_expense_reduction': 0
         }
+    
+    possible = bool(row['possible'])
+    return {
+        'possible': possible,
+        'message': 'Para alcanzar tu objetivo de ahorro mensual, necesitas reducir gastos.' if possible
+                   else 'Tu objetivo de ahorro no es alcanzable con tus ingresos actuales.',
+        **base,
+        'suggested_expense_reduction': row['suggested_expense_reduction'],
+        'reduction_percent': row['reduction_percent'],
+        'new_expense_target': row['new_expense_target'],
+        'new_expense_percent': row['new_expense_percent'],
+        'savings_percent': row['savings_percent']
+    }
+
+def calculate_savings_projection(data, monthly_saving_target):
+    """
+    Calculate savings projection based on current spending and a target savings amount
+    
+    Args:
+        data: DataFrame containing transaction data or an AnalyticsContext
+        monthly_saving_target: Target monthly savings amount
+        
+    Returns:
+        Dictionary with savings projection metrics
+    """
+    projection_curve = calculate_savings_projection_curve(data, [monthly_saving_target])
+    return _projection_from_curve(projection_curve, monthly_saving_target)
+
+def get_savings_projection(username, data, monthly_saving_target):
+    """
+    Savings projection for the dashboard slider.
+    
+    The curve for every slider value is computed once per version of the
+    user's data, so moving the slider is a lookup.
+    
+    Args:
+        username: Username
+        data: DataFrame containing the user's transactions or an AnalyticsContext
+        monthly_saving_target: Target monthly savings amount
+        
+    Returns:
+        Dictionary with savings projection metrics
+    """
+    version = get_user_data_version(username)
+    cached = _savings_curve_cache.get(username)
+    if cached and cached[0] == version:
+        projection_curve = cached[1]
     else:
-        # Calculate how much expenses need to be reduced
-        required_reduction = monthly_saving_target - avg_balance
-        reduction_percent = (required_reduction / avg_expenses) * 100
+        projection_curve = calculate_savings_projection_curve(data)
+        _savings_curve_cache[username] = (version, projection_curve)
+    
+    if 'curve' in projection_curve and monthly_saving_target not in projection_curve['curve'].index:
+        return calculate_savings_projection(data, monthly_saving_target)
+    return _projection_from_curve(projection_curve, monthly_saving_target)
+
+def get_monthly_summary(data):
+    """
+    Monthly income and expense totals in pesos, without modifying the ledger.
+    
+    Args:
+        data: DataFrame containing transaction data or an AnalyticsContext
         
-        # Calculate the new expense target
-        new_expense_target = avg_expenses - required_reduction
-        new_expense_percent = (new_expense_target / avg_income) * 100
-        savings_percent = (monthly_saving_target / avg_income) * 100
+    Returns:
+        DataFrame indexed by integer period key with 'Ingreso' and 'Gasto' columns
+    """
+    context = as_analytics_context(data)
+    if context.empty:
+        return pd.DataFrame(columns=['Ingreso', 'Gasto'])
+    
+    df = context.df
+    monthly_summary = df.groupby([context.periods, df['type'].to_numpy()])['amount_pesos'].sum().unstack(fill_value=0)
+    monthly_summary = monthly_summary.reindex(columns=['Ingreso', 'Gasto'], fill_value=0)
+    monthly_summary.index.name = 'period'
+    return monthly_summary
+
+def simulate_savings_paths(data, monthly_saving_target, months=60, n_paths=10000, seed=42):
+    """
+    Monte Carlo simulation of accumulated savings.
+    
+    Each simulated month draws one historical month at random (income and
+    expenses together, so their correlation is kept) and adds its residuals to
+    the average income and expenses. All paths are generated as a single
+    (n_paths x months) array.
+    
+    Args:
+        data: DataFrame containing transaction data or an AnalyticsContext
+        monthly_saving_target: Target monthly savings amount
+        months: Number of months to simulate
+        n_paths: Number of simulated paths
+        seed: Seed for the random generator (results are reproducible)
         
+    Returns:
+        Dictionary with percentile bands of accumulated savings and the
+        probability of being on track with the target in each month
+    """
+    monthly_summary = get_monthly_summary(data)
+    if len(monthly_summary) < 3 or not (monthly_summary['Ingreso'] > 0).any():
         return {
-            'possible': avg_income > new_expense_target,
-            'message': 'Para alcanzar tu objetivo de ahorro mensual, necesitas reducir gastos.' if avg_income > new_expense_target
-                       else 'Tu objetivo de ahorro no es alcanzable con tus ingresos actuales.',
-            'avg_income': avg_income,
-            'avg_expenses': avg_expenses,
-            'avg_balance': avg_balance,
-            'target_savings': monthly_saving_target,
-            'suggested_expense_reduction': required_reduction,
-            'reduction_percent': reduction_percent,
-            'new_expense_target': new_expense_target,
-            'new_expense_percent': new_expense_percent,
-            'savings_percent': savings_percent
+            'possible': False,
+            'message': 'Se necesitan al menos 3 meses de ingresos y gastos para simular ahorros.'
         }
+    
+    income = monthly_summary['Ingreso'].to_numpy(dtype=float)
+    expenses = monthly_summary['Gasto'].to_numpy(dtype=float)
+    avg_income = income.mean()
+    avg_expenses = expenses.mean()
+    
+    # Bootstrap paired residuals: one random historical month per simulated month
+    rng = np.random.default_rng(seed)
+    sampled = rng.integers(0, len(monthly_summary), size=(n_paths, months))
+    monthly_balance = (avg_income + (income - avg_income)[sampled]) - (avg_expenses + (expenses - avg_expenses)[sampled])
+    accumulated = np.cumsum(monthly_balance, axis=1)
+    
+    # Accumulated target if the monthly goal is met every month
+    target_path = monthly_saving_target * np.arange(1, months + 1)
+    on_track = (accumulated >= target_path).mean(axis=0)
+    
+    percentiles = [5, 25, 50, 75, 95]
+    bands = np.percentile(accumulated, percentiles, axis=0)
+    
+    # First month in which the median path reaches the accumulated target of the whole horizon
+    reached = np.nonzero(bands[2] >= target_path[-1])[0]
+    
+    return {
+        'possible': True,
+        'months': np.arange(1, months + 1),
+        'percentiles': dict(zip(percentiles, bands)),
+        'target_path': target_path,
+        'on_track_probability': on_track,
+        'final_probability': float(on_track[-1]),
+        'median_months_to_goal': int(reached[0]) + 1 if len(reached) else None,
+        'avg_monthly_balance': float(avg_income - avg_expenses)
+    }
 
-def analyze_expense_trends(df):
+def analyze_expense_trends(data):
     """
     Analyze expense trends over time by category
     
     Args:
-        df: DataFrame containing transaction data
+        data: DataFrame containing transaction data or an AnalyticsContext
         
     Returns:
         Dictionary with trend analysis results
     """
-    if df.empty:
-        return {}
-    
-    # Filter to only include expenses
-    expenses_df = df[df['type'] == 'Gasto'].copy()
+    context = as_analytics_context(data)
+    expenses_df = context.expenses
     
     if expenses_df.empty:
         return {}
     
-    # Convert date to datetime if not already
-    expenses_df['date'] = pd.to_datetime(expenses_df['date'])
+    # Month x category matrix over the full month range (months without spending are zeros)
+    monthly_matrix = expenses_df.pivot_table(
+        index=context.expense_periods, columns='category', values='amount_pesos', aggfunc='sum', fill_value=0
+    )
     
-    # Group by month and category
-    expenses_df['month'] = expenses_df['date'].dt.strftime('%Y-%m')
-    monthly_by_category = expenses_df.groupby(['month', 'category'])['amount_pesos'].sum().reset_index()
+    if len(monthly_matrix) < 3:
+        return {}  # Not enough data for trend analysis
     
-    # Get unique categories and months
-    categories = expenses_df['category'].unique()
-    unique_months = sorted(monthly_by_category['month'].unique())
+    monthly_matrix = monthly_matrix.reindex(
+        np.arange(monthly_matrix.index.min(), monthly_matrix.index.max() + 1), fill_value=0
+    )
+    values = monthly_matrix.to_numpy(dtype=float)
     
-    if len(unique_months) < 3:
-        return {}  # Not enough data for trend analysis
+    # Closed-form least squares for every category at once
+    x = np.arange(len(values), dtype=float)
+    x_centered = x - x.mean()
+    avg_value = values.mean(axis=0)
+    slope = (x_centered @ (values - avg_value)) / (x_centered @ x_centered)
     
-    # Calculate trends for each category
-    trends = {}
+    # Average monthly change as percentage
+    monthly_pct_change = np.divide(slope * 100, avg_value, out=np.zeros_like(slope), where=avg_value > 0)
     
-    for category in categories:
-        cat_data = monthly_by_category[monthly_by_category['category'] == category]
-        cat_data = cat_data.sort_values('month')
-        
-        if len(cat_data) > 1:
-            # Simple linear regression to determine trend
-            x = np.arange(len(cat_data))
-            y = cat_data['amount_pesos'].values
-            
-            if len(x) > 0 and len(y) > 0:
-                z = np.polyfit(x, y, 1)
-                slope = z[0]
-                
-                # Determine trend direction
-                if slope > 0:
-                    direction = 'up'
-                elif slope < 0:
-                    direction = 'down'
-                else:
-                    direction = 'stable'
-                
-                # Calculate average monthly change as percentage
-                avg_value = cat_data['amount_pesos'].mean()
-                if avg_value > 0:
-                    monthly_pct_change = (slope / avg_value) * 100
-                else:
-                    monthly_pct_change = 0
-                
-                # Determine strength of trend
-                if abs(monthly_pct_change) < 3:
-                    strength = 'weak'
-                elif abs(monthly_pct_change) < 10:
-                    strength = 'moderate'
-                else:
-                    strength = 'strong'
-                
-                # Add to results
-                trends[category] = {
-                    'direction': direction,
-                    'monthly_change_percent': monthly_pct_change,
-                    'strength': strength,
-                    'avg_monthly_amount': avg_value
-                }
+    # Determine trend direction and strength
+    direction = np.select([slope > 0, slope < 0], ['up', 'down'], default='stable')
+    abs_change = np.abs(monthly_pct_change)
+    strength = np.select([abs_change < 3, abs_change < 10], ['weak', 'moderate'], default='strong')
+    
+    trends = pd.DataFrame({
+        'direction': direction,
+        'monthly_change_percent': monthly_pct_change,
+        'strength': strength,
+        'avg_monthly_amount': avg_value
+    }, index=monthly_matrix.columns).to_dict('index')
     
     # Sort trends by strength and direction
     increasing_trends = {k: v for k, v in trends.items() 
@@ -338,4 +401,28 @@ def analyze_expense_trends(df):
         'increasing': increasing_trends,
         'decreasing': decreasing_trends,
         'all_trends': trends
-    }
\ No newline at end of file
+    }
+
+# Memoized trend analyses: {(username, variant): (data_version, trends)}
+_expense_trends_cache = {}
+
+def get_expense_trends(username, data, variant=None):
+    """
+    Expense trends memoized per version of the user's data
+    
+    Args:
+        username: Username
+        data: DataFrame containing the user's transactions or an AnalyticsContext
+        variant: Extra cache key for derived data (e.g. the base month of constant pesos)
+        
+    Returns:
+        Dictionary with trend analysis results
+    """
+    version = get_user_data_version(username)
+    cached = _expense_trends_cache.get((username, variant))
+    if cached and cached[0] == version:
+        return cached[1]
+    
+    trends = analyze_expense_trends(data)
+    _expense_trends_cache[(username, variant)] = (version, trends)
+    return trends
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.data_handler import load_user_data, get_user_data_version
+from utils.advanced_analytics import as_analytics_context
+
+# Transacciones previas de la misma categoría que forman la ventana de referencia
+ANOMALY_WINDOW = 30
+# Mínimo de transacciones previas para poder puntuar una transacción
+ANOMALY_MIN_PERIODS = 5
+# z robusto a partir del cual un gasto se considera atípico
+ANOMALY_THRESHOLD = 3.5
+# Piso del MAD relativo a la mediana (evita z infinitos con montos siempre iguales)
+MAD_FLOOR_RATIO = 0.05
+# Filas por bloque al armar las ventanas: acota la memoria a bloque x ventana
+SCORE_CHUNK_SIZE = 20000
+
+SCORE_COLUMNS = ['id', 'date', 'category', 'description', 'amount_pesos',
+                 'rolling_median', 'rolling_mad', 'robust_z', 'is_anomaly']
+
+# Puntajes por usuario: {username: (data_version, scored_df)}
+_anomaly_cache = {}
+
+def _rolling_robust_stats(amounts, groups, window=ANOMALY_WINDOW, min_periods=ANOMALY_MIN_PERIODS):
+    """
+    Mediana y MAD de las `window` transacciones anteriores de la misma categoría.
+    Los arreglos deben venir ordenados por categoría y fecha; las ventanas se
+    arman sobre todo el libro a la vez y se enmascaran en los cambios de categoría.
+
+    Returns:
+        Tupla (mediana, MAD) con NaN donde no hay historia suficiente
+    """
+    n = len(amounts)
+    medians = np.full(n, np.nan)
+    mads = np.full(n, np.nan)
+    if n == 0:
+        return medians, mads
+
+    # La fila i ve los valores i-window .. i-1 (sin incluirse a sí misma)
+    padded_amounts = np.concatenate([np.full(window, np.nan), amounts.astype(float)])
+    padded_groups = np.concatenate([np.full(window, -1), groups])
+    amount_windows = sliding_window_view(padded_amounts, window)
+    group_windows = sliding_window_view(padded_groups, window)
+
+    for start in range(0, n, SCORE_CHUNK_SIZE):
+        stop = min(start + SCORE_CHUNK_SIZE, n)
+        block = np.where(
+            group_windows[start:stop] == groups[start:stop, None],
+            amount_windows[start:stop], np.nan
+        )
+        enough = (~np.isnan(block)).sum(axis=1) >= min_periods
+        if not enough.any():
+            continue
+
+        block = block[enough]
+        median = np.nanmedian(block, axis=1)
+        positions = np.arange(start, stop)[enough]
+        medians[positions] = median
+        mads[positions] = np.nanmedian(np.abs(block - median[:, None]), axis=1)
+
+    return medians, mads
+
+def detect_transaction_anomalies(data, threshold=ANOMALY_THRESHOLD, window=ANOMALY_WINDOW):
+    """
+    Puntuar cada gasto contra la historia reciente de su categoría con un
+    z robusto: 0.6745 * (monto - mediana) / MAD.
+
+    Args:
+        data: DataFrame de transacciones o AnalyticsContext
+        threshold: z a partir del cual un gasto es atípico
+        window: Transacciones previas de la categoría que se consideran
+
+    Returns:
+        DataFrame con un registro por gasto (columnas SCORE_COLUMNS)
+    """
+    expenses = as_analytics_context(data).expenses
+    if expenses.empty:
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+
+    # Fechas y montos ya vienen tipados en el contexto
+    scored = pd.DataFrame({
+        'id': expenses['id'].to_numpy(),
+        'date': expenses['date'].to_numpy(),
+        'category': expenses['category'].fillna('Otros').to_numpy(),
+        'description': expenses['description'].to_numpy(),
+        'amount_pesos': expenses['amount_pesos'].to_numpy(dtype=float)
+    }).sort_values(['category', 'date', 'id'], kind='stable').reset_index(drop=True)
+
+    groups = pd.factorize(scored['category'])[0]
+    medians, mads = _rolling_robust_stats(scored['amount_pesos'].to_numpy(), groups, window)
+    return _with_scores(scored, medians, mads, threshold)
+
+def _with_scores(scored, medians, mads, threshold):
+    """Agregar mediana, MAD, z robusto y la marca de anomalía"""
+    scale = np.maximum(mads, MAD_FLOOR_RATIO * np.abs(medians))
+    scale = np.where(scale > 0, scale, 1.0)
+    robust_z = 0.6745 * (scored['amount_pesos'].to_numpy() - medians) / scale
+
+    scored = scored.copy()
+    scored['rolling_median'] = medians
+    scored['rolling_mad'] = mads
+    scored['robust_z'] = robust_z
+    scored['is_anomaly'] = np.nan_to_num(robust_z, nan=0.0) > threshold
+    return scored[SCORE_COLUMNS]
+
+def _score_appended(cached, new_expenses, threshold, window):
+    """
+    Puntuar sólo los gastos nuevos usando como contexto las últimas `window`
+    transacciones de cada categoría ya puntuadas.
+
+    Returns:
+        DataFrame actualizado, o None si los nuevos gastos no van al final de su categoría
+    """
+    new_scored = detect_transaction_anomalies(new_expenses, threshold, window).iloc[:, :5]
+    last_dates = cached.groupby('category')['date'].max()
+    previous = new_scored['category'].map(last_dates)
+    if (new_scored['date'] < previous).any():
+        return None
+
+    context = cached[cached['category'].isin(new_scored['category'])].groupby('category').tail(window)
+    combined = pd.concat([context.iloc[:, :5], new_scored], ignore_index=True)
+    combined = combined.sort_values(['category', 'date', 'id'], kind='stable').reset_index(drop=True)
+    is_new = combined['id'].isin(new_scored['id']).to_numpy()
+
+    groups = pd.factorize(combined['category'])[0]
+    medians, mads = _rolling_robust_stats(combined['amount_pesos'].to_numpy(), groups, window)
+    rescored = _with_scores(combined[is_new], medians[is_new], mads[is_new], threshold)
+
+    updated = pd.concat([cached, rescored], ignore_index=True)
+    return updated.sort_values(['category', 'date', 'id'], kind='stable').reset_index(drop=True)
+
+def get_transaction_anomalies(username, data=None, threshold=ANOMALY_THRESHOLD):
+    """
+    Obtener los puntajes de anomalía de todos los gastos del usuario.
+    Se guardan en caché por versión de datos; si desde la última vez sólo se
+    agregaron gastos nuevos (sin editar ni borrar), se puntúan únicamente esos.
+
+    Args:
+        username: Nombre de usuario
+        data: DataFrame de transacciones del usuario o AnalyticsContext (se cargan si no se indican)
+        threshold: z a partir del cual un gasto es atípico
+
+    Returns:
+        DataFrame con un registro por gasto (columnas SCORE_COLUMNS)
+    """
+    version = get_user_data_version(username)
+    cached = _anomaly_cache.get(username)
+    if cached and cached[0] == (version, threshold):
+        return cached[1]
+
+    context = as_analytics_context(load_user_data(username) if data is None else data)
+    expenses = context.expenses
+
+    scored = None
+    if cached is not None and cached[0][1] == threshold and not cached[1].empty:
+        previous = cached[1]
+        is_known = expenses['id'].isin(previous['id'])
+        known = expenses[is_known].set_index('id')
+        if len(known) == len(previous):
+            # Los gastos ya puntuados deben seguir iguales para reutilizarlos
+            aligned = previous.set_index('id').loc[known.index]
+            unchanged = (
+                (known['date'].to_numpy() == aligned['date'].to_numpy()).all() and
+                (known['category'].fillna('Otros').to_numpy() == aligned['category'].to_numpy()).all() and
+                np.allclose(known['amount_pesos'].to_numpy(dtype=float), aligned['amount_pesos'].to_numpy())
+            )
+            if unchanged:
+                new_expenses = expenses[~is_known]
+                scored = previous if new_expenses.empty else _score_appended(
+                    previous, new_expenses, threshold, ANOMALY_WINDOW
+                )
+
+    if scored is None:
+        scored = detect_transaction_anomalies(context, threshold)
+
+    _anomaly_cache[username] = ((version, threshold), scored)
+    return scored
@@ -3,11 +3,28 @@ import csv
 import hashlib
 import random
 import string
+from contextlib import contextmanager
 from datetime import datetime
 from .email_sender import send_verification_email
+from .session_store import revoke_user_sessions
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
 
 # Ruta a la base de datos de usuarios
 USERS_DB_PATH = "data/users.csv"
+USER_FIELDS = ['username', 'password_hash', 'email', 'verified', 'verification_code', 'created_at']
+
+# El archivo es de sólo agregado: cada alta o cambio de perfil agrega una fila
+# y la última fila de cada usuario es la vigente. Se compacta (una fila por
+# usuario) cuando las filas reemplazadas superan este mínimo y la mitad de los usuarios.
+COMPACTION_MIN_STALE_ROWS = 100
+USERS_DB_LOCK_PATH = USERS_DB_PATH + ".lock"
+
+# Usuarios cargados en memoria: {'version': (mtime, tamaño), 'users': {username: registro}, 'rows': filas del archivo}
+_users_cache = {'version': None, 'users': {}, 'rows': 0}
 
 def create_users_db_if_not_exists():
     """Crear base de datos de usuarios si no existe"""
@@ -15,7 +32,93 @@ def create_users_db_if_not_exists():
         os.makedirs(os.path.dirname(USERS_DB_PATH), exist_ok=True)
         with open(USERS_DB_PATH, 'w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow(['username', 'password_hash', 'email', 'verified', 'verification_code', 'created_at'])
+            writer.writerow(USER_FIELDS)
+
+@contextmanager
+def _users_db_lock():
+    """Bloqueo exclusivo entre procesos para escribir el archivo de usuarios"""
+    os.makedirs(os.path.dirname(USERS_DB_LOCK_PATH), exist_ok=True)
+    with open(USERS_DB_LOCK_PATH, 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _users_db_version():
+    """Marca de versión del archivo de usuarios (cambia con cada escritura)"""
+    stat = os.stat(USERS_DB_PATH)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_users():
+    """
+    Obtener el diccionario {username: registro} de todos los usuarios.
+    El archivo se vuelve a leer sólo si cambió desde la última carga; si un
+    usuario tiene varias filas, vale la última.
+    """
+    create_users_db_if_not_exists()
+    
+    version = _users_db_version()
+    if _users_cache['version'] == version:
+        return _users_cache['users']
+    
+    users = {}
+    rows = 0
+    with open(USERS_DB_PATH, 'r', newline='') as file:
+        for row in csv.DictReader(file):
+            users[row['username']] = row
+            rows += 1
+    
+    _users_cache['version'] = version
+    _users_cache['users'] = users
+    _users_cache['rows'] = rows
+    return users
+
+def _append_user_record(record):
+    """
+    Agregar un registro al final del archivo (debe llamarse con el bloqueo
+    tomado) y mantener la copia en memoria al día
+    """
+    users = load_users()
+    with open(USERS_DB_PATH, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=USER_FIELDS)
+        writer.writerow(record)
+    
+    users[record['username']] = record
+    _users_cache['version'] = _users_db_version()
+    _users_cache['rows'] += 1
+    
+    stale_rows = _users_cache['rows'] - len(users)
+    if stale_rows >= COMPACTION_MIN_STALE_ROWS and stale_rows > len(users) / 2:
+        _compact_users_db(users)
+
+def _compact_users_db(users):
+    """Reescribir el archivo con una fila por usuario (con el bloqueo tomado)"""
+    temp_path = USERS_DB_PATH + ".tmp"
+    with open(temp_path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=USER_FIELDS)
+        writer.writeheader()
+        writer.writerows(users.values())
+    os.replace(temp_path, USERS_DB_PATH)
+    
+    _users_cache['version'] = _users_db_version()
+    _users_cache['rows'] = len(users)
+
+def compact_users_db():
+    """Compactar el archivo de usuarios descartando las filas reemplazadas"""
+    with _users_db_lock():
+        _compact_users_db(load_users())
+
+def _update_user(username, **changes):
+    """Agregar un registro con los cambios del perfil de un usuario existente"""
+    with _users_db_lock():
+        user = load_users().get(username)
+        if user is None:
+            return False
+        _append_user_record(dict(user, **changes))
+    return True
 
 def hash_password(password):
     """Encriptar una contraseña para guardarla"""
@@ -23,28 +126,12 @@ def hash_password(password):
 
 def check_password(username, password):
     """Verificar si la combinación de usuario/contraseña es válida"""
-    create_users_db_if_not_exists()
-    
-    with open(USERS_DB_PATH, 'r', newline='') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row['username'] == username and row['password_hash'] == hash_password(password):
-                return True
-    return False
+    user = load_users().get(username)
+    return user is not None and user['password_hash'] == hash_password(password)
 
 def username_exists(username):
     """Verificar si un nombre de usuario ya existe"""
-    create_users_db_if_not_exists()
-    
-    if not os.path.exists(USERS_DB_PATH):
-        return False
-    
-    with open(USERS_DB_PATH, 'r', newline='') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row['username'] == username:
-                return True
-    return False
+    return username in load_users()
 
 def generate_verification_code():
     """Generar un código de verificación aleatorio"""
@@ -52,94 +139,39 @@ def generate_verification_code():
 
 def register_user(username, password, email):
     """Registrar un nuevo usuario"""
-    create_users_db_if_not_exists()
-    
-    if username_exists(username):
-        return False
-    
-    # Leer usuarios existentes
-    users = []
-    if os.path.exists(USERS_DB_PATH):
-        with open(USERS_DB_PATH, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            users = list(reader)
-    
-    # Agregar nuevo usuario
-    users.append({
-        'username': username,
-        'password_hash': hash_password(password),
-        'email': email,
-        'verified': 'True',  # Auto-verify user (no email verification)
-        'verification_code': '',
-        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
-    
-    # Guardar todos los usuarios
-    with open(USERS_DB_PATH, 'w', newline='') as file:
-        fieldnames = ['username', 'password_hash', 'email', 'verified', 'verification_code', 'created_at']
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(users)
+    with _users_db_lock():
+        # Comprobar dentro del bloqueo para que dos altas simultáneas no repitan el usuario
+        if username in load_users():
+            return False
+        
+        # Agregar el nuevo usuario como una única fila al final del archivo
+        _append_user_record({
+            'username': username,
+            'password_hash': hash_password(password),
+            'email': email,
+            'verified': 'True',  # Auto-verify user (no email verification)
+            'verification_code': '',
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
     
     return True
 
 def verify_email(username, verification_code):
     """Verificar el correo electrónico de un usuario con el código de verificación"""
-    create_users_db_if_not_exists()
-    
-    users = []
-    found = False
-    
-    with open(USERS_DB_PATH, 'r', newline='') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row['username'] == username and row['verification_code'] == verification_code:
-                row['verified'] = 'True'
-                found = True
-            users.append(row)
-    
-    if found:
-        with open(USERS_DB_PATH, 'w', newline='') as file:
-            fieldnames = ['username', 'password_hash', 'email', 'verified', 'verification_code', 'created_at']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(users)
-        return True
+    user = load_users().get(username)
+    if user is None or user['verification_code'] != verification_code:
+        return False
     
-    return False
+    return _update_user(username, verified='True')
 
 def get_user_email(username):
     """Obtener el correo electrónico del usuario"""
-    create_users_db_if_not_exists()
-    
-    with open(USERS_DB_PATH, 'r', newline='') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row['username'] == username:
-                return row['email']
-    return None
+    user = load_users().get(username)
+    return user['email'] if user else None
 
 def change_password(username, new_password):
-    """Cambiar la contraseña del usuario"""
-    create_users_db_if_not_exists()
-    
-    users = []
-    found = False
-    
-    with open(USERS_DB_PATH, 'r', newline='') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row['username'] == username:
-                row['password_hash'] = hash_password(new_password)
-                found = True
-            users.append(row)
-    
-    if found:
-        with open(USERS_DB_PATH, 'w', newline='') as file:
-            fieldnames = ['username', 'password_hash', 'email', 'verified', 'verification_code', 'created_at']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(users)
-        return True
-    
-    return False
+    """Cambiar la contraseña del usuario y cerrar todas sus sesiones recordadas"""
+    if not _update_user(username, password_hash=hash_password(new_password)):
+        return False
+    revoke_user_sessions(username)
+    return True
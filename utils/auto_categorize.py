@@ -1,6 +1,7 @@
 import pandas as pd
 from collections import Counter
 import re
+from utils.merchant_rules import match_merchant_rule
 
 def get_category_suggestions(username, df, description):
     """
@@ -107,18 +108,33 @@ def get_category_suggestions(username, df, description):
     return result
 
 
-def suggest_transaction_details(username, df, description):
+def suggest_transaction_details(username, df, description, transaction_type=None):
     """
     Suggest full transaction details based on similar past transactions.
+    User-defined merchant rules are checked first and, when one matches,
+    it wins over the statistical suggestion.
     
     Args:
         username: The username
         df: DataFrame containing user transactions
         description: The description of the new transaction
+        transaction_type: Optional type ('Ingreso'/'Gasto') to restrict rules
         
     Returns:
         A dictionary with suggested transaction details
     """
+    if description:
+        rule = match_merchant_rule(username, description, transaction_type)
+        if rule:
+            return {
+                'type': rule['type'],
+                'category': rule['category'],
+                'payment_method': None,
+                'fixed_expense': bool(rule['fixed_expense']),
+                'confidence': 1.0,
+                'source': 'rule'
+            }
+    
     suggestions = get_category_suggestions(username, df, description)
     
     if not suggestions:
@@ -133,5 +149,6 @@ def suggest_transaction_details(username, df, description):
         'category': top_suggestion['category'],
         'payment_method': top_suggestion['payment_method'],
         'fixed_expense': top_suggestion['fixed_expense'],
-        'confidence': min(top_suggestion['score'], 1.0)  # Cap confidence at 1.0
+        'confidence': min(top_suggestion['score'], 1.0),  # Cap confidence at 1.0
+        'source': 'history'
     }
\ No newline at end of file
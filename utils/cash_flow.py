@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.data_handler import load_user_data
+from utils.accounts import load_user_accounts
+from utils.installment_calculator import add_months_array
+from utils.installment_obligations import get_installments_due
+from utils.recurring_detection import get_recurring_transactions, get_recurring_keys
+
+# Paso de cada frecuencia: (unidad, cantidad) — meses calendario o días
+FREQUENCY_STEPS = {
+    'Semanal': ('D', 7),
+    'Quincenal': ('D', 14),
+    'Mensual': ('M', 1),
+    'Bimestral': ('M', 2),
+    'Anual': ('M', 12)
+}
+
+EVENT_COLUMNS = ['date', 'account_id', 'kind', 'description', 'amount', 'currency']
+
+def expand_series(series, start, end):
+    """
+    Proyectar series periódicas (una fila por serie con last_date, step_unit,
+    step, amount, currency, account_id, kind y description) a eventos dentro de (start, end].
+    Cada serie se repite tantas veces como pasos entran en el horizonte y las
+    fechas se calculan de una vez sobre los arreglos resultantes.
+    """
+    if series.empty:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    last_dates = series['last_date'].to_numpy(dtype='datetime64[D]')
+    steps = series['step'].to_numpy(dtype=np.int64)
+    is_monthly = (series['step_unit'] == 'M').to_numpy()
+
+    # Cantidad de pasos necesarios para cubrir el horizonte (con un margen)
+    span_days = (np.datetime64(end, 'D') - last_dates).astype(np.int64)
+    step_days = np.where(is_monthly, steps * 28, steps)
+    counts = np.clip(span_days // step_days + 1, 0, None)
+
+    rows = np.repeat(np.arange(len(series)), counts)
+    k = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    dates = np.where(
+        is_monthly[rows],
+        add_months_array(last_dates[rows], k * steps[rows]),
+        last_dates[rows] + (k * steps[rows]).astype('timedelta64[D]')
+    )
+
+    events = pd.DataFrame({
+        'date': dates,
+        'account_id': series['account_id'].to_numpy()[rows],
+        'kind': series['kind'].to_numpy()[rows],
+        'description': series['description'].to_numpy()[rows],
+        'amount': series['amount'].to_numpy(dtype=float)[rows],
+        'currency': series['currency'].to_numpy()[rows]
+    })
+    in_window = (events['date'] > np.datetime64(start, 'D')) & (events['date'] <= np.datetime64(end, 'D'))
+    return events[in_window]
+
+def fixed_expense_series(df, recurring, today):
+    """Series de gastos fijos (sin cuotas): último monto y frecuencia detectada, mensual por defecto"""
+    is_fixed = df['fixed_expense'].astype(str).str.lower().isin(['true', '1'])
+    is_installment = (df['payment_method'] == 'Tarjeta de Crédito') & (df['installments_total'] > 1)
+    fixed = df[is_fixed & (df['type'] == 'Gasto') & ~is_installment]
+    if fixed.empty:
+        return pd.DataFrame()
+
+    fixed = fixed.assign(key=get_recurring_keys(fixed), date=pd.to_datetime(fixed['date']))
+    fixed = fixed[fixed['key'] != ''].sort_values(['date', 'id']).groupby('key').last()
+    frequency = fixed.index.map(recurring.set_index('key')['frequency']).fillna('Mensual') \
+        if not recurring.empty else pd.Index(['Mensual'] * len(fixed))
+
+    step_unit = np.array([FREQUENCY_STEPS[f][0] for f in frequency])
+    step = np.array([FREQUENCY_STEPS[f][1] for f in frequency])
+    series = pd.DataFrame({
+        'last_date': fixed['date'].to_numpy(),
+        'step_unit': step_unit,
+        'step': step,
+        'amount': -fixed['amount'].astype(float).to_numpy(),
+        'currency': fixed['currency'].to_numpy(),
+        'account_id': fixed['account_id'].to_numpy(),
+        'kind': 'Gasto fijo',
+        'description': fixed['description'].to_numpy()
+    })
+
+    # Descartar gastos fijos que dejaron de aparecer hace más de dos períodos
+    period_days = np.where(step_unit == 'M', step * 31, step)
+    stale = (np.datetime64(today, 'D') - series['last_date'].to_numpy(dtype='datetime64[D]')).astype(np.int64) > 2 * period_days
+    return series[~stale]
+
+def recurring_income_series(recurring):
+    """Series de ingresos recurrentes activos (sueldos, alquileres cobrados)"""
+    income = recurring[(recurring['type'] == 'Ingreso') & recurring['active']] if not recurring.empty else recurring
+    if income.empty:
+        return pd.DataFrame()
+
+    return pd.DataFrame({
+        'last_date': income['last_date'].to_numpy(),
+        'step_unit': [FREQUENCY_STEPS[f][0] for f in income['frequency']],
+        'step': [FREQUENCY_STEPS[f][1] for f in income['frequency']],
+        'amount': income['amount'].astype(float).to_numpy(),
+        'currency': income['currency'].to_numpy(),
+        'account_id': income['account_id'].to_numpy(),
+        'kind': 'Ingreso recurrente',
+        'description': income['description'].to_numpy()
+    })
+
+def project_cash_flow(username, months_ahead=6, df=None, accounts_df=None, today=None):
+    """
+    Proyectar el saldo diario de cada cuenta para los próximos meses,
+    combinando cuotas pendientes, gastos fijos e ingresos recurrentes.
+
+    El saldo de una cuenta ya descuenta el total de una compra en cuotas al
+    registrarla, así que las cuotas futuras se suman al saldo inicial y se
+    descuentan en su fecha de vencimiento para reflejar el flujo real de caja.
+
+    Args:
+        username: Nombre de usuario
+        months_ahead: Meses a proyectar
+        df: Transacciones del usuario (se cargan si no se indican)
+        accounts_df: Cuentas del usuario (se cargan si no se indican)
+        today: Fecha de inicio de la proyección
+
+    Returns:
+        Diccionario con los eventos proyectados, el saldo diario por cuenta
+        (DataFrame fecha x cuenta), el saldo inicial y la primera fecha en que
+        cada cuenta queda en negativo
+    """
+    if df is None:
+        df = load_user_data(username)
+    if accounts_df is None:
+        accounts_df = load_user_accounts(username)
+
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    end = pd.Timestamp(add_months_array([today], [months_ahead])[0])
+    account_ids = accounts_df['id'].astype(int).to_numpy()
+    days = pd.date_range(today, end, freq='D')
+
+    events = [pd.DataFrame(columns=EVENT_COLUMNS)]
+    add_back = pd.Series(0.0, index=account_ids)
+
+    if not df.empty:
+        # Cuotas pendientes desde hoy
+        installments = get_installments_due(username, today)
+        if not installments.empty:
+            by_account = installments.groupby(pd.to_numeric(installments['account_id'], errors='coerce'))['amount'].sum()
+            add_back = add_back.add(by_account, fill_value=0).reindex(account_ids, fill_value=0)
+            events.append(pd.DataFrame({
+                'date': installments['due_date'].to_numpy(),
+                'account_id': installments['account_id'].to_numpy(),
+                'kind': 'Cuota',
+                'description': installments['description'] + ' (' + installments['installment_number'].astype(str) +
+                               '/' + installments['total_installments'].astype(str) + ')',
+                'amount': -installments['amount'].to_numpy(),
+                'currency': installments['currency'].to_numpy()
+            }))
+
+        recurring = get_recurring_transactions(username, df)
+        series = pd.concat([fixed_expense_series(df, recurring, today), recurring_income_series(recurring)], ignore_index=True)
+        if not series.empty:
+            events.append(expand_series(series, today - pd.Timedelta(days=1), end))
+
+    events = pd.concat(events, ignore_index=True)
+    events['account_id'] = pd.to_numeric(events['account_id'], errors='coerce')
+    events['amount'] = events['amount'].astype(float)
+    events['date'] = pd.to_datetime(events['date'])
+    events = events[events['account_id'].isin(account_ids) & (events['date'] <= end)]
+    events = events.sort_values(['date', 'account_id'], kind='stable').reset_index(drop=True)
+
+    starting_balance = pd.Series(accounts_df['balance'].astype(float).to_numpy(), index=account_ids) + add_back
+
+    # Matriz día x cuenta con los movimientos, acumulada para obtener los saldos
+    day_index = (events['date'].to_numpy(dtype='datetime64[D]') - np.datetime64(today, 'D')).astype(np.int64)
+    account_index = np.searchsorted(np.sort(account_ids), events['account_id'].to_numpy())
+    sorted_ids = np.sort(account_ids)
+    movements = np.zeros((len(days), len(sorted_ids)))
+    np.add.at(movements, (day_index, account_index), events['amount'].to_numpy(dtype=float))
+    balances = starting_balance.reindex(sorted_ids).to_numpy()[None, :] + np.cumsum(movements, axis=0)
+    daily = pd.DataFrame(balances, index=days, columns=sorted_ids)
+
+    events['balance'] = events.groupby('account_id')['amount'].cumsum() + events['account_id'].map(starting_balance)
+
+    negative = balances < 0
+    first_negative = {
+        account_id: days[negative[:, i].argmax()] if negative[:, i].any() else None
+        for i, account_id in enumerate(sorted_ids)
+    }
+
+    return {
+        'events': events,
+        'daily': daily,
+        'starting_balance': starting_balance,
+        'first_negative': first_negative
+    }
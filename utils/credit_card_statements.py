@@ -0,0 +1,162 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.data_handler import load_user_data, get_user_data_version
+from utils.accounts import load_user_accounts, get_user_accounts_file, get_card_cycle_days
+
+STATEMENT_COLUMNS = [
+    'account_id', 'statement_month', 'closing_date', 'due_date', 'currency',
+    'amount', 'amount_pesos', 'charges'
+]
+
+# Totales por resumen: {username: ((data_version, accounts_mtime), statements_df)}
+_statement_cache = {}
+
+def _day_in_month(months, day):
+    """Fecha del día indicado en cada mes (ajustada al último día si el mes es más corto)"""
+    first_day = months.astype('datetime64[D]')
+    days_in_month = ((months + 1).astype('datetime64[D]') - first_day).astype(np.int64)
+    return first_day + np.minimum(day, days_in_month) - 1
+
+def assign_statement_months(dates, closing_days):
+    """
+    Mes del resumen en el que entra cada consumo: el del primer cierre
+    posterior o igual a la fecha (si el consumo es después del cierre del
+    mes, pasa al resumen del mes siguiente).
+
+    Args:
+        dates: Arreglo de fechas de los consumos
+        closing_days: Día de cierre de la tarjeta de cada consumo
+
+    Returns:
+        Arreglo datetime64[M] con el mes de cierre del resumen
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    months = dates.astype('datetime64[M]')
+    after_closing = dates > _day_in_month(months, closing_days)
+    return months + after_closing.astype(np.int64).astype('timedelta64[M]')
+
+def build_statement_charges(df, accounts_df):
+    """
+    Asignar cada consumo con tarjeta de crédito (y cada una de sus cuotas) a
+    un resumen. La primera cuota entra en el resumen que corresponde a la
+    fecha de compra y las siguientes en los resúmenes consecutivos, según el
+    día de cierre configurado en cada tarjeta.
+
+    Args:
+        df: DataFrame de transacciones
+        accounts_df: DataFrame de cuentas del usuario
+
+    Returns:
+        DataFrame con una fila por cuota: account_id, transaction_id, description,
+        installment_number, total_installments, statement_month, closing_date,
+        due_date, amount, currency y amount_pesos
+    """
+    cycles = get_card_cycle_days(accounts_df)
+    account_ids = pd.to_numeric(df['account_id'], errors='coerce') if 'account_id' in df.columns else pd.Series(np.nan, index=df.index)
+    charges = df[(df['type'] == 'Gasto') & account_ids.isin(cycles.index)]
+    if charges.empty:
+        return pd.DataFrame(columns=[
+            'account_id', 'transaction_id', 'description', 'installment_number', 'total_installments',
+            'statement_month', 'closing_date', 'due_date', 'amount', 'currency', 'amount_pesos'
+        ])
+
+    card_ids = account_ids[charges.index].astype(int).to_numpy()
+    closing_days = cycles['closing_day'].reindex(card_ids).to_numpy()
+    due_days = cycles['due_day'].reindex(card_ids).to_numpy()
+
+    # Las compras en cuotas se reparten en tantos resúmenes como cuotas tengan
+    in_installments = (charges['payment_method'] == 'Tarjeta de Crédito').to_numpy()
+    total = np.where(
+        in_installments,
+        pd.to_numeric(charges['installments_total'], errors='coerce').fillna(1).clip(lower=1).astype(int).to_numpy(),
+        1
+    )
+    rows = np.repeat(np.arange(len(charges)), total)
+    installment_number = np.arange(len(rows)) - np.repeat(np.cumsum(total) - total, total) + 1
+
+    first_statement = assign_statement_months(pd.to_datetime(charges['date']).to_numpy(), closing_days)
+    statement_month = first_statement[rows] + (installment_number - 1).astype('timedelta64[M]')
+    closing_date = _day_in_month(statement_month, closing_days[rows])
+    # El vencimiento cae en el mismo mes del cierre si su día es posterior, si no en el siguiente
+    due_month = statement_month + (due_days[rows] <= closing_days[rows]).astype(np.int64).astype('timedelta64[M]')
+    due_date = _day_in_month(due_month, due_days[rows])
+
+    amount = (pd.to_numeric(charges['amount'], errors='coerce').fillna(0).to_numpy() / total)[rows]
+    amount_pesos = (pd.to_numeric(charges['amount_pesos'], errors='coerce').fillna(0).to_numpy() / total)[rows]
+
+    return pd.DataFrame({
+        'account_id': card_ids[rows],
+        'transaction_id': charges['id'].to_numpy()[rows],
+        'description': charges['description'].to_numpy()[rows],
+        'installment_number': installment_number,
+        'total_installments': total[rows],
+        'statement_month': statement_month,
+        'closing_date': closing_date,
+        'due_date': due_date,
+        'amount': amount,
+        'currency': charges['currency'].to_numpy()[rows],
+        'amount_pesos': amount_pesos
+    })
+
+def summarize_statements(charges):
+    """Totales de cada resumen por tarjeta y moneda"""
+    if charges.empty:
+        return pd.DataFrame(columns=STATEMENT_COLUMNS)
+
+    statements = charges.groupby(
+        ['account_id', 'statement_month', 'closing_date', 'due_date', 'currency'], sort=True
+    ).agg(
+        amount=('amount', 'sum'),
+        amount_pesos=('amount_pesos', 'sum'),
+        charges=('amount', 'size')
+    ).reset_index()
+    return statements[STATEMENT_COLUMNS]
+
+def get_statement_totals(username, df=None, accounts_df=None):
+    """
+    Totales de todos los resúmenes del usuario, recalculados sólo cuando
+    cambian sus transacciones o la configuración de sus cuentas.
+
+    Returns:
+        DataFrame con las columnas STATEMENT_COLUMNS, ordenado por tarjeta y fecha de cierre
+    """
+    accounts_file = get_user_accounts_file(username)
+    version = (
+        get_user_data_version(username),
+        os.stat(accounts_file).st_mtime_ns if os.path.exists(accounts_file) else None
+    )
+    cached = _statement_cache.get(username)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    if df is None:
+        df = load_user_data(username)
+    if accounts_df is None:
+        accounts_df = load_user_accounts(username)
+
+    statements = summarize_statements(build_statement_charges(df, accounts_df)) if not df.empty \
+        else pd.DataFrame(columns=STATEMENT_COLUMNS)
+    _statement_cache[username] = (version, statements)
+    return statements
+
+def get_next_statements(username, today=None, df=None, accounts_df=None):
+    """
+    Próximo resumen de cada tarjeta: el primero que todavía no cerró.
+
+    Args:
+        username: Nombre de usuario
+        today: Fecha de referencia (hoy si no se indica)
+
+    Returns:
+        DataFrame con una fila por tarjeta y moneda del próximo resumen
+    """
+    statements = get_statement_totals(username, df, accounts_df)
+    if statements.empty:
+        return statements
+
+    today = np.datetime64(pd.Timestamp(today or datetime.now()).normalize(), 'D')
+    open_statements = statements[statements['closing_date'].to_numpy(dtype='datetime64[D]') >= today]
+    next_closing = open_statements.groupby('account_id')['closing_date'].transform('min')
+    return open_statements[open_statements['closing_date'] == next_closing].reset_index(drop=True)
@@ -3,6 +3,15 @@ import csv
 import pandas as pd
 from datetime import datetime
 import sys
+import shutil
+
+# Columnas del archivo de transacciones, en el orden en que se guardan
+TRANSACTION_COLUMNS = [
+    'id', 'date', 'type', 'category', 'subcategory', 'description',
+    'amount', 'currency', 'exchange_rate', 'amount_pesos',
+    'payment_method', 'fixed_expense', 'installments_total',
+    'installments_paid', 'created_at', 'account_id'
+]
 
 def get_user_transactions_file(username):
     """Get the path to a user's transactions file"""
@@ -18,12 +27,15 @@ def create_transactions_file_if_not_exists(username):
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, 'w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow([
-                'id', 'date', 'type', 'category', 'subcategory', 'description', 
-                'amount', 'currency', 'exchange_rate', 'amount_pesos',
-                'payment_method', 'fixed_expense', 'installments_total', 
-                'installments_paid', 'created_at', 'account_id'
-            ])
+            writer.writerow(TRANSACTION_COLUMNS)
+
+def get_user_data_version(username):
+    """Get a version marker for a user's transactions file (changes on every write)"""
+    file_path = get_user_transactions_file(username)
+    if not os.path.exists(file_path):
+        return None
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
 
 def load_user_data(username):
     """Load a user's transaction data"""
@@ -35,12 +47,7 @@ def load_user_data(username):
         return df
     except Exception as e:
         print(f"Error loading user data: {e}")
-        return pd.DataFrame(columns=[
-            'id', 'date', 'type', 'category', 'subcategory', 'description', 
-            'amount', 'currency', 'exchange_rate', 'amount_pesos',
-            'payment_method', 'fixed_expense', 'installments_total', 
-            'installments_paid', 'created_at', 'account_id'
-        ])
+        return pd.DataFrame(columns=TRANSACTION_COLUMNS)
 
 def get_next_id(username):
     """Get the next available ID for a transaction"""
@@ -79,6 +86,39 @@ def save_transaction(username, transaction_data):
     file_path = get_user_transactions_file(username)
     df.to_csv(file_path, index=False)
     
+    # Mantener actualizado el índice de huellas para importaciones idempotentes
+    try:
+        from utils.dedupe_index import update_fingerprint_index
+        update_fingerprint_index(
+            username,
+            added=[transaction_data],
+            removed=[old_transaction] if is_update else None
+        )
+    except Exception as e:
+        print(f"Error al actualizar índice de huellas: {e}")
+    
+    # Mantener actualizada la tabla de cuotas pendientes
+    try:
+        from utils.installment_obligations import update_installment_obligations
+        update_installment_obligations(
+            username,
+            added=[transaction_data],
+            removed=[old_transaction] if is_update else None
+        )
+    except Exception as e:
+        print(f"Error al actualizar tabla de cuotas: {e}")
+    
+    # Actualizar el progreso de las metas vinculadas
+    try:
+        from utils.financial_goals import update_linked_goals
+        update_linked_goals(
+            username,
+            added=[transaction_data],
+            removed=[old_transaction] if is_update else None
+        )
+    except Exception as e:
+        print(f"Error al actualizar metas vinculadas: {e}")
+    
     # Actualizar saldos de cuentas
     # Si tenemos un account_id, actualizamos su saldo
     try:
@@ -147,6 +187,81 @@ def delete_transaction(username, transaction_id):
     # Guardar en el archivo
     file_path = get_user_transactions_file(username)
     df.to_csv(file_path, index=False)
+    
+    # Quitar la transacción del índice de huellas
+    if not transaction.empty:
+        try:
+            from utils.dedupe_index import update_fingerprint_index
+            update_fingerprint_index(username, removed=[transaction.iloc[0].to_dict()])
+        except Exception as e:
+            print(f"Error al actualizar índice de huellas: {e}")
+        
+        try:
+            from utils.installment_obligations import update_installment_obligations
+            update_installment_obligations(username, removed=[transaction.iloc[0].to_dict()])
+        except Exception as e:
+            print(f"Error al actualizar tabla de cuotas: {e}")
+        
+        try:
+            from utils.financial_goals import update_linked_goals
+            update_linked_goals(username, removed=[transaction.iloc[0].to_dict()])
+        except Exception as e:
+            print(f"Error al actualizar metas vinculadas: {e}")
+    
+    return True
+
+def commit_staged_transactions(username, staging_path, balance_deltas=None, goal_contributions=None):
+    """
+    Append a staged batch of transactions to the user's file in a single write.
+    
+    Files written by older versions may have their columns in another order, or
+    lack some of them: the staged rows are then reordered to the existing header,
+    or the whole file is rewritten with the missing columns added.
+    
+    Args:
+        username: The username
+        staging_path: CSV file without header, with rows in TRANSACTION_COLUMNS order
+        balance_deltas: Optional dict {account_id: net amount} to apply to account balances
+        goal_contributions: Optional Series {goal id: amount} the staged rows add to linked goals
+    """
+    create_transactions_file_if_not_exists(username)
+    
+    file_path = get_user_transactions_file(username)
+    with open(file_path, 'r', newline='') as file:
+        header = next(csv.reader(file), [])
+    
+    if header == TRANSACTION_COLUMNS:
+        with open(staging_path, 'r', newline='') as source, open(file_path, 'a', newline='') as target:
+            shutil.copyfileobj(source, target)
+    else:
+        staged = pd.read_csv(staging_path, header=None, names=TRANSACTION_COLUMNS)
+        if header and set(TRANSACTION_COLUMNS) <= set(header):
+            staged.reindex(columns=header).to_csv(file_path, mode='a', header=False, index=False)
+        else:
+            existing = pd.read_csv(file_path) if header else pd.DataFrame(columns=TRANSACTION_COLUMNS)
+            pd.concat([existing, staged], ignore_index=True).to_csv(file_path, index=False)
+    
+    # Sumar los movimientos importados a las metas vinculadas
+    if goal_contributions is not None and not goal_contributions.empty:
+        try:
+            from utils.financial_goals import apply_goal_contributions
+            apply_goal_contributions(username, goal_contributions)
+        except Exception as e:
+            print(f"Error al actualizar metas vinculadas: {e}")
+    
+    # Actualizar saldos una sola vez por cuenta
+    if balance_deltas:
+        try:
+            from utils.accounts import update_account_balance
+            
+            for account_id, delta in balance_deltas.items():
+                if delta > 0:
+                    update_account_balance(username, account_id, delta, 'add')
+                elif delta < 0:
+                    update_account_balance(username, account_id, -delta, 'subtract')
+        except Exception as e:
+            print(f"Error al actualizar saldo de cuenta: {e}")
+    
     return True
 
 def get_transaction_by_id(username, transaction_id):
@@ -0,0 +1,145 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.merchant_rules import normalize_descriptions
+
+# Índices cargados por usuario: {username: (mtime, Serie {huella: cantidad})}
+_fingerprint_cache = {}
+
+def get_user_fingerprints_file(username):
+    """Obtener la ruta al índice de huellas de transacciones del usuario"""
+    os.makedirs(f"data/users/{username}", exist_ok=True)
+    return f"data/users/{username}/fingerprints.npy"
+
+def _empty_index():
+    return pd.Series(np.array([], dtype=np.int64), index=pd.Index(np.array([], dtype=np.uint64)))
+
+def compute_fingerprints(df):
+    """
+    Calcular la huella canónica de cada transacción de un DataFrame: fecha,
+    monto en centavos, moneda, descripción normalizada y cuenta, combinados
+    en un hash de 64 bits.
+    """
+    if df.empty:
+        return pd.Series(np.array([], dtype=np.uint64), index=df.index)
+
+    codes, uniques = pd.factorize(df['description'].fillna(''))
+    descriptions = normalize_descriptions(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)[codes]
+    accounts = pd.to_numeric(df['account_id'], errors='coerce') if 'account_id' in df.columns \
+        else pd.Series(np.nan, index=df.index)
+
+    canonical = pd.DataFrame({
+        'date': pd.to_datetime(df['date'], errors='coerce', format='ISO8601').dt.normalize().to_numpy(),
+        'cents': np.round(pd.to_numeric(df['amount'], errors='coerce').fillna(0).to_numpy(dtype=float) * 100),
+        'currency': df['currency'].fillna('').astype(str).str.upper().to_numpy(dtype=object),
+        'description': descriptions,
+        # Sin cuenta se representa como -1
+        'account': accounts.fillna(-1).to_numpy(dtype=float).astype(np.int64)
+    })
+    return pd.Series(pd.util.hash_pandas_object(canonical, index=False).to_numpy(), index=df.index)
+
+def compute_fingerprint(transaction_data):
+    """Huella canónica de una sola transacción (diccionario)"""
+    return compute_fingerprints(pd.DataFrame([transaction_data])).iloc[0]
+
+def build_fingerprint_index(df):
+    """Índice {huella: cantidad} de un DataFrame de transacciones"""
+    return compute_fingerprints(df).value_counts() if not df.empty else _empty_index()
+
+def rebuild_fingerprint_index(username):
+    """Reconstruir el índice completo a partir del archivo de transacciones"""
+    from utils.data_handler import load_user_data
+
+    index = build_fingerprint_index(load_user_data(username))
+    save_fingerprint_index(username, index)
+    return index
+
+def load_fingerprint_index(username):
+    """
+    Cargar el índice de huellas del usuario: una Serie con la cantidad de
+    transacciones de cada huella. Si todavía no existe, se calcula a partir de
+    sus transacciones (y se guarda con la próxima escritura del índice).
+    """
+    from utils.data_handler import load_user_data
+
+    file_path = get_user_fingerprints_file(username)
+    if not os.path.exists(file_path):
+        return build_fingerprint_index(load_user_data(username))
+
+    mtime = os.path.getmtime(file_path)
+    cached = _fingerprint_cache.get(username)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        fingerprints, counts = np.load(file_path)
+        index = pd.Series(counts.astype(np.int64), index=pd.Index(fingerprints))
+    except Exception as e:
+        print(f"Error al cargar índice de huellas: {e}")
+        return rebuild_fingerprint_index(username)
+
+    _fingerprint_cache[username] = (mtime, index)
+    return index
+
+def save_fingerprint_index(username, index):
+    """Guardar el índice de huellas del usuario (huellas y cantidades en un solo arreglo)"""
+    index = index[index > 0].astype(np.int64)
+    file_path = get_user_fingerprints_file(username)
+    with open(file_path, 'wb') as file:
+        np.save(file, np.vstack([index.index.to_numpy(dtype=np.uint64), index.to_numpy(dtype=np.uint64)]))
+    _fingerprint_cache[username] = (os.path.getmtime(file_path), index)
+
+def update_fingerprint_index(username, added=None, removed=None):
+    """
+    Actualizar el índice de forma incremental
+
+    Args:
+        username: Nombre de usuario
+        added: Transacciones (diccionarios) que se agregaron
+        removed: Transacciones (diccionarios) que se eliminaron
+    """
+    if not os.path.exists(get_user_fingerprints_file(username)):
+        # El archivo de transacciones ya refleja el cambio: basta con construir el índice
+        rebuild_fingerprint_index(username)
+        return
+
+    index = load_fingerprint_index(username)
+    delta = build_fingerprint_index(pd.DataFrame(added or [])).sub(
+        build_fingerprint_index(pd.DataFrame(removed or [])), fill_value=0
+    )
+    if not delta.empty:
+        index = index.add(delta, fill_value=0)
+    save_fingerprint_index(username, index)
+
+def mark_already_imported(index, fingerprints, seen_counts):
+    """
+    Marcar las filas de un bloque que ya están registradas.
+    Dos filas idénticas dentro de un mismo extracto son legítimas, por lo que
+    la k-ésima aparición de una huella sólo es duplicada si el índice ya
+    tenía al menos k+1 transacciones con esa huella.
+
+    Args:
+        index: Índice {huella: cantidad} previo a la importación
+        fingerprints: Serie de huellas del bloque
+        seen_counts: Apariciones de cada huella en bloques anteriores
+
+    Returns:
+        Tupla (máscara booleana con True en las filas duplicadas, seen_counts actualizado)
+    """
+    codes, uniques = pd.factorize(fingerprints)
+    occurrence = seen_counts.reindex(uniques, fill_value=0).to_numpy()[codes] + \
+        pd.Series(codes).groupby(codes).cumcount().to_numpy()
+    existing = index.reindex(uniques, fill_value=0).to_numpy()[codes]
+
+    chunk_counts = pd.Series(np.bincount(codes, minlength=len(uniques)), index=pd.Index(uniques))
+    seen_counts = seen_counts.add(chunk_counts, fill_value=0).astype(np.int64)
+    return pd.Series(occurrence < existing, index=fingerprints.index), seen_counts
+
+def merge_imported_fingerprints(index, seen_counts):
+    """
+    Índice después de una importación: cada huella queda con la mayor cantidad
+    entre la que ya tenía y la que apareció en el extracto.
+    """
+    if seen_counts.empty:
+        return index
+    return pd.concat([index, seen_counts], axis=1).fillna(0).max(axis=1).astype(np.int64)
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+from utils.data_handler import load_user_data, get_user_data_version
+from utils.merchant_rules import normalize_descriptions
+
+# Parámetros de MinHash / LSH
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+EMPTY_SIGNATURE = (1 << 32) - 1
+
+# Umbrales para considerar dos transacciones como posibles duplicados
+SIMILARITY_THRESHOLD = 0.5
+DATE_TOLERANCE_DAYS = 3
+DATE_BUCKET_DAYS = 7
+
+_rng = np.random.default_rng(20240501)
+# Hash universal multiply-shift: ((a * x + b) mod 2^64) >> 32
+_PERM_A = _rng.integers(1, 1 << 63, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 1 << 61, size=ROWS_PER_BAND, dtype=np.uint64)
+_KEY_MIX = _rng.integers(1, 1 << 61, size=4, dtype=np.uint64)
+
+# Índices por usuario: {username: (data_version, index)}
+_duplicate_index_cache = {}
+
+def _minhash_chunk(texts):
+    """
+    Firmas MinHash de un bloque de descripciones ya normalizadas.
+    Los shingles de 3 caracteres se hashean de forma vectorizada sobre
+    los códigos de todos los textos concatenados.
+    """
+    texts = [t.ljust(SHINGLE_SIZE) if t else '' for t in texts]
+    lengths = np.array([len(t) for t in texts], dtype=np.int64)
+    gram_counts = np.maximum(lengths - SHINGLE_SIZE + 1, 0)
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), EMPTY_SIGNATURE, dtype=np.uint64)
+
+    has_shingles = gram_counts > 0
+    if not has_shingles.any():
+        return signatures
+
+    codes = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    starts = np.repeat(np.cumsum(lengths) - lengths, gram_counts)
+    starts += np.arange(len(starts)) - np.repeat(np.cumsum(gram_counts) - gram_counts, gram_counts)
+
+    grams = np.zeros(len(starts), dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        grams = grams * np.uint64(1000003) + codes[starts + offset]
+    grams %= np.uint64(1 << 32)
+
+    hashed = (grams[:, None] * _PERM_A[None, :] + _PERM_B[None, :]) >> np.uint64(32)
+    offsets = np.cumsum(gram_counts[has_shingles]) - gram_counts[has_shingles]
+    signatures[has_shingles] = np.minimum.reduceat(hashed, offsets, axis=0)
+    return signatures
+
+def compute_minhash_signatures(descriptions, chunk_size=2000):
+    """
+    Calcular las firmas MinHash de una lista de descripciones.
+    Cada descripción distinta se procesa una sola vez y todas las permutaciones
+    se evalúan juntas sobre el vector de shingles, por bloques para acotar memoria.
+
+    Returns:
+        Matriz (n, NUM_PERMUTATIONS) de uint64
+    """
+    codes, uniques = pd.factorize(pd.Series(descriptions, dtype=object).fillna(''))
+    if len(uniques) == 0:
+        return np.empty((len(codes), NUM_PERMUTATIONS), dtype=np.uint64)
+
+    normalized = normalize_descriptions(pd.Series(uniques, dtype=object)).tolist()
+    unique_signatures = np.vstack([
+        _minhash_chunk(normalized[start:start + chunk_size])
+        for start in range(0, len(normalized), chunk_size)
+    ])
+    return unique_signatures[codes]
+
+def _amount_keys(df):
+    """Claves de monto (centavos + moneda) para los buckets LSH"""
+    cents = np.round(pd.to_numeric(df['amount'], errors='coerce').fillna(0).to_numpy() * 100).astype(np.int64)
+    currency = pd.util.hash_array(df['currency'].fillna('').astype(str).to_numpy()).astype(np.int64)
+    return cents, currency
+
+def _day_numbers(df):
+    """Días desde época para cada transacción"""
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    return (dates.to_numpy(dtype='datetime64[D]').astype(np.int64))
+
+def _bucket_keys(signatures, cents, currency, buckets):
+    """
+    Claves LSH: una por banda, combinando el hash de la banda con el monto,
+    la moneda y la semana de la transacción.
+
+    Returns:
+        Matriz (n, BANDS) de uint64
+    """
+    banded = signatures.reshape(len(signatures), BANDS, ROWS_PER_BAND)
+    keys = (banded * _BAND_MIX).sum(axis=2)
+    keys += np.arange(BANDS, dtype=np.uint64) * _KEY_MIX[0]
+    keys += (cents.astype(np.uint64) * _KEY_MIX[1])[:, None]
+    keys += (currency.astype(np.uint64) * _KEY_MIX[2])[:, None]
+    keys += (buckets.astype(np.uint64) * _KEY_MIX[3])[:, None]
+    return keys
+
+def build_duplicate_index(df):
+    """
+    Construir el índice LSH sobre (shingles de la descripción, monto, semana).
+    Las claves se guardan ordenadas, de modo que cada consulta es una
+    búsqueda binaria en lugar de una comparación contra todas las filas.
+
+    Args:
+        df: DataFrame de transacciones
+
+    Returns:
+        Diccionario con las firmas, los datos de cada fila y las claves ordenadas
+    """
+    df = df.reset_index(drop=True)
+    signatures = compute_minhash_signatures(df['description'].tolist())
+    cents, currency = _amount_keys(df)
+    days = _day_numbers(df)
+    keys = _bucket_keys(signatures, cents, currency, days // DATE_BUCKET_DAYS).ravel()
+
+    order = np.argsort(keys, kind='stable')
+    return {
+        'signatures': signatures,
+        'days': days,
+        'ids': df['id'].to_numpy() if 'id' in df.columns else np.arange(len(df)),
+        'rows': df,
+        'keys': keys[order],
+        'positions': order // BANDS
+    }
+
+def get_duplicate_index(username):
+    """Obtener el índice de duplicados del usuario, reconstruido sólo si cambiaron sus datos"""
+    version = get_user_data_version(username)
+    cached = _duplicate_index_cache.get(username)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    index = build_duplicate_index(load_user_data(username))
+    _duplicate_index_cache[username] = (version, index)
+    return index
+
+def _match_duplicate_pairs(index, df):
+    """
+    Pares (fila de df, posición en el índice) que comparten alguna clave LSH
+    y además se parecen lo suficiente y están cerca en el tiempo. Los rangos de
+    cada clave se ubican con búsquedas binarias y se expanden todos juntos.
+
+    Returns:
+        Tupla de arreglos (filas, posiciones), ordenados por fila y posición
+    """
+    if len(index['ids']) == 0 or df.empty:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    signatures = compute_minhash_signatures(df['description'].tolist())
+    cents, currency = _amount_keys(df)
+    days = _day_numbers(df)
+    buckets = days // DATE_BUCKET_DAYS
+
+    # Consultar la semana de la transacción y las dos vecinas
+    query_keys = np.stack([
+        _bucket_keys(signatures, cents, currency, buckets + shift)
+        for shift in (-1, 0, 1)
+    ], axis=1).reshape(len(df), -1)
+    left = np.searchsorted(index['keys'], query_keys, side='left').ravel()
+    counts = np.searchsorted(index['keys'], query_keys, side='right').ravel() - left
+
+    # Una entrada por cada coincidencia de cada clave consultada
+    key_rows = np.repeat(np.arange(len(df)), query_keys.shape[1])
+    rows = np.repeat(key_rows, counts)
+    slots = np.repeat(left, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = index['positions'][slots]
+
+    close_in_time = np.abs(index['days'][positions] - days[rows]) <= DATE_TOLERANCE_DAYS
+    rows, positions = rows[close_in_time], positions[close_in_time]
+
+    # Un mismo candidato puede aparecer en varias bandas o semanas
+    pairs = np.sort(rows * len(index['ids']) + positions)
+    pairs = pairs[np.diff(pairs, prepend=-1) != 0]
+    rows, positions = pairs // len(index['ids']), pairs % len(index['ids'])
+
+    similarity = (index['signatures'][positions] == signatures[rows]).mean(axis=1)
+    keep = similarity >= SIMILARITY_THRESHOLD
+    return rows[keep], positions[keep]
+
+def query_duplicate_index(index, df):
+    """
+    Buscar posibles duplicados de cada fila de df en el índice.
+
+    Returns:
+        Lista (una entrada por fila de df) con las posiciones coincidentes del índice
+    """
+    df = df.reset_index(drop=True)
+    rows, positions = _match_duplicate_pairs(index, df)
+    bounds = np.searchsorted(rows, np.arange(len(df) + 1))
+    return [positions[start:end].tolist() for start, end in zip(bounds[:-1], bounds[1:])]
+
+def find_possible_duplicates(username, transaction_data):
+    """
+    Buscar transacciones existentes que probablemente sean la misma que la nueva
+
+    Args:
+        username: Nombre de usuario
+        transaction_data: Diccionario con la transacción a guardar
+
+    Returns:
+        Lista de diccionarios con las transacciones existentes similares
+    """
+    index = get_duplicate_index(username)
+    if index['rows'].empty:
+        return []
+
+    positions = query_duplicate_index(index, pd.DataFrame([transaction_data]))[0]
+    existing = index['rows'].iloc[positions]
+    if transaction_data.get('id') is not None:
+        existing = existing[existing['id'] != transaction_data['id']]
+    return existing.to_dict('records')
+
+def flag_duplicates_in_batch(username, new_df):
+    """
+    Marcar qué filas de un lote (por ejemplo, una importación) ya existen
+
+    Returns:
+        Serie alineada con new_df con el ID de la transacción existente
+        que parece duplicada, o NaN si no hay coincidencias
+    """
+    index = get_duplicate_index(username)
+    flags = pd.Series(np.nan, index=new_df.index)
+    if index['rows'].empty or new_df.empty:
+        return flags
+
+    rows, positions = _match_duplicate_pairs(index, new_df.reset_index(drop=True))
+    # La primera coincidencia de cada fila (la de menor posición en el índice)
+    rows, first = np.unique(rows, return_index=True)
+    flags.iloc[rows] = index['ids'][positions[first]]
+    return flags
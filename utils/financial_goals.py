@@ -2,39 +2,106 @@ import os
 import csv
 import pandas as pd
 from datetime import datetime
+import numpy as np
+from utils.data_handler import load_user_data, get_user_data_version
+from utils.advanced_analytics import as_analytics_context
+
+# Columns of the goals file, in the order they are saved
+GOAL_COLUMNS = [
+    'id', 'name', 'description', 'type', 'target_amount',
+    'current_amount', 'currency', 'start_date', 'target_date',
+    'category', 'status', 'created_at', 'link_type', 'account_id'
+]
+
+# How a goal's progress is tracked: set by hand, or derived from the
+# transactions of its category or of one account
+GOAL_LINK_TYPES = {
+    'manual': 'Manual',
+    'category': 'Categoría',
+    'account': 'Cuenta'
+}
+
+# Months of recent transactions used to estimate how fast linked goals advance
+GOAL_VELOCITY_MONTHS = 3
+AVERAGE_MONTH_DAYS = 30.44
+# Projected completion dates further than this past the target date are not reported
+PROJECTION_HORIZON_YEARS = 100
+
+# Goal analysis per user: {username: (version, analysis_df)}
+_goal_analysis_cache = {}
+
+# Loaded goals per user: {username: (mtime, goals_df, {goal id: row position})}
+_goals_cache = {}
 
 def get_user_goals_file(username):
     """Get the path to a user's financial goals file"""
+    os.makedirs(f"data/users/{username}", exist_ok=True)
+    return f"data/users/{username}/goals.csv"
+
+def get_legacy_goals_file(username):
+    """Path where goals were stored before moving into the per-user directory"""
     return f"data/{username}_goals.csv"
 
+def migrate_legacy_goals_file(username):
+    """
+    Move a goals file from the old flat data/{username}_goals.csv location
+    into the user's directory, if the user still has one there
+    
+    Returns:
+        True if a file was migrated
+    """
+    legacy_path = get_legacy_goals_file(username)
+    file_path = get_user_goals_file(username)
+    if os.path.exists(file_path) or not os.path.exists(legacy_path):
+        return False
+    
+    os.replace(legacy_path, file_path)
+    return True
+
 def create_goals_file_if_not_exists(username):
     """Create goals file if it doesn't exist"""
     file_path = get_user_goals_file(username)
-    if not os.path.exists(file_path):
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    if not os.path.exists(file_path) and not migrate_legacy_goals_file(username):
         with open(file_path, 'w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow([
-                'id', 'name', 'description', 'type', 'target_amount', 
-                'current_amount', 'currency', 'start_date', 'target_date', 
-                'category', 'status', 'created_at'
-            ])
+            writer.writerow(GOAL_COLUMNS)
+
+def _cache_user_goals(username, df):
+    """Keep a user's goals in memory along with an id -> row position index"""
+    mtime = os.stat(get_user_goals_file(username)).st_mtime_ns
+    _goals_cache[username] = (mtime, df, dict(zip(df['id'].tolist(), range(len(df)))))
 
 def load_user_goals(username):
-    """Load a user's financial goals"""
+    """
+    Load a user's financial goals
+    
+    The file is only parsed again when it changes; callers that modify the
+    returned DataFrame must work on a copy.
+    """
     create_goals_file_if_not_exists(username)
     
     file_path = get_user_goals_file(username)
+    cached = _goals_cache.get(username)
+    if cached and cached[0] == os.stat(file_path).st_mtime_ns:
+        return cached[1]
+    
     try:
         df = pd.read_csv(file_path)
-        return df
+        # Goals saved before linking existed have no link columns
+        df = df.reindex(columns=GOAL_COLUMNS)
     except Exception as e:
         print(f"Error loading user goals: {e}")
-        return pd.DataFrame(columns=[
-            'id', 'name', 'description', 'type', 'target_amount', 
-            'current_amount', 'currency', 'start_date', 'target_date', 
-            'category', 'status', 'created_at'
-        ])
+        return pd.DataFrame(columns=GOAL_COLUMNS)
+    
+    _cache_user_goals(username, df)
+    return df
+
+def _goal_position(username, df, goal_id):
+    """Row position of a goal in the loaded DataFrame, looked up in the id index"""
+    cached = _goals_cache.get(username)
+    if not cached or cached[1] is not df:
+        return None
+    return cached[2].get(goal_id)
 
 def get_next_goal_id(username):
     """Get the next available ID for a goal"""
@@ -43,6 +110,12 @@ def get_next_goal_id(username):
         return 1
     return df['id'].max() + 1
 
+def _write_user_goals(username, df):
+    """Write a user's goals file in a single pass and refresh the in-memory copy"""
+    df = df.reset_index(drop=True)
+    df.to_csv(get_user_goals_file(username), index=False)
+    _cache_user_goals(username, df)
+
 def save_financial_goal(username, goal_data):
     """Save a new financial goal for a user"""
     create_goals_file_if_not_exists(username)
@@ -51,12 +124,18 @@ def save_financial_goal(username, goal_data):
     
     # Add goal ID if not present
     if 'id' not in goal_data or pd.isna(goal_data['id']):
-        goal_data['id'] = get_next_goal_id(username)
+        goal_data['id'] = 1 if df.empty else df['id'].max() + 1
     
     # Add created_at if not present
     if 'created_at' not in goal_data:
         goal_data['created_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
+    # Linked goals start from the sum of their existing transactions
+    if goal_data.get('link_type') in ('category', 'account'):
+        contributions = calculate_goal_contributions(pd.DataFrame([goal_data]), load_user_data(username))
+        goal_data['current_amount'] = float(contributions.get(goal_data['id'], 0.0))
+        goal_data['status'] = 'Completado' if goal_data['current_amount'] >= float(goal_data['target_amount']) else 'En progreso'
+    
     # Determine if this is a new goal or an update
     if len(df[df['id'] == goal_data['id']]) > 0:
         # Update existing goal
@@ -66,8 +145,7 @@ def save_financial_goal(username, goal_data):
     df = pd.concat([df, pd.DataFrame([goal_data])], ignore_index=True)
     
     # Save back to file
-    file_path = get_user_goals_file(username)
-    df.to_csv(file_path, index=False)
+    _write_user_goals(username, df)
     return True
 
 def delete_financial_goal(username, goal_id):
@@ -80,33 +158,138 @@ def delete_financial_goal(username, goal_id):
     df = df[df['id'] != goal_id]
     
     # Save back to file
-    file_path = get_user_goals_file(username)
-    df.to_csv(file_path, index=False)
+    _write_user_goals(username, df)
     return True
 
 def get_financial_goal_by_id(username, goal_id):
     """Get a financial goal by ID"""
     df = load_user_goals(username)
-    goal = df[df['id'] == goal_id]
-    if goal.empty:
+    position = _goal_position(username, df, goal_id)
+    if position is None:
         return None
-    return goal.iloc[0].to_dict()
+    return df.iloc[position].to_dict()
 
 def update_goal_progress(username, goal_id, new_amount):
     """Update the current amount for a financial goal"""
-    goal = get_financial_goal_by_id(username, goal_id)
-    if not goal:
+    df = load_user_goals(username)
+    idx = _goal_position(username, df, goal_id)
+    if idx is None:
         return False
     
-    goal['current_amount'] = new_amount
+    df = df.copy()
+    df.at[idx, 'current_amount'] = new_amount
     
     # Update goal status
-    if goal['current_amount'] >= goal['target_amount']:
-        goal['status'] = 'Completado'
+    if new_amount >= df.at[idx, 'target_amount']:
+        df.at[idx, 'status'] = 'Completado'
     else:
-        goal['status'] = 'En progreso'
+        df.at[idx, 'status'] = 'En progreso'
+    
+    _write_user_goals(username, df)
+    return True
+
+def calculate_goal_contributions(goals_df, transactions_df):
+    """
+    Sum the transactions that count towards each linked goal
+    
+    Category goals add up every transaction of their category; account goals
+    add the net flow of their account (income minus expenses). Only
+    transactions from the goal's start date on are counted, in the goal's
+    currency: ARS goals use amount_pesos and USD goals only count USD
+    transactions.
     
-    return save_financial_goal(username, goal)
+    Args:
+        goals_df: DataFrame with goals
+        transactions_df: DataFrame with transactions
+    
+    Returns:
+        Series indexed by goal id with the contributed amount
+    """
+    goals = goals_df[goals_df['link_type'].isin(['category', 'account'])] if 'link_type' in goals_df.columns else goals_df.iloc[0:0]
+    if goals.empty or transactions_df.empty:
+        return pd.Series(dtype=float)
+    
+    transactions = pd.DataFrame({
+        'category': transactions_df['category'].to_numpy(),
+        'account_id': pd.to_numeric(transactions_df['account_id'], errors='coerce').to_numpy()
+            if 'account_id' in transactions_df.columns else float('nan'),
+        'date': pd.to_datetime(transactions_df['date'], errors='coerce').to_numpy(),
+        'currency': transactions_df['currency'].to_numpy(),
+        'amount': pd.to_numeric(transactions_df['amount'], errors='coerce').fillna(0).to_numpy(),
+        'amount_pesos': pd.to_numeric(transactions_df['amount_pesos'], errors='coerce').fillna(0).to_numpy(),
+        'sign': (transactions_df['type'] == 'Gasto').map({True: -1.0, False: 1.0}).to_numpy()
+    })
+    goals = pd.DataFrame({
+        'goal_id': goals['id'].to_numpy(),
+        'link_type': goals['link_type'].to_numpy(),
+        'category': goals['category'].to_numpy(),
+        'account_id': pd.to_numeric(goals['account_id'], errors='coerce').to_numpy(),
+        'goal_currency': goals['currency'].to_numpy(),
+        'start_date': pd.to_datetime(goals['start_date'], errors='coerce').to_numpy()
+    })
+    
+    # Match every linked goal with the transactions of its category or account
+    by_category = goals[goals['link_type'] == 'category'].drop(columns='account_id').merge(transactions, on='category')
+    by_category['sign'] = 1.0
+    by_account = goals[goals['link_type'] == 'account'].drop(columns='category').merge(transactions, on='account_id')
+    matched = pd.concat([by_category, by_account], ignore_index=True)
+    matched = matched[matched['date'] >= matched['start_date']]
+    
+    is_ars_goal = matched['goal_currency'] != 'USD'
+    value = matched['amount_pesos'].where(is_ars_goal, matched['amount'].where(matched['currency'] == 'USD', 0.0))
+    return (value * matched['sign']).groupby(matched['goal_id']).sum()
+
+def load_linked_goals(username):
+    """
+    Load the goals whose progress comes from transactions (category or account
+    links), without creating a goals file for users that have none
+    """
+    if not os.path.exists(get_user_goals_file(username)) and not migrate_legacy_goals_file(username):
+        return pd.DataFrame(columns=GOAL_COLUMNS)
+    df = load_user_goals(username)
+    return df[df['link_type'].isin(['category', 'account'])]
+
+def apply_goal_contributions(username, delta):
+    """
+    Add contribution deltas to the current_amount of linked goals and refresh
+    their status, with a single write of the goals file.
+    
+    Args:
+        username: Username
+        delta: Series indexed by goal id with the amount to add (negative to subtract)
+    """
+    delta = delta[delta != 0]
+    if delta.empty:
+        return
+    
+    df = load_user_goals(username).copy()
+    is_changed = df['id'].isin(delta.index)
+    df.loc[is_changed, 'current_amount'] = df.loc[is_changed, 'current_amount'].astype(float) + \
+        df.loc[is_changed, 'id'].map(delta).to_numpy()
+    df.loc[is_changed, 'status'] = (df.loc[is_changed, 'current_amount'] >= df.loc[is_changed, 'target_amount']).map(
+        {True: 'Completado', False: 'En progreso'}
+    )
+    _write_user_goals(username, df)
+
+def update_linked_goals(username, added=None, removed=None):
+    """
+    Keep linked goals up to date after transactions change: the contribution
+    of the added transactions is added to current_amount and that of the
+    removed ones is subtracted, with a single write of the goals file.
+    
+    Args:
+        username: Username
+        added: Transactions that were added (DataFrame or list of dictionaries)
+        removed: Transactions that were removed (DataFrame or list of dictionaries)
+    """
+    goals = load_linked_goals(username)
+    if goals.empty:
+        return
+    
+    delta = calculate_goal_contributions(goals, pd.DataFrame(added if added is not None else [])).sub(
+        calculate_goal_contributions(goals, pd.DataFrame(removed if removed is not None else [])), fill_value=0
+    )
+    apply_goal_contributions(username, delta)
 
 def calculate_goal_progress(goal):
     """Calculate progress percentage for a goal"""
@@ -122,6 +305,106 @@ def calculate_goal_progress(goal):
     progress = (current / target) * 100
     return min(progress, 100)  # Cap at 100%
 
+def analyze_goals(goals_df, transactions_df, today=None):
+    """
+    Compute progress indicators for all goals at once
+    
+    The contribution velocity of linked goals comes from their transactions of
+    the last GOAL_VELOCITY_MONTHS months; manual goals use their average pace
+    since the start date.
+    
+    Args:
+        goals_df: DataFrame with goals
+        transactions_df: DataFrame with transactions
+        today: Reference date (defaults to now)
+    
+    Returns:
+        DataFrame indexed by goal id with progress (0-100), remaining,
+        months_left, required_monthly, monthly_velocity, projected_date
+        and on_track
+    """
+    if goals_df.empty:
+        return pd.DataFrame(columns=[
+            'progress', 'remaining', 'months_left', 'required_monthly',
+            'monthly_velocity', 'projected_date', 'on_track'
+        ])
+    
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    goal_ids = goals_df['id'].to_numpy()
+    target = pd.to_numeric(goals_df['target_amount'], errors='coerce').fillna(0).to_numpy()
+    current = pd.to_numeric(goals_df['current_amount'], errors='coerce').fillna(0).to_numpy()
+    start_date = pd.to_datetime(goals_df['start_date'], errors='coerce').fillna(today)
+    target_date = pd.to_datetime(goals_df['target_date'], errors='coerce').fillna(today)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        progress = np.where(target > 0, np.minimum(current / target * 100, 100), 100)
+    remaining = np.maximum(target - current, 0)
+    months_left = np.maximum((target_date - today).dt.days.to_numpy() / AVERAGE_MONTH_DAYS, 0)
+    required_monthly = np.where(months_left >= 1, remaining / np.maximum(months_left, 1), remaining)
+    
+    # Manual goals: average pace since they started
+    elapsed_months = np.maximum((today - start_date).dt.days.to_numpy() / AVERAGE_MONTH_DAYS, 1)
+    velocity = current / elapsed_months
+    
+    # Linked goals: pace of their recent transactions
+    is_linked = goals_df['link_type'].isin(['category', 'account']).to_numpy()
+    if is_linked.any() and not transactions_df.empty:
+        window_start = np.maximum(start_date, today - pd.DateOffset(months=GOAL_VELOCITY_MONTHS))
+        recent_goals = goals_df[is_linked].assign(start_date=window_start[is_linked].to_numpy())
+        recent = calculate_goal_contributions(recent_goals, transactions_df).reindex(goal_ids[is_linked], fill_value=0)
+        window_months = np.maximum((today - window_start[is_linked]).dt.days.to_numpy() / AVERAGE_MONTH_DAYS, 1)
+        velocity[is_linked] = recent.to_numpy() / window_months
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        months_to_goal = np.where(velocity > 0, remaining / velocity, np.nan)
+    # Beyond the horizon the goal is out of reach at this pace (and the date would overflow)
+    horizon_days = (target_date + pd.DateOffset(years=PROJECTION_HORIZON_YEARS) - today).dt.days.to_numpy()
+    months_to_goal = np.where(months_to_goal * AVERAGE_MONTH_DAYS <= horizon_days, months_to_goal, np.nan)
+    projected_date = today + pd.to_timedelta(months_to_goal * AVERAGE_MONTH_DAYS, unit='D')
+    projected_date = pd.DatetimeIndex(projected_date).normalize()
+    
+    is_completed = (goals_df['status'] == 'Completado').to_numpy() | (remaining <= 0)
+    on_track = is_completed | (projected_date <= target_date.to_numpy())
+    
+    return pd.DataFrame({
+        'progress': progress,
+        'remaining': remaining,
+        'months_left': months_left,
+        'required_monthly': np.where(is_completed, 0.0, required_monthly),
+        'monthly_velocity': velocity,
+        'projected_date': projected_date.where(~is_completed, pd.NaT),
+        'on_track': on_track
+    }, index=pd.Index(goal_ids, name='id'))
+
+def get_goal_analysis(username, goals_df=None, data=None):
+    """
+    Goal indicators for a user, recomputed only when their transactions or
+    goals change (and at most once per day, since they depend on the date)
+    
+    Args:
+        username: Username
+        goals_df: The user's goals (loaded if not given)
+        data: The user's transactions as a DataFrame or an AnalyticsContext
+            (loaded if not given); a context's already parsed ledger is used as is
+    """
+    goals_path = get_user_goals_file(username)
+    version = (
+        get_user_data_version(username),
+        os.stat(goals_path).st_mtime_ns if os.path.exists(goals_path) else None,
+        datetime.now().date()
+    )
+    cached = _goal_analysis_cache.get(username)
+    if cached and cached[0] == version:
+        return cached[1]
+    
+    if goals_df is None:
+        goals_df = load_user_goals(username)
+    transactions_df = as_analytics_context(load_user_data(username) if data is None else data).df
+    
+    analysis = analyze_goals(goals_df, transactions_df)
+    _goal_analysis_cache[username] = (version, analysis)
+    return analysis
+
 def get_goal_types():
     """Get predefined goal types"""
     return [
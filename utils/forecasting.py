@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+from utils.data_handler import get_user_data_version
+from utils.advanced_analytics import as_analytics_context, period_key, period_labels
+
+# Estacionalidad anual sobre series mensuales (aguinaldo, gastos de diciembre)
+SEASON_LENGTH = 12
+# Amortiguación de la tendencia: evita extrapolar pendientes indefinidamente
+DAMPING = 0.9
+# Horizonte máximo que se calcula y guarda en caché
+MAX_HORIZON = 12
+# z para intervalos de predicción del 95%
+INTERVAL_Z = 1.96
+
+# Grilla de parámetros (alpha, beta, gamma) evaluada en bloque para todas las categorías
+_ALPHAS = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+_BETAS = np.array([0.0, 0.05, 0.1, 0.2])
+_GAMMAS = np.array([0.05, 0.1, 0.2, 0.4])
+_GRID = np.array(np.meshgrid(_ALPHAS, _BETAS, _GAMMAS, indexing='ij')).reshape(3, -1)
+
+# Pronósticos por usuario: {(username, seasonal): (data_version, forecast_df)}
+_forecast_cache = {}
+
+def build_category_matrix(data):
+    """
+    Matriz mes x categoría de gastos en pesos, con todos los meses del rango
+    (los meses sin gastos cuentan como cero). El mes en curso se excluye
+    porque todavía está incompleto.
+
+    Args:
+        data: DataFrame de transacciones o AnalyticsContext
+
+    Returns:
+        DataFrame indexado por clave de período (año * 12 + mes - 1) con una columna por categoría
+    """
+    context = as_analytics_context(data)
+    expenses_df = context.expenses
+    if expenses_df.empty:
+        return pd.DataFrame()
+
+    matrix = expenses_df.pivot_table(
+        index=context.expense_periods, columns='category', values='amount_pesos', aggfunc='sum', fill_value=0
+    )
+    current_period = period_key(pd.Timestamp.now())
+    full_range = np.arange(matrix.index.min(), min(matrix.index.max(), current_period - 1) + 1)
+    return matrix.reindex(full_range, fill_value=0)
+
+def _initial_state(values, seasonal, season_length):
+    """Nivel, tendencia y componentes estacionales iniciales a partir de las primeras temporadas"""
+    if seasonal and len(values) >= 2 * season_length:
+        first = values[:season_length].mean(axis=0)
+        second = values[season_length:2 * season_length].mean(axis=0)
+        level = first
+        trend = (second - first) / season_length
+        if seasonal == 'multiplicative':
+            season = values[:season_length] / np.where(first > 0, first, 1.0)
+        else:
+            season = values[:season_length] - first
+    else:
+        level = values[:2].mean(axis=0)
+        trend = (values[-1] - values[0]) / max(len(values) - 1, 1)
+        neutral = 1.0 if seasonal == 'multiplicative' else 0.0
+        season = np.full((season_length, values.shape[1]), neutral)
+    return level, trend, season
+
+def _run_smoothing(values, alpha, beta, gamma, level, trend, season, multiplicative):
+    """
+    Recorrer la serie aplicando Holt-Winters con tendencia amortiguada.
+    Los parámetros y estados tienen forma (combinaciones, categorías), de modo
+    que toda la grilla se evalúa para todas las categorías en una sola pasada.
+
+    Returns:
+        Tupla (suma de errores al cuadrado, nivel, tendencia, estacionalidad)
+    """
+    season_length = season.shape[0]
+    season = np.broadcast_to(season, (season_length,) + level.shape).copy()
+    sse = np.zeros(level.shape)
+
+    for t, observed in enumerate(values):
+        s = season[t % season_length]
+        damped_trend = DAMPING * trend
+        if multiplicative:
+            safe_s = np.where(s > 0, s, 1e-6)
+            predicted = (level + damped_trend) * s
+            new_level = alpha * observed / safe_s + (1 - alpha) * (level + damped_trend)
+            safe_level = np.where(new_level > 0, new_level, 1e-6)
+            season[t % season_length] = gamma * observed / safe_level + (1 - gamma) * s
+        else:
+            predicted = level + damped_trend + s
+            new_level = alpha * (observed - s) + (1 - alpha) * (level + damped_trend)
+            season[t % season_length] = gamma * (observed - new_level) + (1 - gamma) * s
+
+        sse += (observed - predicted) ** 2
+        trend = beta * (new_level - level) + (1 - beta) * damped_trend
+        level = new_level
+
+    return sse, level, trend, season
+
+def fit_holt_winters(values, seasonal='additive', season_length=SEASON_LENGTH):
+    """
+    Ajustar Holt-Winters a todas las columnas de una matriz a la vez.
+    Los parámetros se eligen por categoría minimizando el error de un paso
+    sobre una grilla; con menos de dos temporadas de historia se ajusta sólo
+    nivel y tendencia (sin estacionalidad).
+
+    Args:
+        values: Matriz (meses, categorías)
+        seasonal: 'additive' o 'multiplicative'
+        season_length: Meses por temporada
+
+    Returns:
+        Diccionario con los parámetros elegidos, el estado final y el desvío de los residuos
+    """
+    values = np.asarray(values, dtype=float)
+    has_season = len(values) >= 2 * season_length
+    multiplicative = seasonal == 'multiplicative' and has_season
+    if multiplicative:
+        # La variante multiplicativa necesita valores positivos
+        values = np.maximum(values, 1e-6)
+
+    level, trend, season = _initial_state(values, seasonal if has_season else None, season_length)
+    grid = _GRID if has_season else _GRID[:, _GRID[2] == _GAMMAS[0]]
+    gamma_grid = grid[2] if has_season else np.zeros(grid.shape[1])
+    alpha, beta, gamma = (p[:, None] for p in (grid[0], grid[1], gamma_grid))
+
+    sse, level, trend, season = _run_smoothing(
+        values, alpha, beta, gamma,
+        np.broadcast_to(level, alpha.shape[:1] + level.shape).copy(),
+        np.broadcast_to(trend, alpha.shape[:1] + trend.shape).copy(),
+        season[:, None, :], multiplicative
+    )
+
+    # Mejor combinación de la grilla para cada categoría
+    best = sse.argmin(axis=0)
+    columns = np.arange(values.shape[1])
+    return {
+        'alpha': alpha[best, 0],
+        'beta': beta[best, 0],
+        'gamma': gamma[best, 0],
+        'level': level[best, columns],
+        'trend': trend[best, columns],
+        'season': season[:, best, columns],
+        'sigma': np.sqrt(sse[best, columns] / len(values)),
+        'multiplicative': multiplicative,
+        'periods': len(values)
+    }
+
+def forecast_holt_winters(model, horizon):
+    """
+    Proyectar un modelo ajustado para todos los horizontes a la vez
+
+    Returns:
+        Tupla (pronóstico, desvío) de matrices (horizonte, categorías)
+    """
+    steps = np.arange(1, horizon + 1)
+    # Suma de la tendencia amortiguada: phi + phi^2 + ... + phi^h
+    damped_sum = DAMPING * (1 - DAMPING ** steps) / (1 - DAMPING)
+    base = model['level'][None, :] + damped_sum[:, None] * model['trend'][None, :]
+
+    season_length = model['season'].shape[0]
+    season = model['season'][(model['periods'] + steps - 1) % season_length]
+    mean = base * season if model['multiplicative'] else base + season
+
+    # El error crece con el horizonte a medida que se acumulan nivel y tendencia
+    alpha = model['alpha'][None, :]
+    growth = 1 + (steps[:, None] - 1) * alpha ** 2 * (1 + model['beta'][None, :] * steps[:, None]) ** 2
+    std = model['sigma'][None, :] * np.sqrt(growth)
+    return np.maximum(mean, 0), std
+
+def get_holt_winters_forecast(username, data, months_ahead=3, seasonal='additive'):
+    """
+    Pronóstico de gastos por categoría con intervalos de predicción.
+    El ajuste se hace una vez por versión de los datos del usuario y se guarda
+    en caché hasta MAX_HORIZON meses; las consultas posteriores sólo recortan.
+
+    Args:
+        username: Nombre de usuario
+        data: DataFrame de transacciones del usuario o AnalyticsContext
+        months_ahead: Meses a proyectar
+        seasonal: 'additive' o 'multiplicative'
+
+    Returns:
+        DataFrame con month, category, amount_pesos, lower, upper, std y forecast
+    """
+    version = get_user_data_version(username)
+    cached = _forecast_cache.get((username, seasonal))
+    if cached and cached[0] == version:
+        forecast_df = cached[1]
+    else:
+        forecast_df = _build_forecast(data, seasonal)
+        _forecast_cache[(username, seasonal)] = (version, forecast_df)
+
+    if forecast_df.empty:
+        return forecast_df
+    months = forecast_df['month'].drop_duplicates().head(months_ahead)
+    return forecast_df[forecast_df['month'].isin(months)].reset_index(drop=True)
+
+def _build_forecast(data, seasonal):
+    """Ajustar el modelo y armar el pronóstico en formato largo hasta MAX_HORIZON meses"""
+    matrix = build_category_matrix(data)
+    if len(matrix) < 3:
+        return pd.DataFrame()
+    matrix = matrix.loc[:, matrix.sum() > 0]
+
+    model = fit_holt_winters(matrix.to_numpy(dtype=float), seasonal)
+    mean, std = forecast_holt_winters(model, MAX_HORIZON)
+
+    months = period_labels(matrix.index.max() + np.arange(1, MAX_HORIZON + 1))
+    categories = matrix.columns.to_numpy()
+    mean, std = mean.ravel(), std.ravel()
+
+    return pd.DataFrame({
+        'month': np.repeat(months, len(categories)),
+        'category': np.tile(categories, MAX_HORIZON),
+        'amount_pesos': mean,
+        'lower': np.maximum(mean - INTERVAL_Z * std, 0),
+        'upper': mean + INTERVAL_Z * std,
+        'std': std,
+        'forecast': True
+    })
@@ -0,0 +1,123 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.data_handler import get_user_data_version
+
+# Serie de IPC compartida por todos los usuarios: CSV con columnas month (YYYY-MM) e index
+CPI_FILE = "data/cpi.csv"
+
+# Serie cargada: (mtime, Serie indexada por período mensual)
+_cpi_cache = {}
+# Transacciones deflactadas: {(username, base_month): ((data_version, cpi_mtime), df)}
+_real_pesos_cache = {}
+
+def load_cpi_series():
+    """
+    Cargar la serie de IPC local (se recarga sólo si cambió el archivo)
+
+    Returns:
+        Serie de valores del índice indexada por período mensual, ordenada
+    """
+    if not os.path.exists(CPI_FILE):
+        return pd.Series(dtype=float, index=pd.PeriodIndex([], freq='M'))
+
+    mtime = os.path.getmtime(CPI_FILE)
+    cached = _cpi_cache.get(CPI_FILE)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        cpi_df = pd.read_csv(CPI_FILE, dtype={'month': str})
+        cpi = pd.Series(
+            pd.to_numeric(cpi_df['index'], errors='coerce').to_numpy(),
+            index=pd.PeriodIndex(cpi_df['month'].str.strip(), freq='M')
+        ).dropna()
+        cpi = cpi[cpi > 0].sort_index()
+        cpi = cpi[~cpi.index.duplicated(keep='last')]
+    except Exception as e:
+        print(f"Error al cargar la serie de IPC: {e}")
+        return pd.Series(dtype=float, index=pd.PeriodIndex([], freq='M'))
+
+    _cpi_cache[CPI_FILE] = (mtime, cpi)
+    return cpi
+
+def update_cpi_series(file):
+    """
+    Incorporar valores de IPC desde un CSV (month, index); los meses ya
+    cargados se reemplazan por los nuevos valores.
+
+    Returns:
+        Cantidad de meses en la serie actualizada, o None si el archivo no es válido
+    """
+    try:
+        new_values = pd.read_csv(file, dtype={'month': str})
+        new_cpi = pd.Series(
+            pd.to_numeric(new_values['index'], errors='coerce').to_numpy(),
+            index=pd.PeriodIndex(new_values['month'].str.strip(), freq='M')
+        ).dropna()
+    except Exception as e:
+        print(f"Error al leer el archivo de IPC: {e}")
+        return None
+
+    new_cpi = new_cpi[new_cpi > 0]
+    if new_cpi.empty:
+        return None
+
+    cpi = pd.concat([load_cpi_series(), new_cpi])
+    cpi = cpi[~cpi.index.duplicated(keep='last')].sort_index()
+
+    os.makedirs(os.path.dirname(CPI_FILE), exist_ok=True)
+    pd.DataFrame({'month': cpi.index.astype(str), 'index': cpi.to_numpy()}).to_csv(CPI_FILE, index=False)
+    return len(cpi)
+
+def get_cpi_version():
+    """Marca de versión de la serie de IPC (cambia cada vez que se actualiza el archivo)"""
+    return os.path.getmtime(CPI_FILE) if os.path.exists(CPI_FILE) else None
+
+def deflate_transactions(df, base_month, cpi=None):
+    """
+    Expresar amount_pesos en pesos constantes de un mes base.
+    Cada transacción se multiplica por IPC(base) / IPC(mes de la transacción);
+    el factor se obtiene con un único acceso a un arreglo denso de meses.
+    Para meses sin dato se usa el último índice conocido (o el primero, si la
+    transacción es anterior al inicio de la serie).
+
+    Args:
+        df: DataFrame de transacciones
+        base_month: Mes base ('YYYY-MM')
+        cpi: Serie de IPC (se carga la local si no se indica)
+
+    Returns:
+        Copia de df con amount_pesos ajustado y el valor original en amount_pesos_nominal
+    """
+    if cpi is None:
+        cpi = load_cpi_series()
+    df = df.copy()
+    df['amount_pesos_nominal'] = df['amount_pesos']
+    if df.empty or cpi.empty:
+        return df
+
+    # Serie densa mes a mes, completando los huecos
+    first, last = cpi.index.min().ordinal, cpi.index.max().ordinal
+    dense = cpi.reindex(pd.period_range(cpi.index.min(), cpi.index.max(), freq='M')).ffill().to_numpy()
+
+    ordinals = pd.to_datetime(df['date']).dt.to_period('M').array.asi8
+    transaction_cpi = dense[np.clip(ordinals, first, last) - first]
+    base_cpi = dense[np.clip(pd.Period(base_month, freq='M').ordinal, first, last) - first]
+
+    df['amount_pesos'] = pd.to_numeric(df['amount_pesos'], errors='coerce').to_numpy() * (base_cpi / transaction_cpi)
+    return df
+
+def get_real_pesos_data(username, df, base_month):
+    """
+    Transacciones del usuario en pesos constantes del mes base, en caché
+    mientras no cambien ni los datos del usuario ni la serie de IPC.
+    """
+    version = (get_user_data_version(username), get_cpi_version())
+    cached = _real_pesos_cache.get((username, base_month))
+    if cached and cached[0] == version:
+        return cached[1]
+
+    real_df = deflate_transactions(df, base_month)
+    _real_pesos_cache[(username, base_month)] = (version, real_df)
+    return real_df
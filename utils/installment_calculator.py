@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import calendar
 
@@ -63,76 +64,66 @@ def add_months(date, months):
     
     return date.replace(year=year, month=month, day=day)
 
-def get_upcoming_installments(username, transactions_df, months_ahead=3):
+def add_months_array(dates, months):
     """
-    Get upcoming installment payments for the next few months
+    Vectorized version of add_months for arrays of dates and month offsets
+    
+    Args:
+        dates: Array-like of dates
+        months: Array-like (or scalar) of months to add
+    
+    Returns:
+        numpy datetime64[D] array, with days clamped to the end of the target month
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    month_start = dates.astype('datetime64[M]')
+    day_offset = (dates - month_start.astype('datetime64[D]')).astype(np.int64)
+    
+    target_month = month_start + np.asarray(months, dtype=np.int64).astype('timedelta64[M]')
+    first_day = target_month.astype('datetime64[D]')
+    days_in_month = ((target_month + 1).astype('datetime64[D]') - first_day).astype(np.int64)
+    
+    return first_day + np.minimum(day_offset, days_in_month - 1)
+
+def expand_installment_schedule(transactions_df):
+    """
+    Expand credit card purchases in installments into one row per unpaid installment
     
     Args:
-        username: Username
         transactions_df: DataFrame with transactions
-        months_ahead: Number of months to look ahead
     
     Returns:
-        DataFrame with upcoming installment payments
+        DataFrame with transaction_id, account_id, description, installment_number,
+        total_installments, payment_date (datetime64), amount, currency and amount_pesos
     """
-    # Filter for credit card transactions with installments
     installment_txns = transactions_df[
         (transactions_df['payment_method'] == 'Tarjeta de Crédito') & 
         (transactions_df['installments_total'] > 1)
     ]
     
-    if installment_txns.empty:
-        return pd.DataFrame()
-    
-    # Current date and future cutoff
-    now = datetime.now()
-    future_cutoff = now + timedelta(days=30*months_ahead)
-    
-    upcoming = []
-    
-    for _, txn in installment_txns.iterrows():
-        total_installments = int(txn['installments_total'])
-        paid_installments = int(txn['installments_paid'])
-        
-        # Skip if all installments are paid
-        if paid_installments >= total_installments:
-            continue
-        
-        # Transaction date
-        txn_date = pd.to_datetime(txn['date'])
-        
-        # Calculate remaining installments
-        for i in range(paid_installments + 1, total_installments + 1):
-            payment_date = add_months(txn_date, i - 1)
-            
-            # Skip if payment date is in the past or too far in the future
-            if payment_date < now or payment_date > future_cutoff:
-                continue
-            
-            # Amount per installment
-            installment_amount = float(txn['amount']) / total_installments
-            
-            if txn['currency'] == 'USD':
-                # For USD transactions, we'll need the current rate
-                # This is just an estimate; actual conversion would happen later
-                peso_amount = installment_amount * float(txn['exchange_rate'])
-            else:
-                peso_amount = installment_amount
-            
-            upcoming.append({
-                'transaction_id': txn['id'],
-                'description': txn['description'],
-                'installment_number': i,
-                'total_installments': total_installments,
-                'payment_date': payment_date.strftime('%Y-%m-%d'),
-                'amount': installment_amount,
-                'currency': txn['currency'],
-                'amount_pesos': peso_amount
-            })
-    
-    upcoming_df = pd.DataFrame(upcoming)
-    if not upcoming_df.empty:
-        # Sort by payment date
-        upcoming_df = upcoming_df.sort_values('payment_date')
-    
-    return upcoming_df
+    total = installment_txns['installments_total'].fillna(1).astype(int).to_numpy()
+    paid = installment_txns['installments_paid'].fillna(0).astype(int).to_numpy()
+    remaining = np.maximum(total - paid, 0)
+    
+    # One row per remaining installment: repeat each purchase and number its installments
+    rows = np.repeat(np.arange(len(installment_txns)), remaining)
+    first_of_row = np.repeat(np.cumsum(remaining) - remaining, remaining)
+    installment_number = paid[rows] + 1 + np.arange(len(rows)) - first_of_row
+    
+    purchase_dates = pd.to_datetime(installment_txns['date']).to_numpy(dtype='datetime64[D]')
+    installment_amount = (installment_txns['amount'].astype(float).to_numpy() / np.maximum(total, 1))[rows]
+    currency = installment_txns['currency'].to_numpy()[rows]
+    exchange_rate = pd.to_numeric(installment_txns['exchange_rate'], errors='coerce').fillna(1).to_numpy()[rows]
+    
+    return pd.DataFrame({
+        'transaction_id': installment_txns['id'].to_numpy()[rows],
+        'account_id': installment_txns['account_id'].to_numpy()[rows] if 'account_id' in installment_txns.columns else np.nan,
+        'description': installment_txns['description'].to_numpy()[rows],
+        'installment_number': installment_number,
+        'total_installments': total[rows],
+        'payment_date': add_months_array(purchase_dates[rows], installment_number - 1),
+        'amount': installment_amount,
+        'currency': currency,
+        # For USD purchases this is an estimate with the purchase exchange rate
+        'amount_pesos': np.where(currency == 'USD', installment_amount * exchange_rate, installment_amount)
+    })
@@ -0,0 +1,147 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from utils.installment_calculator import expand_installment_schedule
+
+# Columnas de la tabla de cuotas pendientes, ordenada por fecha de vencimiento
+OBLIGATION_COLUMNS = [
+    'transaction_id', 'installment_number', 'total_installments', 'due_date',
+    'amount', 'currency', 'amount_pesos', 'account_id', 'description'
+]
+
+# Tablas cargadas por usuario: {username: (mtime, obligations_df)}
+_obligations_cache = {}
+
+def get_user_obligations_file(username):
+    """Obtener la ruta a la tabla de cuotas pendientes del usuario"""
+    os.makedirs(f"data/users/{username}", exist_ok=True)
+    return f"data/users/{username}/installments.csv"
+
+def build_installment_obligations(df):
+    """
+    Armar la tabla de cuotas pendientes a partir de transacciones:
+    una fila por cuota impaga de cada compra con tarjeta en cuotas,
+    ordenada por fecha de vencimiento.
+
+    Args:
+        df: DataFrame (o lista de diccionarios) de transacciones
+
+    Returns:
+        DataFrame con las columnas OBLIGATION_COLUMNS
+    """
+    df = pd.DataFrame(df)
+    if df.empty or 'installments_total' not in df.columns:
+        return pd.DataFrame(columns=OBLIGATION_COLUMNS).astype({'due_date': 'datetime64[ns]'})
+
+    df = df.assign(
+        installments_total=pd.to_numeric(df['installments_total'], errors='coerce').fillna(1),
+        installments_paid=pd.to_numeric(df['installments_paid'], errors='coerce').fillna(0)
+    )
+    schedule = expand_installment_schedule(df).rename(columns={'payment_date': 'due_date'})
+    schedule['due_date'] = pd.to_datetime(schedule['due_date'])
+    return schedule.sort_values(['due_date', 'transaction_id', 'installment_number'], kind='stable') \
+        .reset_index(drop=True)[OBLIGATION_COLUMNS]
+
+def rebuild_installment_obligations(username):
+    """Reconstruir la tabla completa a partir del archivo de transacciones"""
+    from utils.data_handler import load_user_data
+
+    obligations = build_installment_obligations(load_user_data(username))
+    save_installment_obligations(username, obligations)
+    return obligations
+
+def load_installment_obligations(username):
+    """
+    Cargar la tabla de cuotas pendientes del usuario (se relee sólo si cambió
+    el archivo). Si todavía no existe, se construye a partir de sus transacciones.
+    """
+    file_path = get_user_obligations_file(username)
+    if not os.path.exists(file_path):
+        return rebuild_installment_obligations(username)
+
+    mtime = os.path.getmtime(file_path)
+    cached = _obligations_cache.get(username)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        obligations = pd.read_csv(file_path, parse_dates=['due_date'])
+    except Exception as e:
+        print(f"Error al cargar la tabla de cuotas: {e}")
+        return rebuild_installment_obligations(username)
+
+    obligations = obligations.sort_values('due_date', kind='stable').reset_index(drop=True)
+    _obligations_cache[username] = (mtime, obligations)
+    return obligations
+
+def save_installment_obligations(username, obligations):
+    """Guardar la tabla de cuotas del usuario (ya ordenada por vencimiento)"""
+    file_path = get_user_obligations_file(username)
+    obligations.to_csv(file_path, index=False, date_format='%Y-%m-%d')
+    _obligations_cache[username] = (os.path.getmtime(file_path), obligations)
+
+def update_installment_obligations(username, added=None, removed=None):
+    """
+    Actualizar la tabla de forma incremental: se quitan las cuotas de las
+    transacciones eliminadas (o editadas) y se intercalan las de las nuevas,
+    con una única escritura.
+
+    Args:
+        username: Nombre de usuario
+        added: Transacciones (diccionarios) que se agregaron
+        removed: Transacciones (diccionarios) que se eliminaron
+    """
+    if not os.path.exists(get_user_obligations_file(username)):
+        # El archivo de transacciones ya refleja el cambio: basta con construir la tabla
+        rebuild_installment_obligations(username)
+        return
+
+    obligations = load_installment_obligations(username)
+
+    removed_ids = [transaction.get('id') for transaction in removed or []]
+    if removed_ids:
+        obligations = obligations[~obligations['transaction_id'].isin(removed_ids)]
+
+    new_obligations = build_installment_obligations(added or [])
+    if not new_obligations.empty:
+        obligations = pd.concat([obligations, new_obligations], ignore_index=True) \
+            .sort_values('due_date', kind='stable')
+
+    save_installment_obligations(username, obligations.reset_index(drop=True))
+
+def get_installments_due(username, start=None, end=None):
+    """
+    Cuotas que vencen entre dos fechas (ambas inclusive). Como la tabla está
+    ordenada por vencimiento, el rango se ubica con una búsqueda binaria.
+
+    Args:
+        username: Nombre de usuario
+        start: Fecha inicial (sin límite si no se indica)
+        end: Fecha final (sin límite si no se indica)
+
+    Returns:
+        DataFrame con las cuotas del rango, ordenadas por fecha de vencimiento
+    """
+    obligations = load_installment_obligations(username)
+    due_dates = obligations['due_date'].to_numpy(dtype='datetime64[ns]')
+
+    first = np.searchsorted(due_dates, np.datetime64(pd.Timestamp(start)), side='left') if start is not None else 0
+    last = np.searchsorted(due_dates, np.datetime64(pd.Timestamp(end)), side='right') if end is not None else len(due_dates)
+    return obligations.iloc[first:last]
+
+def get_upcoming_installment_obligations(username, months_ahead=3):
+    """
+    Próximas cuotas a pagar (dentro de months_ahead meses), leídas de la tabla
+    de cuotas en lugar de recalcular el cronograma.
+    """
+    now = datetime.now()
+    upcoming_df = get_installments_due(username, now, now + timedelta(days=30*months_ahead))
+    if upcoming_df.empty:
+        return pd.DataFrame()
+
+    upcoming_df = upcoming_df.assign(payment_date=upcoming_df['due_date'].dt.strftime('%Y-%m-%d'))
+    return upcoming_df[[
+        'transaction_id', 'description', 'installment_number', 'total_installments',
+        'payment_date', 'amount', 'currency', 'amount_pesos'
+    ]]
@@ -0,0 +1,268 @@
+import os
+import re
+import unicodedata
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+RULE_COLUMNS = ['id', 'pattern', 'type', 'category', 'fixed_expense', 'created_at']
+
+# Signos que se reemplazan por espacios al normalizar descripciones
+NON_WORD_RE = re.compile(r'[^\w\s]')
+
+# Autómatas compilados por usuario: {username: (mtime, rules_df, automaton)}
+_compiled_rules_cache = {}
+
+def get_user_rules_file(username):
+    """Obtener la ruta al archivo de reglas de comercios del usuario"""
+    os.makedirs(f"data/users/{username}", exist_ok=True)
+    return f"data/users/{username}/merchant_rules.csv"
+
+def normalize_description(text):
+    """
+    Normalizar una descripción para la búsqueda de patrones:
+    minúsculas, sin acentos y con los signos reemplazados por espacios.
+    """
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ''
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = NON_WORD_RE.sub(' ', text)
+    return ' '.join(text.split())
+
+def normalize_descriptions(descriptions):
+    """
+    Versión para una Serie de descripciones: cada valor distinto se normaliza
+    una sola vez con normalize_description, así ambas dan siempre lo mismo.
+    """
+    descriptions = pd.Series(descriptions, dtype=object)
+    codes, uniques = pd.factorize(descriptions, use_na_sentinel=False)
+    normalized = np.array([normalize_description(text) for text in uniques], dtype=object)
+    return pd.Series(normalized[codes], index=descriptions.index, dtype=object)
+
+def load_merchant_rules(username):
+    """Cargar las reglas de categorización de un usuario"""
+    file_path = get_user_rules_file(username)
+    if not os.path.exists(file_path):
+        return pd.DataFrame(columns=RULE_COLUMNS)
+    try:
+        # Los patrones son siempre texto, aunque sean sólo números (p. ej. "1234")
+        return pd.read_csv(file_path, dtype={'pattern': str})
+    except Exception as e:
+        print(f"Error al cargar reglas de comercios: {e}")
+        return pd.DataFrame(columns=RULE_COLUMNS)
+
+def save_merchant_rule(username, rule_data):
+    """
+    Guardar una regla del tipo "la descripción contiene X → categoría"
+
+    Args:
+        username: Nombre de usuario
+        rule_data: Diccionario con pattern, type, category y fixed_expense
+    """
+    pattern = normalize_description(rule_data.get('pattern', ''))
+    if not pattern:
+        return False
+
+    df = load_merchant_rules(username)
+    rule_id = rule_data.get('id')
+    if rule_id is None or pd.isna(rule_id):
+        rule_id = int(df['id'].max()) + 1 if not df.empty else 1
+    else:
+        df = df[df['id'] != rule_id]
+
+    new_rule = {
+        'id': rule_id,
+        'pattern': pattern,
+        'type': rule_data.get('type', 'Gasto'),
+        'category': rule_data.get('category'),
+        'fixed_expense': bool(rule_data.get('fixed_expense', False)),
+        'created_at': rule_data.get('created_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    }
+    df = pd.concat([df, pd.DataFrame([new_rule])], ignore_index=True)
+    df.to_csv(get_user_rules_file(username), index=False)
+    return True
+
+def delete_merchant_rule(username, rule_id):
+    """Eliminar una regla por ID"""
+    df = load_merchant_rules(username)
+    df = df[df['id'] != rule_id]
+    df.to_csv(get_user_rules_file(username), index=False)
+    return True
+
+def build_automaton(patterns):
+    """
+    Construir un autómata Aho-Corasick a partir de una lista de patrones.
+
+    Args:
+        patterns: Lista de cadenas ya normalizadas
+
+    Returns:
+        Tupla (goto, fail, output): transiciones por estado, enlaces de fallo
+        y los índices de patrones que terminan en cada estado
+    """
+    goto = [{}]
+    fail = [0]
+    output = [[]]
+
+    # Trie con todos los patrones
+    for index, pattern in enumerate(patterns):
+        state = 0
+        for char in pattern:
+            if char not in goto[state]:
+                goto.append({})
+                fail.append(0)
+                output.append([])
+                goto[state][char] = len(goto) - 1
+            state = goto[state][char]
+        output[state].append(index)
+
+    # Enlaces de fallo en orden BFS
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in goto[state].items():
+            queue.append(next_state)
+            fallback = fail[state]
+            while fallback and char not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[next_state] = goto[fallback].get(char, 0)
+            output[next_state] = output[next_state] + output[fail[next_state]]
+
+    return goto, fail, output
+
+def scan_automaton(automaton, text):
+    """Devolver el conjunto de índices de patrones presentes en el texto (una sola pasada)"""
+    goto, fail, output = automaton
+    state = 0
+    found = set()
+    for char in text:
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        if output[state]:
+            found.update(output[state])
+    return found
+
+def get_compiled_rules(username):
+    """
+    Obtener las reglas del usuario compiladas en un único autómata.
+    Se recompila sólo cuando cambia el archivo de reglas.
+    """
+    file_path = get_user_rules_file(username)
+    mtime = os.path.getmtime(file_path) if os.path.exists(file_path) else None
+
+    cached = _compiled_rules_cache.get(username)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    rules_df = load_merchant_rules(username).reset_index(drop=True)
+    automaton = build_automaton(rules_df['pattern'].astype(str).tolist()) if not rules_df.empty else None
+    _compiled_rules_cache[username] = (mtime, rules_df, automaton)
+    return rules_df, automaton
+
+def _select_rule(rules_df, matched, transaction_type=None):
+    """Elegir la regla más específica (patrón más largo) entre las coincidencias"""
+    best = None
+    for index in matched:
+        rule = rules_df.iloc[index]
+        if transaction_type and rule['type'] != transaction_type:
+            continue
+        key = (len(rule['pattern']), -rule['id'])
+        if best is None or key > best[0]:
+            best = (key, index)
+    return None if best is None else rules_df.iloc[best[1]].to_dict()
+
+def match_merchant_rule(username, description, transaction_type=None):
+    """
+    Buscar la regla que aplica a una descripción
+
+    Args:
+        username: Nombre de usuario
+        description: Descripción de la transacción
+        transaction_type: Si se indica, sólo se consideran reglas de ese tipo
+
+    Returns:
+        Diccionario con la regla encontrada o None
+    """
+    rules_df, automaton = get_compiled_rules(username)
+    if automaton is None:
+        return None
+    matched = scan_automaton(automaton, normalize_description(description))
+    return _select_rule(rules_df, matched, transaction_type)
+
+def apply_merchant_rules(username, df):
+    """
+    Aplicar las reglas en bloque a un DataFrame de transacciones.
+    Cada descripción distinta se recorre una sola vez contra todas las reglas,
+    y sólo se aplican reglas del mismo tipo que la transacción. Si cambia la
+    categoría, la subcategoría anterior (que pertenecía a la otra) se borra.
+
+    Returns:
+        Tupla (DataFrame actualizado, máscara booleana de filas modificadas)
+    """
+    df = df.copy()
+    changed = pd.Series(False, index=df.index)
+    rules_df, automaton = get_compiled_rules(username)
+    if automaton is None or df.empty:
+        return df, changed
+
+    codes, uniques = pd.factorize(df['description'].fillna(''))
+    normalized = pd.Series(normalize_descriptions(pd.Series(uniques, dtype=object)).to_numpy()[codes], index=df.index)
+    matches = {text: scan_automaton(automaton, text) for text in normalized.unique()}
+
+    for transaction_type in df['type'].dropna().unique():
+        type_mask = df['type'] == transaction_type
+        selected = {
+            text: _select_rule(rules_df, found, transaction_type)
+            for text, found in matches.items() if found
+        }
+        selected = {text: rule for text, rule in selected.items() if rule}
+        if not selected:
+            continue
+
+        rule_for_row = normalized[type_mask].map(selected).dropna()
+        if rule_for_row.empty:
+            continue
+
+        new_category = rule_for_row.map(lambda rule: rule['category'])
+        new_fixed = rule_for_row.map(lambda rule: bool(rule['fixed_expense']))
+        idx = rule_for_row.index
+        category_changed = df.loc[idx, 'category'] != new_category
+        changed.loc[idx] = category_changed | (df.loc[idx, 'fixed_expense'] != new_fixed)
+        if 'subcategory' in df.columns:
+            # Sin subcategorías cargadas, la columna se lee como float (todo NaN)
+            df['subcategory'] = df['subcategory'].astype(object)
+            df.loc[category_changed[category_changed].index, 'subcategory'] = ''
+        df.loc[idx, 'category'] = new_category
+        df.loc[idx, 'fixed_expense'] = new_fixed
+
+    return df, changed
+
+def recategorize_transactions(username):
+    """
+    Recategorizar retroactivamente todas las transacciones del usuario
+    según sus reglas, con una única escritura del archivo.
+
+    Returns:
+        Cantidad de transacciones modificadas
+    """
+    from utils.data_handler import load_user_data, get_user_transactions_file
+
+    original = load_user_data(username)
+    if original.empty:
+        return 0
+
+    df, changed = apply_merchant_rules(username, original)
+    count = int(changed.sum())
+    if count:
+        df.to_csv(get_user_transactions_file(username), index=False)
+
+        # Las metas vinculadas a una categoría dependen de la categoría de cada fila
+        try:
+            from utils.financial_goals import update_linked_goals
+            update_linked_goals(username, added=df[changed], removed=original[changed])
+        except Exception as e:
+            print(f"Error al actualizar metas vinculadas: {e}")
+    return count
@@ -0,0 +1,196 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.data_handler import load_user_data, get_user_data_version
+from utils.financial_goals import load_user_goals, get_user_goals_file
+from utils.installment_calculator import add_months_array
+from utils.installment_obligations import load_installment_obligations, get_user_obligations_file
+from utils.recurring_detection import get_recurring_transactions
+from utils.cash_flow import fixed_expense_series, expand_series
+
+# Meses hacia adelante que se proyectan al construir el calendario
+CALENDAR_HORIZON_MONTHS = 12
+
+# start y date delimitan cada entrada (iguales salvo en metas, que van del inicio a la fecha objetivo)
+CALENDAR_COLUMNS = ['start', 'date', 'kind', 'description', 'amount', 'currency', 'account_id', 'source_id']
+
+# Calendarios por usuario: {username: (version, ObligationCalendar)}
+_calendar_cache = {}
+
+class ObligationCalendar:
+    """
+    Índice de vencimientos ordenado por fecha. Cada entrada es un intervalo
+    [start, date]; las consultas por rango y por superposición se resuelven
+    con búsquedas binarias sobre los arreglos ordenados.
+    """
+
+    def __init__(self, entries, covered_until=None, fixed_series=None):
+        self.covered_until = covered_until
+        # Series de gastos fijos, para extender el calendario más allá del horizonte inicial
+        self.fixed_series = fixed_series if fixed_series is not None else pd.DataFrame()
+        self._reindex(entries.sort_values('date', kind='stable').reset_index(drop=True))
+
+    def _reindex(self, entries):
+        self.entries = entries
+        self._dates = entries['date'].to_numpy(dtype='datetime64[ns]')
+        durations = self._dates - entries['start'].to_numpy(dtype='datetime64[ns]')
+        self._max_duration = durations.max() if len(durations) else np.timedelta64(0, 'ns')
+
+    def insert(self, entries):
+        """
+        Agregar entradas manteniendo el orden: cada una se intercala en su
+        posición (búsqueda binaria) sin reordenar el calendario completo.
+        """
+        if entries.empty:
+            return
+        entries = entries[CALENDAR_COLUMNS].sort_values('date', kind='stable')
+        positions = np.searchsorted(self._dates, entries['date'].to_numpy(dtype='datetime64[ns]'), side='right')
+        order = np.insert(np.arange(len(self.entries)), positions, len(self.entries) + np.arange(len(entries)))
+        merged = pd.concat([self.entries, entries], ignore_index=True)
+        self._reindex(merged.iloc[order].reset_index(drop=True))
+
+    def extend_until(self, end):
+        """Proyectar los gastos fijos hasta la fecha indicada, si el calendario no la cubre"""
+        end = pd.Timestamp(end)
+        if self.covered_until is None or end <= self.covered_until:
+            return
+        if not self.fixed_series.empty:
+            self.insert(_fixed_expense_entries(self.fixed_series, self.covered_until, end))
+        self.covered_until = end
+
+    def between(self, start, end):
+        """Entradas cuya fecha cae entre start y end (ambas inclusive)"""
+        first = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        last = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+        return self.entries.iloc[first:last]
+
+    def overlapping(self, start, end):
+        """
+        Entradas cuyo intervalo [start, date] se superpone con [start, end].
+        Sólo pueden hacerlo las que terminan desde start en adelante y hasta
+        end más la duración máxima de una entrada; dentro de ese tramo se
+        filtra por inicio.
+        """
+        start = np.datetime64(pd.Timestamp(start), 'ns')
+        end = np.datetime64(pd.Timestamp(end), 'ns')
+        first = np.searchsorted(self._dates, start, side='left')
+        last = np.searchsorted(self._dates, end + self._max_duration, side='right')
+        candidates = self.entries.iloc[first:last]
+        return candidates[candidates['start'].to_numpy(dtype='datetime64[ns]') <= end]
+
+def _fixed_expense_entries(series, start, end):
+    """Ocurrencias de los gastos fijos dentro de (start, end]"""
+    events = expand_series(series, start, end)
+    return pd.DataFrame({
+        'start': pd.to_datetime(events['date']),
+        'date': pd.to_datetime(events['date']),
+        'kind': 'Gasto fijo',
+        'description': events['description'].to_numpy(),
+        'amount': -events['amount'].to_numpy(dtype=float),
+        'currency': events['currency'].to_numpy(),
+        'account_id': events['account_id'].to_numpy(),
+        'source_id': None
+    })
+
+def _installment_entries(obligations):
+    """Cuotas pendientes de la tabla de cuotas"""
+    description = obligations['description'].astype(str) + ' (' + obligations['installment_number'].astype(str) + \
+        '/' + obligations['total_installments'].astype(str) + ')'
+    return pd.DataFrame({
+        'start': obligations['due_date'].to_numpy(),
+        'date': obligations['due_date'].to_numpy(),
+        'kind': 'Cuota',
+        'description': description.to_numpy(),
+        'amount': obligations['amount'].to_numpy(dtype=float),
+        'currency': obligations['currency'].to_numpy(),
+        'account_id': obligations['account_id'].to_numpy(),
+        'source_id': obligations['transaction_id'].to_numpy()
+    })
+
+def _goal_entries(goals_df):
+    """Metas activas: desde su fecha de inicio hasta la fecha objetivo, por el monto que falta"""
+    goals = goals_df[goals_df['status'] != 'Completado']
+    target_date = pd.to_datetime(goals['target_date'], errors='coerce')
+    start_date = pd.to_datetime(goals['start_date'], errors='coerce').fillna(target_date)
+    goals = goals[target_date.notna()]
+    remaining = pd.to_numeric(goals['target_amount'], errors='coerce').fillna(0) - \
+        pd.to_numeric(goals['current_amount'], errors='coerce').fillna(0)
+
+    return pd.DataFrame({
+        'start': np.minimum(start_date[goals.index], target_date[goals.index]).to_numpy(),
+        'date': target_date[goals.index].to_numpy(),
+        'kind': 'Meta',
+        'description': goals['name'].to_numpy(),
+        'amount': remaining.clip(lower=0).to_numpy(),
+        'currency': goals['currency'].to_numpy(),
+        'account_id': None,
+        'source_id': goals['id'].to_numpy()
+    })
+
+def build_obligation_calendar(username, df=None, today=None):
+    """
+    Construir el calendario de vencimientos del usuario: cuotas pendientes,
+    fechas objetivo de metas y gastos fijos proyectados CALENDAR_HORIZON_MONTHS
+    meses hacia adelante.
+    """
+    if df is None:
+        df = load_user_data(username)
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    horizon = pd.Timestamp(add_months_array([today], [CALENDAR_HORIZON_MONTHS])[0])
+
+    entries = [pd.DataFrame(columns=CALENDAR_COLUMNS)]
+    entries.append(_installment_entries(load_installment_obligations(username)))
+
+    goals_df = load_user_goals(username)
+    if not goals_df.empty:
+        entries.append(_goal_entries(goals_df))
+
+    series = pd.DataFrame()
+    if not df.empty:
+        series = fixed_expense_series(df, get_recurring_transactions(username, df), today)
+        if not series.empty:
+            entries.append(_fixed_expense_entries(series, today - pd.Timedelta(days=1), horizon))
+
+    entries = pd.concat([e for e in entries if not e.empty] or entries, ignore_index=True)
+    entries['start'] = pd.to_datetime(entries['start'])
+    entries['date'] = pd.to_datetime(entries['date'])
+    return ObligationCalendar(entries, covered_until=horizon, fixed_series=series)
+
+def _calendar_version(username):
+    """
+    Marca de versión del calendario: los archivos de los que depende y la fecha
+    (los gastos fijos se proyectan desde hoy)
+    """
+    paths = [get_user_goals_file(username), get_user_obligations_file(username)]
+    return (get_user_data_version(username), datetime.now().date()) + tuple(
+        os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths
+    )
+
+def get_obligation_calendar(username):
+    """Calendario del usuario, reconstruido sólo si cambiaron sus transacciones, cuotas, metas o la fecha"""
+    cached = _calendar_cache.get(username)
+    if cached and cached[0] == _calendar_version(username):
+        return cached[1]
+
+    calendar = build_obligation_calendar(username)
+    # Construirlo puede crear los archivos de metas y de cuotas: se toma la versión resultante
+    _calendar_cache[username] = (_calendar_version(username), calendar)
+    return calendar
+
+def obligations_between(username, start, end):
+    """
+    Vencimientos del usuario entre dos fechas (ambas inclusive): cuotas,
+    fechas objetivo de metas y gastos fijos, ordenados por fecha.
+
+    Args:
+        username: Nombre de usuario
+        start: Fecha inicial
+        end: Fecha final
+
+    Returns:
+        DataFrame con las columnas CALENDAR_COLUMNS
+    """
+    calendar = get_obligation_calendar(username)
+    calendar.extend_until(end)
+    return calendar.between(start, end)
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from utils.data_handler import load_user_data
+from utils.accounts import get_account_by_id
+from utils.statement_importer import iter_statement_chunks
+
+def load_statement_lines(file, profile):
+    """Leer todas las líneas de un extracto ya normalizadas (date, description, amount, type, currency)"""
+    chunks = [chunk for chunk, _ in iter_statement_chunks(file, profile)]
+    if not chunks:
+        return pd.DataFrame(columns=['date', 'description', 'amount', 'type', 'currency'])
+    return pd.concat(chunks, ignore_index=True)
+
+def _signed_cents(df):
+    """Monto con signo en centavos: positivo para ingresos, negativo para gastos"""
+    cents = np.round(pd.to_numeric(df['amount'], errors='coerce').fillna(0).to_numpy() * 100).astype(np.int64)
+    return np.where(df['type'].to_numpy() == 'Gasto', -cents, cents)
+
+def match_statement_lines(statement, ledger, tolerance_days=3):
+    """
+    Emparejar líneas del extracto con transacciones registradas por monto
+    exacto (con signo y moneda) y la fecha más cercana dentro de la tolerancia.
+    Se usa un merge_asof (sort-merge) en lugar de comparar todas contra todas;
+    si dos líneas eligen la misma transacción gana la más cercana en fecha y la
+    otra vuelve a intentar en la ronda siguiente, hasta que una ronda no
+    empareje nada más.
+
+    Args:
+        statement: DataFrame con date, amount, type y currency
+        ledger: DataFrame de transacciones (con id) de la misma cuenta
+        tolerance_days: Diferencia máxima de días entre ambas fechas
+
+    Returns:
+        DataFrame con statement_index, transaction_id y days_diff por cada par
+    """
+    left = pd.DataFrame({
+        'statement_index': statement.index,
+        'date': pd.to_datetime(statement['date']).to_numpy(),
+        'currency': statement['currency'].to_numpy(),
+        'cents': _signed_cents(statement)
+    })
+    right = pd.DataFrame({
+        'transaction_id': ledger['id'].to_numpy(),
+        'ledger_date': pd.to_datetime(ledger['date']).to_numpy(),
+        'currency': ledger['currency'].to_numpy(),
+        'cents': _signed_cents(ledger)
+    })
+
+    matches = []
+    tolerance = pd.Timedelta(days=tolerance_days)
+    # Cada ronda empareja al menos una línea; se repite hasta que no haya más avances
+    while not left.empty and not right.empty:
+        merged = pd.merge_asof(
+            left.sort_values('date'),
+            right.sort_values('ledger_date'),
+            left_on='date', right_on='ledger_date',
+            by=['currency', 'cents'],
+            direction='nearest',
+            tolerance=tolerance
+        ).dropna(subset=['transaction_id'])
+        if merged.empty:
+            break
+        merged['transaction_id'] = merged['transaction_id'].astype(right['transaction_id'].dtype)
+
+        # Resolver transacciones elegidas por más de una línea
+        merged['days_diff'] = (merged['date'] - merged['ledger_date']).dt.days
+        merged['distance'] = merged['days_diff'].abs()
+        merged = merged.sort_values(['distance', 'statement_index']).drop_duplicates('transaction_id')
+
+        matches.append(merged[['statement_index', 'transaction_id', 'days_diff']])
+        left = left[~left['statement_index'].isin(merged['statement_index'])]
+        right = right[~right['transaction_id'].isin(merged['transaction_id'])]
+
+    if not matches:
+        return pd.DataFrame(columns=['statement_index', 'transaction_id', 'days_diff'])
+    return pd.concat(matches, ignore_index=True)
+
+def reconcile_statement(username, statement, account_id, tolerance_days=3, ledger_df=None):
+    """
+    Conciliar un extracto bancario contra las transacciones de una cuenta
+
+    Args:
+        username: Nombre de usuario
+        statement: DataFrame de líneas del extracto (ver load_statement_lines)
+        account_id: Cuenta a la que corresponde el extracto
+        tolerance_days: Diferencia máxima de días para considerar una coincidencia
+        ledger_df: Transacciones del usuario (se cargan si no se indican)
+
+    Returns:
+        Diccionario con las líneas conciliadas, las faltantes (en el extracto pero
+        no registradas), las sobrantes (registradas pero no en el extracto) y los saldos
+    """
+    if ledger_df is None:
+        ledger_df = load_user_data(username)
+    statement = statement.reset_index(drop=True)
+
+    ledger = ledger_df[pd.to_numeric(ledger_df['account_id'], errors='coerce') == int(account_id)]
+    if not statement.empty:
+        # Sólo cuentan como sobrantes las transacciones dentro del período del extracto
+        start = pd.to_datetime(statement['date']).min() - pd.Timedelta(days=tolerance_days)
+        end = pd.to_datetime(statement['date']).max() + pd.Timedelta(days=tolerance_days)
+        ledger_dates = pd.to_datetime(ledger['date'])
+        ledger = ledger[(ledger_dates >= start) & (ledger_dates <= end)]
+
+    pairs = match_statement_lines(statement, ledger, tolerance_days)
+
+    matched = statement.loc[pairs['statement_index']].assign(
+        transaction_id=pairs['transaction_id'].to_numpy(),
+        days_diff=pairs['days_diff'].to_numpy()
+    ).sort_values('date')
+    missing = statement.drop(index=pairs['statement_index']).sort_values('date')
+    extra = ledger[~ledger['id'].isin(pairs['transaction_id'])].sort_values('date')
+
+    statement_net = _signed_cents(statement).sum() / 100 if not statement.empty else 0.0
+    ledger_net = _signed_cents(ledger).sum() / 100 if not ledger.empty else 0.0
+    account = get_account_by_id(username, int(account_id))
+
+    return {
+        'account_id': account_id,
+        'account_name': account['name'] if account else None,
+        'matched': matched,
+        'missing': missing,
+        'extra': extra,
+        'statement_net': statement_net,
+        'ledger_net': ledger_net,
+        'difference': statement_net - ledger_net,
+        'account_balance': float(account['balance']) if account else None
+    }
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.data_handler import load_user_data, get_user_data_version, get_user_transactions_file
+from utils.merchant_rules import normalize_descriptions
+
+# Períodos reconocidos: (nombre, días, tolerancia en días)
+RECURRENCE_PERIODS = [
+    ('Semanal', 7, 1),
+    ('Quincenal', 14, 2),
+    ('Mensual', 30.4, 4),
+    ('Bimestral', 61, 6),
+    ('Anual', 365, 20)
+]
+# Frecuencias que se consideran gasto fijo al marcar transacciones
+FIXED_EXPENSE_FREQUENCIES = ['Mensual', 'Bimestral', 'Anual']
+
+# Mínimo de apariciones (en días distintos) para considerar una serie recurrente
+MIN_OCCURRENCES = 3
+# Proporción mínima de intervalos dentro de la banda de tolerancia del período
+MIN_REGULARITY = 0.7
+# Variación típica máxima del monto entre apariciones consecutivas (20%)
+MAX_AMOUNT_CHANGE = 0.2
+
+RECURRING_COLUMNS = [
+    'key', 'type', 'description', 'category', 'account_id', 'currency', 'frequency',
+    'period_days', 'occurrences', 'regularity', 'amount', 'amount_pesos',
+    'last_date', 'next_date', 'active'
+]
+
+# Recurrencias detectadas por usuario: {username: ((data_version, fecha), recurring_df)}
+_recurring_cache = {}
+
+def get_recurring_keys(df):
+    """
+    Clave de agrupación de cada transacción: tipo + descripción normalizada
+    sin números (así "Netflix 03/2024" y "Netflix 04/2024" caen juntas).
+    """
+    codes, uniques = pd.factorize(df['description'].fillna(''))
+    merchant = normalize_descriptions(pd.Series(uniques, dtype=object))
+    merchant = merchant.str.replace(r'\d+', ' ', regex=True).str.split().str.join(' ')
+    merchant = pd.Series(merchant.to_numpy()[codes], index=df.index)
+    return (df['type'].astype(str) + '|' + merchant).where(merchant != '', '')
+
+def detect_recurring_transactions(df, today=None):
+    """
+    Detectar cargos e ingresos recurrentes (suscripciones, alquiler, sueldo).
+    El libro se ordena una vez por clave y fecha; los intervalos entre
+    apariciones salen de un único np.diff y las estadísticas de cada grupo se
+    calculan con agregaciones vectorizadas.
+
+    Args:
+        df: DataFrame de transacciones
+        today: Fecha de referencia para decidir si la recurrencia sigue activa
+
+    Returns:
+        DataFrame con una fila por recurrencia (columnas RECURRING_COLUMNS)
+    """
+    if df.empty:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    data = pd.DataFrame({
+        'key': get_recurring_keys(df).to_numpy(),
+        'day': pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]').astype(np.int64),
+        'amount': pd.to_numeric(df['amount'], errors='coerce').fillna(0).to_numpy(),
+        'amount_pesos': pd.to_numeric(df['amount_pesos'], errors='coerce').fillna(0).to_numpy(),
+        'row': np.arange(len(df))
+    })
+    data = data[data['key'] != '']
+
+    # Un registro por clave y día (dos cargos el mismo día no son un intervalo)
+    data = data.groupby(['key', 'day'], sort=True).agg(
+        amount=('amount', 'sum'), amount_pesos=('amount_pesos', 'sum'), row=('row', 'last')
+    ).reset_index()
+
+    keys = data['key'].to_numpy()
+    same_group = keys[1:] == keys[:-1]
+    intervals = np.diff(data['day'].to_numpy())
+    previous_amount = data['amount'].to_numpy()[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amount_change = np.abs(data['amount'].to_numpy()[1:] / previous_amount - 1)
+
+    steps = pd.DataFrame({
+        'key': keys[1:][same_group],
+        'interval': intervals[same_group],
+        'amount_change': amount_change[same_group]
+    })
+    stats = steps.groupby('key').agg(
+        median_interval=('interval', 'median'),
+        intervals=('interval', 'size'),
+        amount_change=('amount_change', 'median')
+    )
+    stats = stats[stats['intervals'] >= MIN_OCCURRENCES - 1]
+    if stats.empty:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    # Período cuya banda contiene el intervalo mediano
+    names = np.array([name for name, _, _ in RECURRENCE_PERIODS] + [''])
+    periods = np.array([days for _, days, _ in RECURRENCE_PERIODS] + [np.nan])
+    tolerances = np.array([tol for _, _, tol in RECURRENCE_PERIODS] + [np.nan])
+    median_interval = stats['median_interval'].to_numpy()
+    fits = np.abs(median_interval[:, None] - periods[None, :-1]) <= tolerances[None, :-1]
+    choice = np.where(fits.any(axis=1), fits.argmax(axis=1), len(RECURRENCE_PERIODS))
+    stats['frequency'] = names[choice]
+    stats['period_days'] = periods[choice]
+    stats['tolerance'] = tolerances[choice]
+    stats = stats[stats['frequency'] != '']
+
+    # Regularidad: proporción de intervalos dentro de la banda del período elegido
+    steps = steps[steps['key'].isin(stats.index)]
+    in_band = np.abs(steps['interval'].to_numpy() - steps['key'].map(stats['period_days']).to_numpy()) <= \
+        steps['key'].map(stats['tolerance']).to_numpy()
+    stats['regularity'] = pd.Series(in_band, index=steps.index).groupby(steps['key']).mean()
+    stats = stats[(stats['regularity'] >= MIN_REGULARITY) & (stats['amount_change'].fillna(np.inf) <= MAX_AMOUNT_CHANGE)]
+    if stats.empty:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    # Datos de la última aparición de cada recurrencia
+    last = data[data['key'].isin(stats.index)].groupby('key').last()
+    source = df.iloc[last['row'].to_numpy()]
+    last_date = pd.to_datetime(last['day'].to_numpy(), unit='D')
+    next_date = last_date + pd.to_timedelta(stats.loc[last.index, 'period_days'].to_numpy(), unit='D')
+    period = stats.loc[last.index, 'period_days'].to_numpy()
+
+    recurring = pd.DataFrame({
+        'key': last.index,
+        'type': source['type'].to_numpy(),
+        'description': source['description'].to_numpy(),
+        'category': source['category'].to_numpy(),
+        'account_id': source['account_id'].to_numpy() if 'account_id' in source.columns else None,
+        'currency': source['currency'].to_numpy(),
+        'frequency': stats.loc[last.index, 'frequency'].to_numpy(),
+        'period_days': period,
+        'occurrences': stats.loc[last.index, 'intervals'].to_numpy() + 1,
+        'regularity': stats.loc[last.index, 'regularity'].to_numpy(),
+        'amount': last['amount'].to_numpy(),
+        'amount_pesos': last['amount_pesos'].to_numpy(),
+        'last_date': last_date,
+        'next_date': next_date.normalize(),
+        # Sigue activa si no se saltó más de medio período desde la fecha esperada
+        'active': (today - last_date).days.to_numpy() <= period * 1.5
+    })
+    return recurring.sort_values(['type', 'amount_pesos'], ascending=[True, False]).reset_index(drop=True)
+
+def get_recurring_transactions(username, df=None):
+    """
+    Obtener las recurrencias del usuario, recalculadas sólo si cambiaron sus
+    datos o la fecha (de ella depende si cada recurrencia sigue activa)
+    """
+    version = (get_user_data_version(username), datetime.now().date())
+    cached = _recurring_cache.get(username)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    if df is None:
+        df = load_user_data(username)
+    recurring = detect_recurring_transactions(df)
+    _recurring_cache[username] = (version, recurring)
+    return recurring
+
+def mark_recurring_as_fixed(username):
+    """
+    Marcar como gasto fijo los gastos que pertenecen a una recurrencia activa
+    mensual, bimestral o anual, con una única escritura del archivo.
+
+    Returns:
+        Cantidad de transacciones modificadas
+    """
+    df = load_user_data(username)
+    recurring = get_recurring_transactions(username, df)
+    if df.empty or recurring.empty:
+        return 0
+
+    fixed_keys = recurring.loc[
+        (recurring['type'] == 'Gasto') & recurring['active'] &
+        recurring['frequency'].isin(FIXED_EXPENSE_FREQUENCIES), 'key'
+    ]
+    is_fixed = df['fixed_expense'].astype(str).str.lower().isin(['true', '1'])
+    to_mark = get_recurring_keys(df).isin(fixed_keys) & ~is_fixed
+    count = int(to_mark.sum())
+    if count:
+        original = df[to_mark]
+        df.loc[to_mark, 'fixed_expense'] = True
+        df.to_csv(get_user_transactions_file(username), index=False)
+
+        try:
+            from utils.financial_goals import update_linked_goals
+            update_linked_goals(username, added=df[to_mark], removed=original)
+        except Exception as e:
+            print(f"Error al actualizar metas vinculadas: {e}")
+    return count
@@ -0,0 +1,147 @@
+import os
+import time
+import sqlite3
+import hashlib
+import secrets
+import threading
+from contextlib import contextmanager
+
+# Base de sesiones persistentes ("Mantener sesión iniciada").
+# El token viaja en la URL (?session=...) porque Streamlit no permite escribir
+# cookies: puede quedar en el historial del navegador, en enlaces compartidos o
+# en el encabezado Referer. Para acotar el riesgo sólo se guarda su hash, cada
+# token se reemplaza al usarse (rotate_session) y al cambiar la contraseña se
+# revocan todas las sesiones del usuario.
+SESSIONS_DB_PATH = "data/sessions.db"
+# Duración de una sesión recordada
+SESSION_TTL_SECONDS = 30 * 24 * 3600
+# Cada cuánto se eliminan las sesiones vencidas
+SESSION_CLEANUP_INTERVAL = 3600
+
+_cleanup_lock = threading.Lock()
+_cleanup_thread = None
+
+@contextmanager
+def _connect():
+    """Abrir la base de sesiones (creando la tabla si no existe) en una transacción"""
+    os.makedirs(os.path.dirname(SESSIONS_DB_PATH), exist_ok=True)
+    connection = sqlite3.connect(SESSIONS_DB_PATH, timeout=10)
+    try:
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "token_hash TEXT PRIMARY KEY, username TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            yield connection
+    finally:
+        connection.close()
+
+def _hash_token(token):
+    """Sólo se guarda el hash del token: una copia del archivo no permite iniciar sesión"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_session(username):
+    """
+    Crear una sesión persistente para el usuario
+
+    Returns:
+        Token aleatorio que identifica la sesión
+    """
+    token = secrets.token_urlsafe(32)
+    token_hash = _hash_token(token)
+    expires_at = time.time() + SESSION_TTL_SECONDS
+
+    with _connect() as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions (token_hash, username, expires_at) VALUES (?, ?, ?)",
+            (token_hash, username, expires_at)
+        )
+    start_session_cleanup()
+    return token
+
+def get_session_user(token):
+    """
+    Obtener el usuario de una sesión vigente
+
+    Se consulta siempre la base (por clave primaria), así una sesión revocada
+    desde otro proceso del servidor deja de valer de inmediato.
+
+    Returns:
+        Nombre de usuario, o None si el token no existe o venció
+    """
+    if not token:
+        return None
+
+    start_session_cleanup()
+    with _connect() as connection:
+        row = connection.execute(
+            "SELECT username, expires_at FROM sessions WHERE token_hash = ?", (_hash_token(token),)
+        ).fetchone()
+    if row is None:
+        return None
+
+    username, expires_at = row
+    if expires_at < time.time():
+        revoke_session(token)
+        return None
+    return username
+
+def revoke_session(token):
+    """Eliminar una sesión (al cerrar sesión o cuando vence)"""
+    with _connect() as connection:
+        connection.execute("DELETE FROM sessions WHERE token_hash = ?", (_hash_token(token),))
+
+def rotate_session(token):
+    """
+    Reemplazar una sesión vigente por una nueva, de modo que un token que
+    quedó expuesto (por ejemplo, en la URL) deje de servir una vez usado.
+
+    Returns:
+        Tupla (username, nuevo token), o (None, None) si el token no existe o venció
+    """
+    username = get_session_user(token)
+    if username is None:
+        return None, None
+    # Si otro proceso lo usó (o revocó) al mismo tiempo, el token ya no vale
+    with _connect() as connection:
+        deleted = connection.execute("DELETE FROM sessions WHERE token_hash = ?", (_hash_token(token),)).rowcount
+    if not deleted:
+        return None, None
+    return username, create_session(username)
+
+def revoke_user_sessions(username):
+    """
+    Eliminar todas las sesiones de un usuario (por ejemplo, al cambiar la contraseña)
+
+    Returns:
+        Cantidad de sesiones eliminadas de la base
+    """
+    with _connect() as connection:
+        return connection.execute("DELETE FROM sessions WHERE username = ?", (username,)).rowcount
+
+def cleanup_expired_sessions():
+    """
+    Eliminar las sesiones vencidas de la base
+
+    Returns:
+        Cantidad de sesiones eliminadas de la base
+    """
+    with _connect() as connection:
+        return connection.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+def _cleanup_loop():
+    while True:
+        try:
+            cleanup_expired_sessions()
+        except Exception as e:
+            print(f"Error al limpiar sesiones vencidas: {e}")
+        time.sleep(SESSION_CLEANUP_INTERVAL)
+
+def start_session_cleanup():
+    """Iniciar (una sola vez por proceso) la limpieza periódica de sesiones en segundo plano"""
+    global _cleanup_thread
+    with _cleanup_lock:
+        if _cleanup_thread is not None and _cleanup_thread.is_alive():
+            return
+        _cleanup_thread = threading.Thread(target=_cleanup_loop, name="session-cleanup", daemon=True)
+        _cleanup_thread.start()
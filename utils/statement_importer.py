@@ -0,0 +1,337 @@
+import os
+import io
+import re
+import json
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.data_handler import (
+    TRANSACTION_COLUMNS, get_next_id, get_user_transactions_file,
+    commit_staged_transactions
+)
+from utils.merchant_rules import apply_merchant_rules
+from utils.dedupe_index import (
+    load_fingerprint_index, save_fingerprint_index, compute_fingerprints,
+    mark_already_imported, merge_imported_fingerprints
+)
+from utils.duplicate_detection import flag_duplicates_in_batch
+from utils.financial_goals import load_linked_goals, calculate_goal_contributions
+
+# Filas por bloque al leer extractos: acota la memoria sin importar el tamaño del archivo
+IMPORT_CHUNK_SIZE = 50000
+
+# Perfil por defecto para un extracto CSV
+DEFAULT_PROFILE = {
+    'format': 'csv',
+    'delimiter': ',',
+    'encoding': 'utf-8',
+    'skiprows': 0,
+    'decimal': '.',
+    'thousands': '',
+    'date_column': 'Fecha',
+    'date_format': '%d/%m/%Y',
+    'description_column': 'Descripción',
+    'amount_column': 'Importe',
+    'debit_column': '',
+    'credit_column': '',
+    'currency_column': '',
+    'default_currency': 'ARS',
+    'payment_method': 'Transferencia',
+    'account_id': None
+}
+
+OFX_TRANSACTION_RE = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+OFX_FIELD_RE = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+def get_user_import_profiles_file(username):
+    """Obtener la ruta al archivo de perfiles de importación del usuario"""
+    os.makedirs(f"data/users/{username}", exist_ok=True)
+    return f"data/users/{username}/import_profiles.json"
+
+def load_import_profiles(username):
+    """Cargar los perfiles de importación (uno por banco) del usuario"""
+    file_path = get_user_import_profiles_file(username)
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        with open(file_path, 'r') as file:
+            return json.load(file)
+    except Exception as e:
+        print(f"Error al cargar perfiles de importación: {e}")
+        return {}
+
+def save_import_profile(username, bank_name, profile):
+    """Guardar el mapeo de columnas de un banco"""
+    profiles = load_import_profiles(username)
+    profiles[bank_name] = {**DEFAULT_PROFILE, **profile}
+    with open(get_user_import_profiles_file(username), 'w') as file:
+        json.dump(profiles, file, ensure_ascii=False, indent=2)
+    return True
+
+def delete_import_profile(username, bank_name):
+    """Eliminar un perfil de importación"""
+    profiles = load_import_profiles(username)
+    profiles.pop(bank_name, None)
+    with open(get_user_import_profiles_file(username), 'w') as file:
+        json.dump(profiles, file, ensure_ascii=False, indent=2)
+    return True
+
+def _parse_amounts(values, profile):
+    """Convertir una columna de importes (texto) a números, de forma vectorizada"""
+    text = values.astype(str).str.strip().str.replace(r'[^\d,.\-+]', '', regex=True)
+    if profile.get('thousands'):
+        text = text.str.replace(profile['thousands'], '', regex=False)
+    if profile.get('decimal', '.') != '.':
+        text = text.str.replace(profile['decimal'], '.', regex=False)
+    return pd.to_numeric(text, errors='coerce')
+
+def _iter_csv_chunks(file, profile, chunksize):
+    """Leer un extracto CSV por bloques, sólo con las columnas mapeadas"""
+    columns = [
+        profile.get(key) for key in
+        ('date_column', 'description_column', 'amount_column', 'debit_column', 'credit_column', 'currency_column')
+        if profile.get(key)
+    ]
+    reader = pd.read_csv(
+        file,
+        sep=profile.get('delimiter') or ',',
+        encoding=profile.get('encoding') or 'utf-8',
+        skiprows=int(profile.get('skiprows') or 0),
+        usecols=lambda column: column.strip() in columns,
+        dtype=str,
+        chunksize=chunksize
+    )
+    for chunk in reader:
+        chunk.columns = [column.strip() for column in chunk.columns]
+        yield chunk
+
+def _iter_ofx_chunks(file, profile, chunksize):
+    """
+    Leer un extracto OFX línea a línea, armando bloques de movimientos
+    con las mismas columnas que un perfil CSV.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        stream = open(file, 'r', encoding=profile.get('encoding') or 'latin-1', errors='replace')
+    else:
+        stream = io.TextIOWrapper(file, encoding=profile.get('encoding') or 'latin-1', errors='replace')
+
+    currency = profile.get('default_currency', 'ARS')
+    records = []
+    buffer = ''
+    try:
+        for line in stream:
+            currency_match = re.search(r'<CURDEF>(\w+)', line, re.I)
+            if currency_match:
+                currency = currency_match.group(1).upper()
+
+            if buffer or '<STMTTRN>' in line.upper():
+                buffer += line
+            if '</STMTTRN>' not in line.upper():
+                continue
+
+            for block in OFX_TRANSACTION_RE.findall(buffer):
+                fields = {tag.upper(): value.strip() for tag, value in OFX_FIELD_RE.findall(block)}
+                records.append({
+                    'date': fields.get('DTPOSTED', '')[:8],
+                    'description': fields.get('NAME') or fields.get('MEMO', ''),
+                    'amount': fields.get('TRNAMT', ''),
+                    'currency': currency
+                })
+            buffer = ''
+
+            if len(records) >= chunksize:
+                yield pd.DataFrame(records)
+                records = []
+    finally:
+        if isinstance(file, (str, os.PathLike)):
+            stream.close()
+        else:
+            stream.detach()
+
+    if records:
+        yield pd.DataFrame(records)
+
+def iter_statement_chunks(file, profile, chunksize=IMPORT_CHUNK_SIZE):
+    """
+    Recorrer un extracto bancario por bloques ya normalizados.
+
+    Args:
+        file: Ruta o archivo abierto en modo binario (CSV u OFX)
+        profile: Perfil de importación del banco
+        chunksize: Filas por bloque
+
+    Yields:
+        Tupla (DataFrame con date, description, amount, type y currency; filas descartadas)
+    """
+    profile = {**DEFAULT_PROFILE, **profile}
+
+    if profile['format'] == 'ofx':
+        raw_chunks = _iter_ofx_chunks(file, profile, chunksize)
+        mapped = {'date': 'date', 'description': 'description', 'amount': 'amount', 'currency': 'currency'}
+        date_format = '%Y%m%d'
+        amount_profile = {**profile, 'decimal': '.', 'thousands': ''}
+    else:
+        if not profile['amount_column'] and not (profile['debit_column'] and profile['credit_column']):
+            raise ValueError("El perfil no indica la columna de importe ni las de débito y crédito")
+        raw_chunks = _iter_csv_chunks(file, profile, chunksize)
+        mapped = {
+            'date': profile['date_column'],
+            'description': profile['description_column'],
+            'amount': profile['amount_column'],
+            'currency': profile['currency_column']
+        }
+        date_format = profile['date_format'] or None
+        amount_profile = profile
+
+    for raw in raw_chunks:
+        dates = pd.to_datetime(raw[mapped['date']].str.strip(), format=date_format, errors='coerce')
+
+        # Importe con signo: una columna única o débito/crédito separados
+        if mapped['amount'] and mapped['amount'] in raw.columns:
+            signed = _parse_amounts(raw[mapped['amount']], amount_profile)
+        else:
+            expected = [profile['debit_column'], profile['credit_column']] \
+                if profile['debit_column'] and profile['credit_column'] else [mapped['amount']]
+            missing = [column for column in expected if column not in raw.columns]
+            if missing:
+                raise ValueError(f"El extracto no tiene las columnas de importe del perfil: {', '.join(missing)}")
+            debit = _parse_amounts(raw[profile['debit_column']], profile).fillna(0).abs()
+            credit = _parse_amounts(raw[profile['credit_column']], profile).fillna(0).abs()
+            signed = credit - debit
+
+        if mapped['currency'] and mapped['currency'] in raw.columns:
+            currency = raw[mapped['currency']].fillna(profile['default_currency']).str.strip().str.upper()
+            currency = currency.replace({'$': 'ARS', 'U$S': 'USD', 'US$': 'USD', 'U$D': 'USD'})
+        else:
+            currency = pd.Series(profile['default_currency'], index=raw.index)
+
+        chunk = pd.DataFrame({
+            'date': dates,
+            'description': raw[mapped['description']].fillna('').str.strip(),
+            'amount': signed.abs(),
+            'type': np.where(signed < 0, 'Gasto', 'Ingreso'),
+            'currency': currency
+        })
+
+        valid = chunk['date'].notna() & signed.notna() & (signed != 0) & chunk['currency'].isin(['ARS', 'USD'])
+        yield chunk[valid], int((~valid).sum())
+
+def build_transactions_chunk(username, chunk, profile, dollar_rate, first_id):
+    """
+    Convertir un bloque normalizado en filas de transactions.csv:
+    conversión de moneda vectorizada, IDs consecutivos y categorías por reglas.
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    is_usd = (chunk['currency'] == 'USD').to_numpy()
+    exchange_rate = np.where(is_usd, float(dollar_rate), 1.0)
+
+    transactions = pd.DataFrame({
+        'id': np.arange(first_id, first_id + len(chunk)),
+        'date': chunk['date'].dt.strftime('%Y-%m-%d').to_numpy(),
+        'type': chunk['type'].to_numpy(),
+        'category': 'Otros',
+        'subcategory': '',
+        'description': chunk['description'].to_numpy(),
+        'amount': chunk['amount'].to_numpy(),
+        'currency': chunk['currency'].to_numpy(),
+        'exchange_rate': exchange_rate,
+        'amount_pesos': chunk['amount'].to_numpy() * exchange_rate,
+        'payment_method': np.where(chunk['type'] == 'Gasto', profile.get('payment_method') or 'Transferencia', None),
+        'fixed_expense': False,
+        'installments_total': 1,
+        'installments_paid': 0,
+        'created_at': now,
+        'account_id': profile.get('account_id')
+    })
+
+    transactions, _ = apply_merchant_rules(username, transactions)
+    return transactions[TRANSACTION_COLUMNS]
+
+def import_statement(username, file, profile, dollar_rate, chunksize=IMPORT_CHUNK_SIZE):
+    """
+    Importar un extracto bancario completo.
+    Cada bloque se valida, convierte y categoriza por separado y se escribe a un
+    archivo temporal; al final todo se agrega al archivo de transacciones en una
+    única escritura, con un solo ajuste de saldo por cuenta y por meta vinculada.
+    Los movimientos que ya estaban registrados (misma huella) se omiten, por lo
+    que volver a importar un extracto superpuesto no genera duplicados. Los que
+    se parecen a una transacción existente sin ser idénticos se importan igual,
+    pero se informan como posibles duplicados para que el usuario los revise.
+
+    Returns:
+        Diccionario con las cantidades importadas, descartadas y omitidas, y la
+        lista de posibles duplicados (movimiento importado e ID de la transacción existente)
+    """
+    profile = {**DEFAULT_PROFILE, **profile}
+    next_id = int(get_next_id(username))
+    summary = {
+        'imported': 0, 'rejected': 0, 'duplicates': 0, 'income': 0.0, 'expenses': 0.0,
+        'possible_duplicates': []
+    }
+    balance_delta = 0.0
+    linked_goals = load_linked_goals(username)
+    goal_contributions = pd.Series(dtype=float)
+    fingerprint_index = load_fingerprint_index(username)
+    seen_counts = pd.Series(dtype=np.int64)
+
+    # Un archivo temporal propio por importación: dos importaciones simultáneas no se pisan
+    staging = tempfile.NamedTemporaryFile(
+        'w', newline='', suffix='.import', delete=False,
+        dir=os.path.dirname(get_user_transactions_file(username))
+    )
+    staging_path = staging.name
+    try:
+        with staging:
+            for chunk, rejected in iter_statement_chunks(file, profile, chunksize):
+                summary['rejected'] += rejected
+                if chunk.empty:
+                    continue
+
+                transactions = build_transactions_chunk(username, chunk, profile, dollar_rate, next_id)
+                duplicated, seen_counts = mark_already_imported(
+                    fingerprint_index, compute_fingerprints(transactions), seen_counts
+                )
+                summary['duplicates'] += int(duplicated.sum())
+                transactions = transactions[~duplicated]
+                if transactions.empty:
+                    continue
+
+                transactions['id'] = np.arange(next_id, next_id + len(transactions))
+
+                # Movimientos parecidos (no idénticos) a transacciones ya registradas
+                existing_ids = flag_duplicates_in_batch(username, transactions)
+                flagged = transactions[existing_ids.notna()]
+                summary['possible_duplicates'].extend(
+                    flagged[['id', 'date', 'description', 'amount', 'currency']]
+                    .assign(existing_id=existing_ids[flagged.index].astype(int))
+                    .to_dict('records')
+                )
+                transactions.to_csv(staging, header=False, index=False)
+                next_id += len(transactions)
+
+                is_income = transactions['type'] == 'Ingreso'
+                summary['imported'] += len(transactions)
+                summary['income'] += float(transactions.loc[is_income, 'amount_pesos'].sum())
+                summary['expenses'] += float(transactions.loc[~is_income, 'amount_pesos'].sum())
+                balance_delta += float(transactions.loc[is_income, 'amount'].sum() - transactions.loc[~is_income, 'amount'].sum())
+                if not linked_goals.empty:
+                    goal_contributions = goal_contributions.add(
+                        calculate_goal_contributions(linked_goals, transactions), fill_value=0
+                    )
+
+        if summary['imported']:
+            account_id = profile.get('account_id')
+            commit_staged_transactions(
+                username, staging_path,
+                {account_id: balance_delta} if account_id is not None else None,
+                goal_contributions
+            )
+
+            # Registrar las huellas nuevas en una sola escritura del índice
+            save_fingerprint_index(username, merge_imported_fingerprints(fingerprint_index, seen_counts))
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+
+    return summary